@@ -0,0 +1,240 @@
+"""CodeRevive 基准测试
+
+用法:
+    python benchmarks/run_benchmarks.py run --files 500 --output head.json
+    python benchmarks/run_benchmarks.py compare base.json head.json --threshold 10
+
+run 在临时目录生成合成仓库（或使用 --repo 指定的已有目录），测量：
+  - scan_repository 吞吐量（文件/秒、MB/秒，取多次运行的中位数）
+  - 每个分析器的单文件冷启动延迟分位数（p50/p90/p99/max，毫秒）
+  - 每个重构函数的单文件耗时分位数，以及整仓变更集的计算耗时
+  - 进程（含子进程）的峰值 RSS
+结果以扁平的 {指标名: 数值} 保存为 JSON。compare 比较两次结果，以 `_per_s` 结尾的
+指标越大越好，其余越小越好；任一指标退化超过阈值（百分比）时返回非零退出码。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+from synthetic_repo import DEFAULT_PROFILE, add_profile_arguments, generate_repository  # noqa: E402
+from analyzers import (  # noqa: E402
+    detect_python_smells, analyze_python_complexity, analyze_python_function_complexity,
+    detect_javascript_smells, analyze_javascript_complexity
+)
+from analyzers import python_engine, javascript_tokenizer  # noqa: E402
+from core.scanner import scan_repository, _iter_source_files  # noqa: E402
+from refactors import build_changeset, refactor_python_long_methods, refactor_javascript_long_methods  # noqa: E402
+from refactors.changeset import read_source  # noqa: E402
+from refactors.pipeline import run_python_fixers, run_javascript_fixers  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource 模块，不报告 RSS
+    resource = None
+
+DEFAULT_THRESHOLD = 10.0
+PERCENTILES = (50, 90, 99)
+
+ANALYZERS = {
+    ".py": {
+        "python_smells": detect_python_smells,
+        "python_complexity": analyze_python_complexity,
+        "python_function_complexity": analyze_python_function_complexity
+    },
+    ".js": {
+        "javascript_smells": detect_javascript_smells,
+        "javascript_complexity": analyze_javascript_complexity
+    }
+}
+# 作用于文件路径的重构函数（只计算建议，不写文件）
+PATH_REFACTORS = {
+    ".py": {"python_long_methods": refactor_python_long_methods},
+    ".js": {"javascript_long_methods": refactor_javascript_long_methods}
+}
+# 作用于源码的修复流水线（不写文件）
+SOURCE_REFACTORS = {
+    ".py": {"python_fixers": run_python_fixers},
+    ".js": {"javascript_fixers": run_javascript_fixers}
+}
+
+def percentile(sorted_values, pct):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def latency_metrics(prefix, samples):
+    """把耗时样本（秒）转换为毫秒分位数指标"""
+    samples = sorted(samples)
+    metrics = {f"{prefix}_p{pct}_ms": percentile(samples, pct) * 1000 for pct in PERCENTILES}
+    metrics[f"{prefix}_max_ms"] = (samples[-1] if samples else 0.0) * 1000
+    return metrics
+
+def peak_rss_mb():
+    """返回本进程与已结束子进程的峰值 RSS（MB），不支持时返回 None"""
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+def _clear_memos():
+    python_engine.clear_memo()
+    javascript_tokenizer.clear_memo()
+
+def bench_scan(repo, total_bytes, file_count, jobs, repeat):
+    durations = []
+    for _ in range(repeat):
+        _clear_memos()
+        started = time.perf_counter()
+        result = scan_repository(repo, jobs=jobs)
+        durations.append(time.perf_counter() - started)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+    median = statistics.median(durations)
+    return {
+        f"scan_jobs{jobs}_files_per_s": file_count / median,
+        f"scan_jobs{jobs}_mb_per_s": total_bytes / 1024 / 1024 / median,
+        f"scan_jobs{jobs}_seconds": median
+    }
+
+def bench_per_file(files, table, call):
+    """对每个文件分别计时 table 中的函数（每次调用前清空进程内缓存），返回分位数指标"""
+    samples = {}
+    for file_path in files:
+        for name, func in table.get(os.path.splitext(file_path)[1], {}).items():
+            argument = call(file_path)
+            _clear_memos()
+            started = time.perf_counter()
+            func(argument)
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+    metrics = {}
+    for name, values in samples.items():
+        metrics.update(latency_metrics(name, values))
+    return metrics
+
+def run(args):
+    profile = {name: getattr(args, name) for name in DEFAULT_PROFILE}
+    with tempfile.TemporaryDirectory(prefix='coderevive-bench-') as workdir:
+        repo = args.repo
+        if repo is None:
+            repo = os.path.join(workdir, 'repo')
+            generate_repository(repo, **profile)
+        files = list(_iter_source_files(repo))
+        total_bytes = sum(os.path.getsize(path) for path in files)
+
+        metrics = {"files": len(files), "bytes": total_bytes}
+        for jobs in sorted(set(args.jobs)):
+            metrics.update(bench_scan(repo, total_bytes, len(files), jobs, args.repeat))
+        metrics.update(bench_per_file(files, ANALYZERS, lambda path: path))
+        metrics.update(bench_per_file(files, PATH_REFACTORS, lambda path: path))
+        metrics.update(bench_per_file(files, SOURCE_REFACTORS, read_source))
+
+        started = time.perf_counter()
+        build_changeset(files, jobs=max(args.jobs))
+        metrics["changeset_seconds"] = time.perf_counter() - started
+
+        rss = peak_rss_mb()
+        if rss is not None:
+            metrics["peak_rss_mb"] = rss
+
+    return {"meta": _meta(args, profile), "metrics": metrics}
+
+def _meta(args, profile):
+    try:
+        commit = subprocess.run(['git', '-C', BENCH_DIR, 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repo": args.repo,
+        "profile": profile if args.repo is None else None,
+        "jobs": sorted(set(args.jobs)),
+        "repeat": args.repeat,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+def compare(base, head, threshold=DEFAULT_THRESHOLD, overrides=None):
+    """比较两次基准结果，返回 [(指标, 基准值, 当前值, 变化百分比, 是否退化)]"""
+    overrides = overrides or {}
+    rows = []
+    for name, base_value in sorted(base["metrics"].items()):
+        head_value = head["metrics"].get(name)
+        if head_value is None or name in ("files", "bytes"):
+            continue
+        if base_value == 0:
+            change = 0.0 if head_value == 0 else float('inf')
+        else:
+            change = (head_value - base_value) / base_value * 100
+        # 吞吐量下降、其他指标上升才算退化
+        worse = -change if name.endswith('_per_s') else change
+        rows.append((name, base_value, head_value, change, worse > overrides.get(name, threshold)))
+    return rows
+
+def _parse_overrides(values):
+    overrides = {}
+    for value in values or []:
+        name, _, pct = value.partition('=')
+        if not pct:
+            raise SystemExit(f"阈值格式应为 指标=百分比: {value}")
+        overrides[name] = float(pct)
+    return overrides
+
+def main():
+    parser = argparse.ArgumentParser(description='CodeRevive 基准测试')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='运行基准测试并保存 JSON 结果')
+    run_parser.add_argument('--repo', type=str, help='使用已有目录而不是生成合成仓库')
+    run_parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count() or 1], help='扫描并行度（可多个）')
+    run_parser.add_argument('--repeat', type=int, default=3, help='扫描重复次数，取中位数')
+    run_parser.add_argument('--output', type=str, default='benchmark.json', help='结果文件')
+    add_profile_arguments(run_parser)
+
+    compare_parser = commands.add_parser('compare', help='比较两次结果并检查退化')
+    compare_parser.add_argument('base', help='基准结果 JSON')
+    compare_parser.add_argument('head', help='当前结果 JSON')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许的退化百分比（默认 10）')
+    compare_parser.add_argument('--metric-threshold', action='append', metavar='指标=百分比', help='单个指标的阈值')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        result = run(args)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        for name, value in result["metrics"].items():
+            print(f"{name:45s} {value:12.3f}")
+        print(f"\n结果已保存到: {os.path.abspath(args.output)}")
+        return 0
+
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.head, 'r', encoding='utf-8') as f:
+        head = json.load(f)
+    rows = compare(base, head, args.threshold, _parse_overrides(args.metric_threshold))
+    regressions = 0
+    for name, base_value, head_value, change, regressed in rows:
+        regressions += regressed
+        print(f"{'✗' if regressed else ' '} {name:45s} {base_value:12.3f} → {head_value:12.3f} ({change:+.1f}%)")
+    print(f"\n{regressions} 个指标退化超过阈值" if regressions else "\n没有指标退化超过阈值")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
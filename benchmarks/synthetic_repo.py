@@ -0,0 +1,166 @@
+"""生成用于基准测试的合成仓库
+
+文件数、每个文件的函数数、函数长度、目录嵌套深度和 Python/JavaScript 比例均可配置；
+相同的参数和随机种子总是生成完全相同的仓库。
+"""
+import argparse
+import os
+import random
+
+DEFAULT_PROFILE = {
+    "files": 200,
+    "python_ratio": 0.6,
+    "functions_per_file": 8,
+    "function_lines": 20,
+    "long_function_ratio": 0.1,
+    "directory_depth": 3,
+    "files_per_directory": 20,
+    "duplicate_ratio": 0.2,
+    "seed": 42
+}
+
+_PY_MODULES = ('os', 'sys', 're', 'json', 'math', 'time', 'random', 'itertools', 'functools', 'collections')
+
+def _python_function(rng, name, lines, depth):
+    out = [f"def {name}({', '.join(f'arg{i}' for i in range(rng.randint(0, 4)))}):", '    """合成函数"""', "    total = 0"]
+    indent = 1
+    needs_body = False
+    while len(out) < lines or needs_body:
+        roll = rng.random()
+        pad = '    ' * indent
+        if needs_body or roll >= 0.4 or (roll >= 0.3 and indent == 1) or (roll < 0.3 and indent >= depth):
+            out.append(f"{pad}total = total * {rng.randint(1, 9)} + len(str(total)) if total and True else {rng.randint(0, 9)}")
+            needs_body = False
+        elif roll < 0.2:
+            out.append(f"{pad}if total > {rng.randint(0, 100)}:")
+            indent += 1
+            needs_body = True
+        elif roll < 0.3:
+            out.append(f"{pad}for i in range({rng.randint(1, 10)}):")
+            indent += 1
+            needs_body = True
+        else:
+            indent -= 1
+            out.append(f"{'    ' * indent}total += 1")
+    out.append("    return total")
+    return out
+
+def _python_file(rng, profile):
+    imports = rng.sample(_PY_MODULES, 4)
+    lines = [f"import {module}" for module in imports]
+    if rng.random() < profile["duplicate_ratio"]:
+        lines.append(f"import {imports[0]}")
+    lines.append("")
+    for index in range(profile["functions_per_file"]):
+        length = profile["function_lines"]
+        if rng.random() < profile["long_function_ratio"]:
+            length *= 3
+        lines.extend(_python_function(rng, f"func_{index}", length, profile["directory_depth"] + 1))
+        lines.append("")
+    lines.append("class Synthetic:")
+    lines.append("    def method(self, value):")
+    lines.append("        return value if value else None")
+    return "\n".join(lines) + "\n"
+
+def _javascript_function(rng, name, lines, depth):
+    style = rng.random()
+    if style < 0.5:
+        out = [f"function {name}(a, b) {{"]
+    elif style < 0.8:
+        out = [f"const {name} = (a, b) => {{"]
+    else:
+        out = [f"var {name} = function (a, b) {{"]
+    out.append("  let total = 0;")
+    indent = 1
+    closers = []
+    while len(out) < lines:
+        roll = rng.random()
+        pad = '  ' * indent
+        if roll < 0.2 and indent < depth:
+            out.append(f"{pad}if (total > {rng.randint(0, 100)} && a) {{")
+            closers.append(indent)
+            indent += 1
+        elif roll < 0.3 and indent < depth:
+            out.append(f"{pad}for (let i = 0; i < {rng.randint(1, 10)}; i++) {{")
+            closers.append(indent)
+            indent += 1
+        elif roll < 0.4 and closers:
+            indent = closers.pop()
+            out.append(f"{'  ' * indent}}}")
+        else:
+            out.append(f"{pad}total = total * {rng.randint(1, 9)} + `${{a}}/${{b}}`.length; // 注释")
+    while closers:
+        out.append(f"{'  ' * closers.pop()}}}")
+    out.append("  return total / 2;")
+    out.append("};" if style >= 0.5 else "}")
+    return out
+
+def _javascript_file(rng, profile):
+    lines = ["'use strict';", f"var config = {{ name: 'synthetic', pattern: /a\\/b/g }};"]
+    if rng.random() < profile["duplicate_ratio"]:
+        lines.append("var config = {};")
+    lines.append("")
+    for index in range(profile["functions_per_file"]):
+        length = profile["function_lines"]
+        if rng.random() < profile["long_function_ratio"]:
+            length *= 3
+        lines.extend(_javascript_function(rng, f"func{index}", length, profile["directory_depth"] + 1))
+        lines.append("")
+    lines.append("class Synthetic {")
+    lines.append("  method(value) { return value || null; }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def _directory_for(index, profile):
+    """把第 index 个文件放到嵌套 directory_depth 层的目录中"""
+    parts = []
+    bucket = index // max(profile["files_per_directory"], 1)
+    for level in range(profile["directory_depth"]):
+        parts.append(f"pkg{level}_{bucket % 4}")
+        bucket //= 4
+    return os.path.join(*parts) if parts else ''
+
+def generate_repository(root, **overrides):
+    """在 root 下生成合成仓库，返回 {"files", "bytes", "python_files", "javascript_files"}"""
+    unknown = set(overrides) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"未知的生成参数: {', '.join(sorted(unknown))}")
+    profile = dict(DEFAULT_PROFILE, **overrides)
+    rng = random.Random(profile["seed"])
+    summary = {"files": 0, "bytes": 0, "python_files": 0, "javascript_files": 0}
+
+    for index in range(profile["files"]):
+        is_python = rng.random() < profile["python_ratio"]
+        directory = os.path.join(root, _directory_for(index, profile))
+        os.makedirs(directory, exist_ok=True)
+        if is_python:
+            path = os.path.join(directory, f"module_{index}.py")
+            content = _python_file(rng, profile)
+            summary["python_files"] += 1
+        else:
+            path = os.path.join(directory, f"module_{index}.js")
+            content = _javascript_file(rng, profile)
+            summary["javascript_files"] += 1
+        data = content.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        summary["files"] += 1
+        summary["bytes"] += len(data)
+    return summary
+
+def add_profile_arguments(parser):
+    """把生成参数添加到命令行解析器"""
+    for name, default in DEFAULT_PROFILE.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=type(default), default=default)
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试用的合成仓库')
+    parser.add_argument('root', help='输出目录')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profile = {name: getattr(args, name) for name in DEFAULT_PROFILE}
+    summary = generate_repository(args.root, **profile)
+    print(f"已生成 {summary['files']} 个文件（{summary['bytes'] / 1024 / 1024:.1f} MB）: {args.root}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,24 @@
-from .python_analyzer import detect_code_smells as detect_python_smells, analyze_complexity as analyze_python_complexity
-from .javascript_analyzer import detect_code_smells as detect_javascript_smells, analyze_complexity as analyze_javascript_complexity
-
-__all__ = [
-    'detect_python_smells',
-    'analyze_python_complexity', 
-    'detect_javascript_smells',
-    'analyze_javascript_complexity'
-]
\ No newline at end of file
+import importlib
+
+# 导出名 -> (子模块, 属性)；第一次访问时才导入对应分析器（PEP 562），
+# 只分析一种语言时不会为另一种语言的分析器付出导入开销
+_EXPORTS = {
+    'detect_python_smells': ('python_analyzer', 'detect_code_smells'),
+    'analyze_python_complexity': ('python_analyzer', 'analyze_complexity'),
+    'analyze_python_function_complexity': ('python_analyzer', 'analyze_function_complexity'),
+    'detect_javascript_smells': ('javascript_analyzer', 'detect_code_smells'),
+    'analyze_javascript_complexity': ('javascript_analyzer', 'analyze_complexity')
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _EXPORTS[name]
+    value = getattr(importlib.import_module(f".{module_name}", __name__), attr)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,161 @@
+import io
+import keyword
+import random
+import tokenize
+import zlib
+from bisect import bisect_right
+from collections import deque
+from .file_memo import read_text
+from .profiling import profiled
+
+# k-gram 的记号数：只有至少 K_GRAM + WINDOW - 1 个记号的重复片段保证会被检测到
+K_GRAM = 30
+# 滑动窗口大小（以 k-gram 计）：每个窗口至少选出一个指纹
+WINDOW = 10
+# MinHash 签名长度，随机种子固定，使缓存中的签名在不同进程间可比较
+NUM_PERM = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_BASE = 1_000_003
+_rng = random.Random(20240519)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(_MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+del _rng
+
+_PYTHON_SKIPPED = frozenset((tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+                             tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER))
+_JAVASCRIPT_KEYWORDS = frozenset((
+    'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete', 'do',
+    'else', 'export', 'extends', 'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
+    'let', 'new', 'return', 'super', 'switch', 'this', 'throw', 'try', 'typeof', 'var', 'void',
+    'while', 'with', 'yield', 'async', 'await', 'of', 'static', 'get', 'set', 'null', 'true',
+    'false', 'undefined'
+))
+
+def normalize_python(source):
+    """把 Python 源码转换为规范化记号流 [(记号, 行号)]
+
+    标识符统一为 ID、数字为 N、字符串为 S，忽略注释和空白，
+    因此只改了变量名、字面量或格式的复制代码也会得到相同的记号流。
+    """
+    result = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type in _PYTHON_SKIPPED:
+                continue
+            if token.type == tokenize.NAME:
+                text = token.string if keyword.iskeyword(token.string) else 'ID'
+            elif token.type == tokenize.NUMBER:
+                text = 'N'
+            elif token.type == tokenize.STRING:
+                text = 'S'
+            else:
+                text = token.string
+            result.append((text, token.start[0]))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return result
+
+def normalize_javascript(source):
+    """把 JavaScript 源码转换为规范化记号流 [(记号, 行号)]，规则同 normalize_python"""
+    # 分析纯 Python 仓库时不必编译 JavaScript 记号的正则表达式
+    from .javascript_tokenizer import tokenize
+    tokens = tokenize(source)
+    line_starts = [0]
+    position = source.find('\n')
+    while position != -1:
+        line_starts.append(position + 1)
+        position = source.find('\n', position + 1)
+    result = []
+    for kind, value, start in zip(tokens.kinds, tokens.values, tokens.starts):
+        if kind == 'name':
+            text = value if value in _JAVASCRIPT_KEYWORDS else 'ID'
+        elif kind == 'num':
+            text = 'N'
+        else:
+            text = value
+        result.append((text, bisect_right(line_starts, start)))
+    return result
+
+def _token_hashes(tokens):
+    # crc32 在不同进程和运行之间保持稳定（内置 hash() 对字符串加了随机盐）
+    codes = {}
+    hashes = []
+    for text, _ in tokens:
+        code = codes.get(text)
+        if code is None:
+            code = codes[text] = zlib.crc32(text.encode('utf-8')) + 1
+        hashes.append(code)
+    return hashes
+
+def kgram_hashes(tokens, k=K_GRAM):
+    """用滚动哈希计算每个 k-gram 的哈希（模 2^61-1），返回长度为 len(tokens) - k + 1 的列表"""
+    hashes = _token_hashes(tokens)
+    if len(hashes) < k:
+        return []
+    high = pow(_BASE, k - 1, _MERSENNE_PRIME)
+    value = 0
+    for code in hashes[:k]:
+        value = (value * _BASE + code) % _MERSENNE_PRIME
+    result = [value]
+    for i in range(k, len(hashes)):
+        value = ((value - hashes[i - k] * high) * _BASE + hashes[i]) % _MERSENNE_PRIME
+        result.append(value)
+    return result
+
+def winnow(hashes, window=WINDOW):
+    """稳健的 winnowing：每个窗口选最小哈希（相同时取最右），返回 [(下标, 哈希)]
+
+    用单调队列实现，时间 O(n)；相邻窗口选中同一位置时只记录一次。
+    """
+    if not hashes:
+        return []
+    if len(hashes) <= window:
+        index = min(range(len(hashes)), key=lambda i: (hashes[i], -i))
+        return [(index, hashes[index])]
+    selected = []
+    candidates = deque()
+    last = -1
+    for i, value in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        if i >= window - 1 and candidates[0] != last:
+            last = candidates[0]
+            selected.append((last, hashes[last]))
+    return selected
+
+def minhash(values):
+    """集合的 MinHash 签名（NUM_PERM 个整数），空集合返回空列表"""
+    values = set(values)
+    if not values:
+        return []
+    return [min((a * value + b) % _MERSENNE_PRIME for value in values) for a, b in _PERMUTATIONS]
+
+def fingerprint_tokens(tokens, k=K_GRAM, window=WINDOW):
+    """返回 {"tokens", "fingerprints": [[哈希, 起始行, 结束行], ...], "minhash"}"""
+    selected = winnow(kgram_hashes(tokens, k), window)
+    fingerprints = [[value, tokens[index][1], tokens[index + k - 1][1]] for index, value in selected]
+    return {
+        "tokens": len(tokens),
+        "fingerprints": fingerprints,
+        "minhash": minhash(value for value, _, _ in fingerprints)
+    }
+
+@profiled("analyzer.python_fingerprints")
+def fingerprint_python(file_path):
+    """计算 Python 文件的克隆检测指纹"""
+    try:
+        source = read_text(file_path)
+    except (OSError, UnicodeDecodeError):
+        return fingerprint_tokens([])
+    return fingerprint_tokens(normalize_python(source))
+
+@profiled("analyzer.javascript_fingerprints")
+def fingerprint_javascript(file_path):
+    """计算 JavaScript 文件的克隆检测指纹"""
+    try:
+        source = read_text(file_path)
+    except (OSError, UnicodeDecodeError):
+        return fingerprint_tokens([])
+    return fingerprint_tokens(normalize_javascript(source))
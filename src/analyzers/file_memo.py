@@ -0,0 +1,65 @@
+import hashlib
+import mmap
+import os
+from collections import OrderedDict
+from .profiling import profiled
+
+def _decode(data):
+    text = str(data, 'utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+@profiled("io.read")
+def read_text(file_path):
+    """读取 UTF-8 文本文件（换行统一为 \n，与文本模式 read() 相同）
+
+    通过 mmap 直接从页缓存解码为字符串，不再先复制出一份完整的 bytes。
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _decode(mapped)
+
+@profiled("io.read")
+def read_text_with_digest(file_path):
+    """与 read_text 相同，另外返回同一次读取的原始字节的摘要"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return '', hashlib.blake2b(b'', digest_size=16).digest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _decode(mapped), hashlib.blake2b(mapped, digest_size=16).digest()
+
+class FileMemo:
+    """按 (路径, 内容摘要) 在进程内缓存最近的单文件分析结果
+
+    同一文件被多个分析/重构函数先后使用时只需解析一次。键由本次读取的内容决定，
+    而不是修改时间和大小：同一时间刻度内大小不变的改写也不会复用旧结果
+    （否则旧结果会以新内容的哈希写入持久化的分析缓存）。
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def load(self, file_path):
+        """读取文件，返回 (缓存键, 文本)；文件不可读时抛出 OSError / UnicodeDecodeError"""
+        text, digest = read_text_with_digest(file_path)
+        return (os.path.abspath(file_path), digest), text
+
+    def get(self, key):
+        if key is None or key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        if key is None:
+            return
+        self._entries[key] = value
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import sys
+from collections.abc import Mapping
+
+# 问题类型名 -> IssueType；注册了的类型使用紧凑的 Issue 记录，其余类型仍为普通 dict
+ISSUE_TYPES = {}
+
+class IssueType:
+    """一种问题除 type、line、message 之外的字段（按顺序）和消息模板"""
+    __slots__ = ('name', 'fields', 'template', 'index')
+
+    def __init__(self, name, fields, template):
+        self.name = sys.intern(name)
+        self.fields = tuple(sys.intern(field) for field in fields)
+        self.template = template
+        self.index = {field: i for i, field in enumerate(self.fields)}
+
+    def __reduce__(self):
+        # 按名称传回主进程，主进程中已注册的同名类型被复用
+        return issue_type, (self.name, self.fields, self.template)
+
+def register_issue_type(name, fields, template):
+    """注册问题类型；template 以 str.format 的字段名引用 fields，例如 "重复导入: {import}" """
+    ISSUE_TYPES[name] = IssueType(name, fields, template)
+    return ISSUE_TYPES[name]
+
+def issue_type(name, fields, template):
+    """返回已注册的同名类型（字段和模板一致时），否则注册一个新的"""
+    kind = ISSUE_TYPES.get(name)
+    if kind is None or kind.fields != tuple(fields) or kind.template != template:
+        kind = register_issue_type(name, fields, template)
+    return kind
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class Issue(Mapping):
+    """紧凑的问题记录：只保存类型、行号和字段值，message 在读取时才按模板格式化
+
+    与原来的 dict 一样按键访问（issue['line']、issue.get('message')、dict(issue)），
+    与内容相同的 dict 比较相等；字符串字段（函数名、导入名等）被驻留，大量问题共享同一个对象。
+    """
+    __slots__ = ('kind', 'line', 'values')
+
+    def __init__(self, kind, line, *values):
+        if type(kind) is str:
+            kind = ISSUE_TYPES[kind]
+        self.kind = kind
+        self.line = line
+        self.values = tuple(_intern(value) for value in values)
+
+    @property
+    def message(self):
+        return self.kind.template.format_map(dict(zip(self.kind.fields, self.values)))
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.kind.name
+        if key == 'line':
+            return self.line
+        if key == 'message':
+            return self.message
+        index = self.kind.index.get(key)
+        if index is None:
+            raise KeyError(key)
+        return self.values[index]
+
+    def __contains__(self, key):
+        return key in ('type', 'message', 'line') or key in self.kind.index
+
+    def __iter__(self):
+        yield 'type'
+        yield 'message'
+        yield 'line'
+        yield from self.kind.fields
+
+    def __len__(self):
+        return 3 + len(self.values)
+
+    def __repr__(self):
+        return f"Issue({dict(self)!r})"
+
+    def __reduce__(self):
+        return _restore, (self.kind, self.line, self.values)
+
+def _restore(kind, line, values):
+    return Issue(kind, line, *values)
+
+def compact(issue):
+    """把内容与某个已注册类型一致的 dict（例如从缓存读出的）转换为 Issue，其他值原样返回"""
+    if type(issue) is not dict:
+        return issue
+    kind = ISSUE_TYPES.get(issue.get('type'))
+    if kind is None or len(issue) != 3 + len(kind.fields) or 'line' not in issue or 'message' not in issue:
+        return issue
+    try:
+        return Issue(kind, issue['line'], *(issue[field] for field in kind.fields))
+    except KeyError:
+        return issue
+
+def compact_issues(issues):
+    """compact 问题列表中的每一项；不是列表时（例如出错的结果）原样返回"""
+    if type(issues) is not list:
+        return issues
+    return [compact(issue) for issue in issues]
+
+def json_default(value):
+    """json.dumps 的 default：Issue 序列化为与原来相同的对象"""
+    if isinstance(value, Issue):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+register_issue_type("long_function", ("function", "length"), "函数 '{function}' 过长 ({length} 行)")
+register_issue_type("duplicate_import", ("import",), "重复导入: {import}")
+register_issue_type("duplicate_variable", ("variable", "previous_line"), "重复声明变量: {variable}")
@@ -0,0 +1,281 @@
+import re
+from bisect import bisect_left
+from . import profiling
+from .file_memo import FileMemo
+
+# 进程内保留最近索引结果的文件数
+INDEX_MEMO_SIZE = 8
+
+_PUNCTUATORS = (
+    r'>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|=>|==|!=|<=|>=|&&=|\|\|=|\?\?=|&&|\|\||\?\?|\?\.'
+    r'|\+\+|--|\+=|-=|\*=|%=|&=|\|=|\^=|\*\*|<<|>>|[-+*%&|^!~<>=?:.,;(){}\[\]@#]'
+)
+
+def _token_pattern(slash):
+    return re.compile(
+        r'(?P<ws>(?:\s+|//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))+)'
+        r'|(?P<name>[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*)'
+        r'|(?P<num>\.?\d[\w.]*)'
+        r"""|(?P<str>'(?:[^'\\\n]|\\[\s\S])*'?|"(?:[^"\\\n]|\\[\s\S])*"?)"""
+        r'|(?P<template>`)'
+        r'|(?P<punct>' + _PUNCTUATORS + r')'
+        + slash +
+        r'|(?P<other>[\s\S])'
+    )
+
+# "/" 既可能是除号也可能是正则字面量的开始，取决于前一个有效记号
+_TOKEN_RE = _token_pattern(r'|(?P<div>/=?)')
+_TOKEN_RE_REGEX = _token_pattern(r'|(?P<regex>/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*)|(?P<div>/=?)')
+# 模板字符串片段：到反引号、"${" 或文件末尾为止
+_TEMPLATE_RE = re.compile(r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*(?:`|\$\{|\Z)')
+_NEWLINE_RE = re.compile(r'\n')
+
+# 这些关键字之后出现的 "/" 是正则字面量而不是除号
+_EXPRESSION_KEYWORDS = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'case', 'do', 'else', 'yield', 'await'
+))
+_NOT_METHOD_NAMES = frozenset((
+    'if', 'for', 'while', 'switch', 'catch', 'with', 'function', 'return', 'typeof',
+    'new', 'delete', 'void', 'throw', 'await', 'yield', 'super', 'import'
+))
+_METHOD_PREFIXES = frozenset(('{', ',', ';', '}', 'get', 'set', 'static', 'async', '*'))
+_STATEMENT_KEYWORDS = frozenset(('var', 'let', 'const', 'function', 'class', 'return', 'if', 'for', 'while'))
+_DECLARATION_KEYWORDS = frozenset(('var', 'let', 'const'))
+DECISION_KEYWORDS = frozenset(('if', 'for', 'while', 'case', 'catch'))
+DECISION_OPERATORS = frozenset(('&&', '||'))
+_OPENERS = {'(': ')', '[': ']', '{': '}'}
+_CLOSERS = frozenset((')', ']', '}'))
+_TEMPLATE_MARK = -1
+
+class FunctionSpan:
+    """函数在源码中的位置（偏移量为左闭右开区间，行号从 1 开始）"""
+    __slots__ = ('name', 'kind', 'start', 'end', 'start_line', 'end_line')
+
+    def __init__(self, name, kind, start, end, start_line, end_line):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.start_line = start_line
+        self.end_line = end_line
+
+    @property
+    def line_count(self):
+        return self.end_line - self.start_line + 1
+
+    def __repr__(self):
+        return f"FunctionSpan({self.name!r}, {self.kind!r}, lines {self.start_line}-{self.end_line})"
+
+class Tokens:
+    """记号流，按列存储：类别、值、起止偏移，以及括号配对"""
+    __slots__ = ('kinds', 'values', 'starts', 'ends', 'pairs')
+
+    def __init__(self):
+        self.kinds = []
+        self.values = []
+        self.starts = []
+        self.ends = []
+        self.pairs = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+def tokenize(code):
+    """线性扫描 JavaScript 源码，跳过空白和注释，正确处理字符串、模板字符串和正则字面量"""
+    tokens = Tokens()
+    kinds, values, starts, ends, pairs = tokens.kinds, tokens.values, tokens.starts, tokens.ends, tokens.pairs
+    # 开括号的记号下标；_TEMPLATE_MARK 表示模板字符串中的 "${"
+    open_stack = []
+    regex_allowed = True
+    pos = 0
+    length = len(code)
+
+    while pos < length:
+        match = (_TOKEN_RE_REGEX if regex_allowed else _TOKEN_RE).match(code, pos)
+        kind = match.lastgroup
+        end = match.end()
+        if kind == 'ws':
+            pos = end
+            continue
+
+        value = kind
+        if kind == 'template':
+            end = _TEMPLATE_RE.match(code, end).end()
+            if code.endswith('${', 0, end):
+                open_stack.append(_TEMPLATE_MARK)
+                regex_allowed = True
+            else:
+                regex_allowed = False
+        elif kind == 'punct':
+            value = code[pos:end]
+            if value in _OPENERS:
+                open_stack.append(len(kinds))
+            elif value in _CLOSERS:
+                if value == '}' and open_stack and open_stack[-1] == _TEMPLATE_MARK:
+                    # "${...}" 结束，继续扫描模板字符串的剩余部分
+                    open_stack.pop()
+                    end = _TEMPLATE_RE.match(code, end).end()
+                    kind = value = 'template'
+                    if code.endswith('${', 0, end):
+                        open_stack.append(_TEMPLATE_MARK)
+                        regex_allowed = True
+                    else:
+                        regex_allowed = False
+                elif open_stack and open_stack[-1] != _TEMPLATE_MARK and _OPENERS[values[open_stack[-1]]] == value:
+                    opener = open_stack.pop()
+                    pairs[opener] = len(kinds)
+                    pairs[len(kinds)] = opener
+            if kind == 'punct':
+                regex_allowed = value not in (')', ']', '++', '--')
+        elif kind == 'name':
+            value = code[pos:end]
+            regex_allowed = value in _EXPRESSION_KEYWORDS
+        elif kind == 'num':
+            value = code[pos:end]
+            regex_allowed = False
+        else:
+            regex_allowed = kind == 'div' or kind == 'other'
+
+        kinds.append(kind)
+        values.append(value)
+        starts.append(pos)
+        ends.append(end)
+        pos = end
+
+    return tokens
+
+class JavaScriptIndex:
+    """一次扫描得到的 JavaScript 文件索引：函数区间、变量声明和判定点数量"""
+
+    def __init__(self, code):
+        self.lines_of_code = code.count('\n') + 1
+        self._newlines = [match.start() for match in _NEWLINE_RE.finditer(code)]
+        self.functions = []
+        # (变量名, 行号)，按出现顺序
+        self.declarations = []
+        self.decision_points = 0
+
+    def line_of(self, offset):
+        """返回偏移量所在的行号"""
+        return bisect_left(self._newlines, offset) + 1
+
+    def _add_function(self, name, kind, start, end):
+        self.functions.append(FunctionSpan(name, kind, start, end, self.line_of(start), self.line_of(end - 1)))
+
+def _infer_name(tokens, first):
+    """为函数表达式/箭头函数推断名字：`x = ...`、`const x = ...`、`x: ...`，返回 (名字, 起始记号下标)"""
+    kinds, values = tokens.kinds, tokens.values
+    if first >= 2 and values[first - 1] in ('=', ':') and kinds[first - 2] in ('name', 'str', 'num'):
+        name_index = first - 2
+        name = values[name_index] if kinds[name_index] != 'str' else '<anonymous>'
+        if name_index >= 1 and values[name_index - 1] in _DECLARATION_KEYWORDS:
+            return name, name_index - 1
+        return name, name_index
+    return '<anonymous>', first
+
+def _expression_end(tokens, index):
+    """返回无花括号箭头函数体最后一个记号的下标"""
+    kinds, values, pairs = tokens.kinds, tokens.values, tokens.pairs
+    count = len(kinds)
+    first = last = index
+    while index < count:
+        value = values[index]
+        if kinds[index] == 'punct':
+            if value in _OPENERS:
+                index = pairs.get(index, count - 1)
+                last = index
+                index += 1
+                continue
+            if value in (',', ';') or value in _CLOSERS:
+                break
+        elif index != first and kinds[index] == 'name' and value in _STATEMENT_KEYWORDS:
+            break
+        last = index
+        index += 1
+    return last
+
+def _block_end(tokens, brace_index):
+    """返回与 "{" 配对的 "}" 的结束偏移，未闭合时延伸到文件末尾"""
+    close = tokens.pairs.get(brace_index, len(tokens.kinds) - 1)
+    return tokens.ends[close]
+
+@profiling.profiled("javascript.index")
+def build_index(code):
+    """对源码分词并建立函数区间索引（普通函数、函数表达式、箭头函数和方法）"""
+    index = JavaScriptIndex(code)
+    tokens = profiling.call("javascript.tokenize", tokenize, code)
+    kinds, values, starts, ends, pairs = tokens.kinds, tokens.values, tokens.starts, tokens.ends, tokens.pairs
+    count = len(kinds)
+
+    for i in range(count):
+        kind = kinds[i]
+        value = values[i]
+
+        if kind == 'name':
+            if value in DECISION_KEYWORDS:
+                index.decision_points += 1
+            if value in _DECLARATION_KEYWORDS and i + 1 < count and kinds[i + 1] == 'name' \
+                    and (i == 0 or values[i - 1] != '.'):
+                index.declarations.append((values[i + 1], index.line_of(starts[i])))
+
+            if value == 'function' and (i == 0 or values[i - 1] != '.'):
+                j = i + 1
+                if j < count and values[j] == '*':
+                    j += 1
+                name = None
+                if j < count and kinds[j] == 'name':
+                    name = values[j]
+                    j += 1
+                if j < count and values[j] == '(' and j in pairs:
+                    body = pairs[j] + 1
+                    if body < count and values[body] == '{':
+                        start_index = i
+                        if name is None:
+                            first = i - 1 if i >= 1 and values[i - 1] == 'async' else i
+                            name, start_index = _infer_name(tokens, first)
+                        index._add_function(name, 'function', starts[start_index], _block_end(tokens, body))
+
+            elif value not in _NOT_METHOD_NAMES and i + 1 < count and values[i + 1] == '(' \
+                    and (i == 0 or values[i - 1] in _METHOD_PREFIXES):
+                close = pairs.get(i + 1)
+                if close is not None and close + 1 < count and values[close + 1] == '{':
+                    start_index = i
+                    while start_index >= 1 and values[start_index - 1] in ('get', 'set', 'static', 'async', '*'):
+                        start_index -= 1
+                    index._add_function(value, 'method', starts[start_index], _block_end(tokens, close + 1))
+
+        elif kind == 'punct':
+            if value in DECISION_OPERATORS:
+                index.decision_points += 1
+            elif value == '=>' and i >= 1:
+                first = pairs.get(i - 1, i - 1) if values[i - 1] == ')' else i - 1
+                if first >= 1 and values[first - 1] == 'async':
+                    first -= 1
+                name, start_index = _infer_name(tokens, first)
+                body = i + 1
+                if body >= count:
+                    continue
+                if values[body] == '{':
+                    end = _block_end(tokens, body)
+                else:
+                    end = ends[_expression_end(tokens, body)]
+                index._add_function(name, 'arrow', starts[start_index], end)
+
+    index.functions.sort(key=lambda span: span.start)
+    return index
+
+_memo = FileMemo(INDEX_MEMO_SIZE)
+
+def index_file(file_path):
+    """读取文件并建立索引；内容未变化时复用进程内最近一次的结果"""
+    memo_key, code = _memo.load(file_path)
+    index = _memo.get(memo_key)
+    if index is None:
+        index = build_index(code)
+        _memo.put(memo_key, index)
+    return index
+
+def clear_memo():
+    """清空进程内缓存的索引结果（例如基准测试测量冷启动耗时时）"""
+    _memo.clear()
\ No newline at end of file
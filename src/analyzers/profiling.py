@@ -0,0 +1,159 @@
+import functools
+import heapq
+import json
+import os
+import re
+import tempfile
+from time import perf_counter
+
+# 汇总中保留的最慢文件数
+DEFAULT_SLOWEST_FILES = 10
+
+class Profiler:
+    """收集计时器、计数器和最慢文件
+
+    计时器按名字累计调用次数、总耗时和单次最大耗时。快照是普通 dict，
+    可以从工作进程传回主进程再 merge。
+    """
+
+    def __init__(self, slowest_files=DEFAULT_SLOWEST_FILES):
+        self.timers = {}
+        self.counters = {}
+        self.slowest_files = slowest_files
+        self._slowest = []
+        self._started = perf_counter()
+
+    def add_time(self, name, seconds, calls=1, max_seconds=None):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0]
+        timer[0] += calls
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds if max_seconds is None else max_seconds)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_file(self, path, seconds, size):
+        """记录单个文件的分析耗时，只保留最慢的 N 个"""
+        entry = (seconds, path, size)
+        if len(self._slowest) < self.slowest_files:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def snapshot(self):
+        return {
+            "timers": {
+                name: {"calls": calls, "total_seconds": total, "max_seconds": longest}
+                for name, (calls, total, longest) in sorted(self.timers.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_files": [
+                {"path": path, "seconds": seconds, "bytes": size}
+                for seconds, path, size in sorted(self._slowest, reverse=True)
+            ]
+        }
+
+    def merge(self, snapshot):
+        """合并另一个 Profiler（例如工作进程）的快照"""
+        for name, timer in snapshot["timers"].items():
+            self.add_time(name, timer["total_seconds"], timer["calls"], timer["max_seconds"])
+        for name, value in snapshot["counters"].items():
+            self.count(name, value)
+        for entry in snapshot["slowest_files"]:
+            self.record_file(entry["path"], entry["seconds"], entry["bytes"])
+
+    def summary(self):
+        result = self.snapshot()
+        result["wall_seconds"] = perf_counter() - self._started
+        return result
+
+    def write_json(self, path):
+        _atomic_write(path, json.dumps(self.summary(), indent=2, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path, prefix='coderevive'):
+        """写出 node_exporter textfile collector 格式的指标"""
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_wall_seconds 本次运行的总耗时",
+            f"# TYPE {prefix}_wall_seconds gauge",
+            f"{prefix}_wall_seconds {summary['wall_seconds']:.6f}",
+            f"# HELP {prefix}_timer_seconds_total 各计时器累计耗时",
+            f"# TYPE {prefix}_timer_seconds_total counter"
+        ]
+        for name, timer in summary["timers"].items():
+            lines.append(f'{prefix}_timer_seconds_total{{name="{_label(name)}"}} {timer["total_seconds"]:.6f}')
+        lines += [f"# HELP {prefix}_timer_calls_total 各计时器调用次数", f"# TYPE {prefix}_timer_calls_total counter"]
+        for name, timer in summary["timers"].items():
+            lines.append(f'{prefix}_timer_calls_total{{name="{_label(name)}"}} {timer["calls"]}')
+        lines += [f"# HELP {prefix}_timer_max_seconds 各计时器单次最大耗时", f"# TYPE {prefix}_timer_max_seconds gauge"]
+        for name, timer in summary["timers"].items():
+            lines.append(f'{prefix}_timer_max_seconds{{name="{_label(name)}"}} {timer["max_seconds"]:.6f}')
+        for name, value in summary["counters"].items():
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _atomic_write(path, text):
+    # textfile collector 可能随时读取，先写临时文件再替换
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+# 当前启用的 Profiler；关闭时为 None，埋点只做一次全局变量检查
+_active = None
+
+def enable(profiler=None):
+    """启用性能分析并返回当前的 Profiler"""
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+def disable():
+    """关闭性能分析，返回之前的 Profiler"""
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+def active():
+    """返回当前的 Profiler，未启用时返回 None"""
+    return _active
+
+def call(name, func, *args, **kwargs):
+    """调用 func；启用性能分析时把耗时计入 name"""
+    profiler = _active
+    if profiler is None:
+        return func(*args, **kwargs)
+    started = perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.add_time(name, perf_counter() - started)
+
+def profiled(name):
+    """装饰器：启用性能分析时把函数耗时计入 name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.add_time(name, perf_counter() - started)
+        return wrapper
+    return decorate
+
+def timed_handler(name, func):
+    """返回计时版本的 func；未启用性能分析时原样返回（用于构建一次、调用多次的分发表）"""
+    if _active is None:
+        return func
+    return functools.partial(call, name, func)
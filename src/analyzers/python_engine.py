@@ -0,0 +1,240 @@
+import ast
+import heapq
+from array import array
+from collections import deque
+from . import profiling
+from .file_memo import FileMemo
+from .issues import Issue
+
+# 代码异味检测中长函数的行数阈值
+MAX_FUNCTION_LINES = 30
+# 进程内保留最近解析结果的文件数，同一文件被多个分析/重构函数使用时只解析一次
+ANALYSIS_MEMO_SIZE = 8
+
+BRANCH_NODES = (ast.If, ast.For, ast.While, ast.AsyncFor,
+                ast.With, ast.AsyncWith, ast.Try, ast.ExceptHandler,
+                ast.BoolOp, ast.BinOp)
+
+def _node_types(*names):
+    # match/TryStar 等节点只在较新的 Python 版本中存在
+    return tuple(getattr(ast, name) for name in names if hasattr(ast, name))
+
+# 单个函数圈复杂度的判定点（McCabe），BoolOp 按操作数个数减一计
+DECISION_NODES = _node_types('If', 'IfExp', 'For', 'AsyncFor', 'While',
+                             'ExceptHandler', 'Assert', 'comprehension', 'match_case')
+# 增加嵌套深度的语句
+NESTING_NODES = _node_types('If', 'For', 'AsyncFor', 'While', 'With', 'AsyncWith',
+                            'Try', 'TryStar', 'Match')
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+FUNCTION_METRICS = ('cyclomatic_complexity', 'nesting_depth', 'length', 'parameters')
+
+class FunctionMetricsTable:
+    """按列存储的函数级指标表，每个函数一行"""
+
+    def __init__(self):
+        self.names = []
+        self.qualnames = []
+        self.lines = array('I')
+        self.cyclomatic_complexity = array('I')
+        self.nesting_depth = array('H')
+        self.length = array('I')
+        self.parameters = array('H')
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, qualname, line, length, parameters):
+        """新增一行，返回行号；复杂度从 1 开始，嵌套深度从 0 开始"""
+        self.names.append(name)
+        self.qualnames.append(qualname)
+        self.lines.append(line)
+        self.cyclomatic_complexity.append(1)
+        self.nesting_depth.append(0)
+        self.length.append(length)
+        self.parameters.append(min(parameters, 0xFFFF))
+        return len(self.names) - 1
+
+    def row(self, index):
+        """返回第 index 行的字典形式"""
+        return {
+            "function": self.names[index],
+            "qualname": self.qualnames[index],
+            "line": self.lines[index],
+            "cyclomatic_complexity": self.cyclomatic_complexity[index],
+            "nesting_depth": self.nesting_depth[index],
+            "length": self.length[index],
+            "parameters": self.parameters[index]
+        }
+
+    def rows(self, indices=None):
+        return [self.row(i) for i in (range(len(self)) if indices is None else indices)]
+
+    def above(self, threshold, metric='cyclomatic_complexity'):
+        """返回指标大于等于 threshold 的函数，按源码顺序"""
+        column = getattr(self, _metric_column(metric))
+        return self.rows(i for i in range(len(self)) if column[i] >= threshold)
+
+    def top(self, n, metric='cyclomatic_complexity'):
+        """返回指标最高的 n 个函数（热点），指标相同时按源码顺序"""
+        column = getattr(self, _metric_column(metric))
+        return self.rows(heapq.nsmallest(n, range(len(self)), key=lambda i: (-column[i], i)))
+
+def _metric_column(metric):
+    if metric not in FUNCTION_METRICS:
+        raise ValueError(f"未知的函数指标: {metric}")
+    return metric
+
+class PythonAnalysis:
+    """单个Python文件一次解析、一次遍历得到的分析结果"""
+
+    def __init__(self, lines_of_code=0):
+        self.lines_of_code = lines_of_code
+        self.node_count = 0
+        self.branch_count = 0
+        self.import_issues = []
+        self.function_metrics = FunctionMetricsTable()
+        self.error = None
+
+    def long_functions(self, max_lines=MAX_FUNCTION_LINES):
+        """返回超过 max_lines 行的函数 (函数名, 起始行, 行数)，按 ast.walk 的广度优先顺序"""
+        table = self.function_metrics
+        return [(table.names[i], table.lines[i], table.length[i])
+                for i in range(len(table)) if table.length[i] > max_lines]
+
+    def code_smells(self, max_lines=MAX_FUNCTION_LINES):
+        """返回代码异味列表，格式与 detect_code_smells 一致"""
+        if self.error is not None:
+            return [{"type": "error", "message": f"分析失败: {self.error}", "line": 0}]
+
+        issues = []
+        for name, lineno, lines in self.long_functions(max_lines):
+            issues.append(Issue("long_function", lineno, name, lines))
+        # Issue 不可变，可以直接与记忆化的分析结果共享
+        issues.extend(self.import_issues)
+        return issues
+
+    def complexity(self):
+        """返回复杂度指标，格式与 analyze_complexity 一致"""
+        if self.error is not None:
+            return {"error": self.error}
+
+        # 与原递归实现等价：每个节点计 1，分支节点额外计 1
+        cyclomatic_complexity = self.node_count + self.branch_count
+        maintainability_index = max(0, 100 - (cyclomatic_complexity * 2 + self.lines_of_code * 0.1))
+        return {
+            "cyclomatic_complexity": cyclomatic_complexity,
+            "maintainability_index": round(maintainability_index, 2),
+            "lines_of_code": self.lines_of_code
+        }
+
+class DuplicateImportRule:
+    """检测重复导入"""
+    node_types = (ast.Import, ast.ImportFrom)
+
+    def __init__(self):
+        self.imports = {}
+
+    def visit(self, node, analysis):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            names = [f"{node.module}.{alias.name}" for alias in node.names]
+
+        for name in names:
+            if name in self.imports:
+                analysis.import_issues.append(Issue("duplicate_import", node.lineno, name))
+            self.imports[name] = node.lineno
+
+class BranchCountRule:
+    """统计分支节点数量，用于圈复杂度"""
+    node_types = BRANCH_NODES
+
+    def visit(self, node, analysis):
+        analysis.branch_count += 1
+
+def default_rules():
+    """返回一组新的规则实例（规则可能带有单文件状态）"""
+    return [DuplicateImportRule(), BranchCountRule()]
+
+def _parameter_count(node):
+    args = node.args
+    count = len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+    return count + (args.vararg is not None) + (args.kwarg is not None)
+
+def run_rules(tree, analysis, rules):
+    """一次广度优先遍历语法树（迭代实现，不受递归深度限制）
+
+    节点分发给关注该类型的规则，同时把判定点和嵌套深度归属到所在函数，
+    填充 analysis.function_metrics。
+    """
+    dispatch = {}
+    metrics = analysis.function_metrics
+    complexity, nesting_depth = metrics.cyclomatic_complexity, metrics.nesting_depth
+    # (节点, 所属函数行号或 -1, 在函数内的嵌套深度, 限定名前缀)
+    todo = deque([(tree, -1, 0, '')])
+    while todo:
+        node, owner, nesting, prefix = todo.popleft()
+        analysis.node_count += 1
+
+        child_owner, child_nesting, child_prefix = owner, nesting, prefix
+        if isinstance(node, FUNCTION_NODES):
+            child_owner = metrics.add(node.name, prefix + node.name, node.lineno,
+                                      node.end_lineno - node.lineno + 1, _parameter_count(node))
+            child_nesting = 0
+            child_prefix = f"{prefix}{node.name}."
+        elif isinstance(node, ast.ClassDef):
+            child_prefix = f"{prefix}{node.name}."
+        elif owner >= 0:
+            if isinstance(node, DECISION_NODES):
+                complexity[owner] += 1 + (len(node.ifs) if isinstance(node, ast.comprehension) else 0)
+            elif isinstance(node, ast.BoolOp):
+                complexity[owner] += len(node.values) - 1
+            if isinstance(node, NESTING_NODES):
+                child_nesting = nesting + 1
+                if child_nesting > nesting_depth[owner]:
+                    nesting_depth[owner] = child_nesting
+        # elif 在语法树中是嵌套在 orelse 里的 If，不额外增加嵌套深度
+        elif_node = node.orelse[0] if isinstance(node, ast.If) and len(node.orelse) == 1 \
+            and isinstance(node.orelse[0], ast.If) else None
+        for child in ast.iter_child_nodes(node):
+            todo.append((child, child_owner, nesting if child is elif_node else child_nesting, child_prefix))
+
+        node_type = type(node)
+        handlers = dispatch.get(node_type)
+        if handlers is None:
+            handlers = dispatch[node_type] = [profiling.timed_handler(f"rule.{type(rule).__name__}", rule.visit)
+                                              for rule in rules if issubclass(node_type, rule.node_types)]
+        for handler in handlers:
+            handler(node, analysis)
+
+def analyze_source(code, rules=None):
+    """解析源码并运行所有规则，返回 PythonAnalysis"""
+    analysis = PythonAnalysis(code.count('\n') + 1)
+    try:
+        tree = profiling.call("python.parse", ast.parse, code)
+        profiling.call("python.rules", run_rules, tree, analysis, rules if rules is not None else default_rules())
+    except Exception as e:
+        analysis.error = str(e)
+    return analysis
+
+_memo = FileMemo(ANALYSIS_MEMO_SIZE)
+
+def analyze_file(file_path):
+    """读取并分析文件；内容未变化时复用进程内最近一次的分析结果"""
+    try:
+        memo_key, code = _memo.load(file_path)
+    except Exception as e:
+        analysis = PythonAnalysis()
+        analysis.error = str(e)
+        return analysis
+
+    analysis = _memo.get(memo_key)
+    if analysis is None:
+        analysis = analyze_source(code)
+        _memo.put(memo_key, analysis)
+    return analysis
+
+def clear_memo():
+    """清空进程内缓存的分析结果（例如基准测试测量冷启动耗时时）"""
+    _memo.clear()
\ No newline at end of file
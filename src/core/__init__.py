@@ -1,7 +1,21 @@
-from .scanner import scan_repository
-from .report_generator import generate_report
+import importlib
 
-__all__ = [
-    'scan_repository',
-    'generate_report'
-]
\ No newline at end of file
+# 导出名 -> 子模块；第一次访问时才导入（PEP 562），
+# 使 `from core.cache import ...` 之类的导入不会连带导入扫描器及其依赖
+_EXPORTS = {
+    'scan_repository': 'scanner',
+    'iter_scan_repository': 'scanner',
+    'generate_report': 'report_generator'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import time
+import analyzers
+from analyzers.issues import json_default
+from .plugins import plugin_for, plugins_version
+
+# 缓存格式变化时递增，使旧缓存整体失效
+CACHE_SCHEMA_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'coderevive')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 批量提交写入和访问时间，避免每次读写都提交事务
+FLUSH_THRESHOLD = 512
+
+def analyzer_version():
+    """计算分析器版本：对 analyzers 包的源码和各语言插件的版本取哈希，任一变化时缓存自动失效"""
+    digest = hashlib.sha256(f"schema-{CACHE_SCHEMA_VERSION}-{plugins_version()}".encode())
+    package_dir = os.path.dirname(os.path.abspath(analyzers.__file__))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith('.py'):
+            digest.update(name.encode('utf-8'))
+            with open(os.path.join(package_dir, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def smells_kind(file_path):
+    """根据扩展名返回代码异味分析的缓存类别"""
+    return plugin_for(file_path).kind('smells')
+
+def complexity_kind(file_path):
+    """根据扩展名返回复杂度分析的缓存类别"""
+    return plugin_for(file_path).kind('complexity')
+
+class AnalysisCache:
+    """基于文件内容哈希的持久化分析结果缓存
+
+    键由内容哈希、分析类别、分析器版本和规则配置共同决定；
+    总大小超过 max_bytes 时按最近访问时间淘汰（LRU）。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, rule_config=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.version = analyzer_version()
+        self.config_digest = hashlib.sha256(
+            json.dumps(rule_config or {}, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:16]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched = []
+        self._dirty = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'analysis.db'), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def make_key(self, content, kind):
+        """根据文件内容（bytes）和分析类别生成缓存键"""
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{kind}:{self.version}:{self.config_digest}:{digest}"
+
+    def key_for_file(self, file_path, kind):
+        """读取文件内容生成缓存键，文件不可读时返回 None"""
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return self.make_key(b'', kind)
+                # 直接对映射的文件内容求哈希，不把整个文件读入内存
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return self.make_key(mapped, kind)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        """查询缓存，未命中返回 None"""
+        row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append(key)
+        if len(self._touched) >= FLUSH_THRESHOLD:
+            self.flush()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """写入缓存，必要时淘汰最久未访问的条目"""
+        data = json.dumps(value, ensure_ascii=False, default=json_default)
+        size = len(data.encode('utf-8'))
+        previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, data, size, time.time())
+        )
+        self._total_bytes += size - (previous[0] if previous else 0)
+        self._dirty += 1
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        elif self._dirty >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def analyze(self, file_path, kind):
+        """带缓存地执行一次分析，kind 为 "<语言>_<功能>"，例如 python_smells"""
+        plugin = plugin_for(file_path)
+        analyze = plugin.get(kind[len(plugin.language) + 1:])
+        key = self.key_for_file(file_path, kind)
+        if key is None:
+            return analyze(file_path)
+
+        value = self.get(key)
+        if value is None:
+            value = analyze(file_path)
+            self.put(key, value)
+        return value
+
+    def _evict(self):
+        self.flush()
+        # 其他进程可能同时写入，淘汰前重新统计
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC"):
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self._conn.commit()
+        self.evictions += len(evicted)
+
+    def flush(self):
+        """提交待写入的数据和访问时间"""
+        if self._touched:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(now, key) for key in self._touched]
+            )
+            self._touched = []
+        self._dirty = 0
+        self._conn.commit()
+
+    def stats(self):
+        """返回命中/未命中等统计信息"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "total_bytes": self._total_bytes
+        }
+
+    def close(self):
+        # 调用方的各个分支和外层清理都可能关闭缓存，重复关闭时忽略
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
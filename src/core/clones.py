@@ -0,0 +1,229 @@
+import os
+import struct
+import tempfile
+from array import array
+from analyzers import profiling
+from analyzers.duplicate_detector import NUM_PERM
+from .plugins import plugin_for
+from .scanner import _iter_analyzed
+
+# 同一指纹出现的位置超过这个数时视为样板代码，不参与匹配，保证整体接近线性时间
+MAX_POSTINGS = 16
+# LSH 桶中的文件数超过这个数时跳过该桶（大量文件彼此相同，逐对比较没有意义）
+MAX_BUCKET_SIZE = 32
+# 倒排索引的分片数，以及内存中缓冲的指纹条目数上限（超出后把各分片写入临时文件）
+SHARD_COUNT = 64
+MAX_BUFFERED_FINGERPRINTS = 1_000_000
+# 报告的重复片段至少包含的行数和共享指纹数
+MIN_CLONE_LINES = 5
+MIN_SHARED_FINGERPRINTS = 2
+# 合并相邻的匹配片段时允许的行间隔
+MERGE_GAP_LINES = 2
+# MinHash 分成的 LSH 段数（每段 NUM_PERM // LSH_BANDS 行），以及判定为相似文件的估计 Jaccard 相似度
+LSH_BANDS = 16
+SIMILARITY_THRESHOLD = 0.8
+
+# 索引条目：(指纹哈希, 文件编号, 起始行, 结束行)
+_ENTRY = struct.Struct('<QIII')
+
+class FingerprintIndex:
+    """按指纹哈希分片的倒排索引
+
+    条目以定长二进制追加到各分片的缓冲区，缓冲条目数超过 max_buffered 后写入
+    每个分片一个的临时文件；匹配时逐个分片读入、排序、分组，任何时刻内存中
+    只有缓冲区和一个分片，与仓库大小无关。
+    """
+
+    def __init__(self, shards=SHARD_COUNT, max_buffered=MAX_BUFFERED_FINGERPRINTS, work_dir=None):
+        self.shards = shards
+        self.max_buffered = max_buffered
+        self.work_dir = work_dir
+        self.spilled = False
+        self._buffers = [bytearray() for _ in range(shards)]
+        self._buffered = 0
+        self._files = None
+
+    def add(self, file_id, fingerprints):
+        buffers, shards, pack = self._buffers, self.shards, _ENTRY.pack
+        for value, start, end in fingerprints:
+            buffers[value % shards] += pack(value, file_id, start, end)
+        self._buffered += len(fingerprints)
+        if self._buffered >= self.max_buffered:
+            self._spill()
+
+    def _spill(self):
+        if self._files is None:
+            self._files = [tempfile.TemporaryFile(prefix='coderevive-clones-', dir=self.work_dir)
+                           for _ in range(self.shards)]
+            self.spilled = True
+        for f, buffer in zip(self._files, self._buffers):
+            f.write(buffer)
+            buffer.clear()
+        self._buffered = 0
+
+    def iter_groups(self):
+        """逐个产出同一指纹的所有出现位置 [(文件编号, 起始行, 结束行)]（按文件编号、行号排序）"""
+        for shard in range(self.shards):
+            data = self._buffers[shard]
+            if self._files is not None:
+                f = self._files[shard]
+                f.write(data)
+                f.seek(0)
+                data = f.read()
+                f.close()
+            self._buffers[shard] = bytearray()
+            entries = sorted(_ENTRY.iter_unpack(data))
+            del data
+            start = 0
+            while start < len(entries):
+                value = entries[start][0]
+                end = start + 1
+                while end < len(entries) and entries[end][0] == value:
+                    end += 1
+                if end - start > 1:
+                    yield [entry[1:] for entry in entries[start:end]]
+                start = end
+
+    def close(self):
+        for f in self._files or ():
+            f.close()
+        self._files = None
+
+def _fragment_matches(index):
+    """同一指纹在不同位置的出现两两配对：{(文件a, 文件b): [(起a, 止a, 起b, 止b)]}"""
+    matches = {}
+    for group in index.iter_groups():
+        if len(group) > MAX_POSTINGS:
+            continue
+        for i, (file_a, start_a, end_a) in enumerate(group):
+            for file_b, start_b, end_b in group[i + 1:]:
+                if file_a == file_b and start_b <= end_a:
+                    continue
+                matches.setdefault((file_a, file_b), []).append((start_a, end_a, start_b, end_b))
+    return matches
+
+def _merge_fragments(fragments):
+    """把两文件间相邻或重叠的匹配片段合并为区域 [起a, 止a, 起b, 止b, 指纹数]"""
+    regions = []
+    for start_a, end_a, start_b, end_b in sorted(fragments):
+        if regions:
+            region = regions[-1]
+            if start_a <= region[1] + MERGE_GAP_LINES and \
+                    region[2] - MERGE_GAP_LINES <= start_b <= region[3] + MERGE_GAP_LINES:
+                region[1] = max(region[1], end_a)
+                region[3] = max(region[3], end_b)
+                region[4] += 1
+                continue
+        regions.append([start_a, end_a, start_b, end_b, 1])
+    return regions
+
+def _similar_pairs(signatures, signature_files):
+    """用 LSH 分段找出候选文件对，再按 MinHash 估计相似度，产出 (文件a, 文件b, 相似度)"""
+    rows = NUM_PERM // LSH_BANDS
+    candidates = set()
+    for band in range(LSH_BANDS):
+        buckets = {}
+        for position in range(len(signature_files)):
+            offset = position * NUM_PERM + band * rows
+            buckets.setdefault(tuple(signatures[offset:offset + rows]), []).append(position)
+        for members in buckets.values():
+            if 1 < len(members) <= MAX_BUCKET_SIZE:
+                candidates.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+    for a, b in sorted(candidates):
+        first, second = signatures[a * NUM_PERM:(a + 1) * NUM_PERM], signatures[b * NUM_PERM:(b + 1) * NUM_PERM]
+        similarity = sum(x == y for x, y in zip(first, second)) / NUM_PERM
+        if similarity >= SIMILARITY_THRESHOLD:
+            yield signature_files[a], signature_files[b], similarity
+
+def _has_fingerprints(file_path):
+    plugin = plugin_for(file_path)
+    return plugin is not None and plugin.get('fingerprints') is not None
+
+@profiling.profiled("clones.find")
+def find_clones(file_paths, jobs=1, cache=None, executor=None, report_paths=None, work_dir=None,
+                max_buffered=MAX_BUFFERED_FINGERPRINTS, limits=None):
+    """检测仓库范围内的重复代码
+
+    每个文件的指纹（规范化记号的 winnowing 指纹和 MinHash 签名）通过 AnalysisCache
+    按内容缓存，重新扫描时只为变化的文件重新计算。完全相同（忽略标识符、字面量和格式）
+    的片段通过倒排索引匹配；整体相似但片段被打乱的文件通过 MinHash/LSH 找出。
+    report_paths 不为 None 时只报告涉及这些文件的结果（索引仍覆盖全部文件）；
+    超出 limits（FileLimits）的文件不参与检测。
+    返回 {"files", "fingerprints", "clones": [...], "similar_files": [...]}。
+    """
+    paths = []
+    signatures = array('Q')
+    signature_files = []
+    total = 0
+    index = FingerprintIndex(max_buffered=max_buffered, work_dir=work_dir)
+    supported = [path for path in file_paths if _has_fingerprints(path)]
+    try:
+        for file_path, record in _iter_analyzed(supported, jobs, cache, executor, role='fingerprints', limits=limits):
+            file_id = len(paths)
+            paths.append(file_path)
+            index.add(file_id, record["fingerprints"])
+            total += len(record["fingerprints"])
+            if len(record["minhash"]) == NUM_PERM:
+                signatures.extend(record["minhash"])
+                signature_files.append(file_id)
+        matches = _fragment_matches(index)
+    finally:
+        index.close()
+
+    wanted = None
+    if report_paths is not None:
+        wanted = {os.path.abspath(path) for path in report_paths}
+
+    def reported(*file_ids):
+        return wanted is None or any(os.path.abspath(paths[file_id]) in wanted for file_id in file_ids)
+
+    clones = []
+    linked = set()
+    for (file_a, file_b), fragments in sorted(matches.items()):
+        for start_a, end_a, start_b, end_b, count in _merge_fragments(fragments):
+            if count < MIN_SHARED_FINGERPRINTS or min(end_a - start_a, end_b - start_b) + 1 < MIN_CLONE_LINES:
+                continue
+            if file_a == file_b and start_b <= end_a:
+                continue
+            linked.add((file_a, file_b))
+            if reported(file_a, file_b):
+                clones.append({
+                    "fingerprints": count,
+                    "locations": [
+                        {"path": paths[file_a], "start_line": start_a, "end_line": end_a},
+                        {"path": paths[file_b], "start_line": start_b, "end_line": end_b}
+                    ]
+                })
+
+    similar_files = [
+        {"paths": [paths[file_a], paths[file_b]], "similarity": round(similarity, 3)}
+        for file_a, file_b, similarity in _similar_pairs(signatures, signature_files)
+        if (file_a, file_b) not in linked and reported(file_a, file_b)
+    ]
+    return {"files": len(paths), "fingerprints": total, "clones": clones, "similar_files": similar_files}
+
+def clone_issues(result):
+    """把 find_clones 的结果转换为按文件（绝对路径）分组的问题列表"""
+    issues = {}
+    for clone in result["clones"]:
+        first, second = clone["locations"]
+        for here, other in ((first, second), (second, first)):
+            issues.setdefault(os.path.abspath(here["path"]), []).append({
+                "type": "duplicate_code",
+                "line": here["start_line"],
+                "end_line": here["end_line"],
+                "message": f"第 {here['start_line']}-{here['end_line']} 行与 {other['path']} "
+                           f"第 {other['start_line']}-{other['end_line']} 行重复",
+                "duplicate_of": other
+            })
+    for similar in result["similar_files"]:
+        first, second = similar["paths"]
+        for here, other in ((first, second), (second, first)):
+            issues.setdefault(os.path.abspath(here), []).append({
+                "type": "similar_file",
+                "line": 1,
+                "message": f"与 {other} 高度相似（估计相似度 {similar['similarity']:.0%}）",
+                "similar_to": other,
+                "similarity": similar["similarity"]
+            })
+    return issues
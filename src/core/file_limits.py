@@ -0,0 +1,76 @@
+import os
+
+# 超过这个大小的文件不分析（0 表示不限制）
+DEFAULT_MAX_FILE_BYTES = 2 * 1024 * 1024
+# 开头部分出现超过这个长度的行时视为压缩（minified）文件（0 表示不检查）
+DEFAULT_MAX_LINE_LENGTH = 1000
+# 只读取文件开头这么多字节判断文件类型
+SNIFF_BYTES = 8192
+# 只在开头这么多行中查找生成代码标记
+HEADER_LINES = 5
+GENERATED_MARKERS = (b'@generated', b'DO NOT EDIT', b'Code generated by', b'auto-generated', b'autogenerated')
+MINIFIED_SUFFIXES = ('.min.js', '-min.js', '.bundle.js')
+
+def _skipped(reason, message, size):
+    return {"type": "skipped_file", "reason": reason, "message": message, "line": 0, "size": size}
+
+class FileLimits:
+    """单文件的大小和行长度限制
+
+    check() 只调用一次 stat 并读取文件开头 SNIFF_BYTES 字节，超过大小限制、
+    压缩、生成或二进制文件在读取全文之前就被跳过。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_FILE_BYTES, max_line_length=DEFAULT_MAX_LINE_LENGTH):
+        self.max_bytes = max_bytes or 0
+        self.max_line_length = max_line_length or 0
+
+    def check(self, file_path):
+        """返回跳过该文件的问题（type 为 skipped_file），需要分析时返回 None"""
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            # 交给分析器报告文件不存在等错误
+            return None
+        skipped = self.check_size(file_path, size)
+        if skipped is not None:
+            return skipped
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError:
+            return None
+        return self.check_head(head, size)
+
+    def check_size(self, file_path, size):
+        """只根据文件名和大小判断（例如 git 对象，读取内容之前）"""
+        if self.max_bytes and size > self.max_bytes:
+            return _skipped("too_large", f"文件过大，已跳过 ({size / 1024:.0f} KB，上限 {self.max_bytes / 1024:.0f} KB)", size)
+        if file_path.endswith(MINIFIED_SUFFIXES):
+            return _skipped("minified", "压缩（minified）文件，已跳过", size)
+        return None
+
+    def check_head(self, head, size):
+        """根据文件开头的内容（至多 SNIFF_BYTES 字节）判断二进制、生成和压缩文件"""
+        head = head[:SNIFF_BYTES]
+        if b'\0' in head:
+            return _skipped("binary", "二进制文件，已跳过", size)
+        lines = head.split(b'\n')
+        header = b'\n'.join(lines[:HEADER_LINES])
+        if any(marker in header for marker in GENERATED_MARKERS):
+            return _skipped("generated", "生成的代码，已跳过", size)
+        if self.max_line_length:
+            longest = max(len(line) for line in lines)
+            if longest > self.max_line_length:
+                return _skipped("minified", f"疑似压缩（minified）文件，已跳过 (行长度 {longest} 字节，上限 {self.max_line_length})", size)
+        return None
+
+    def to_params(self):
+        return {"max_file_bytes": self.max_bytes, "max_line_length": self.max_line_length}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params.get("max_file_bytes", DEFAULT_MAX_FILE_BYTES),
+                   params.get("max_line_length", DEFAULT_MAX_LINE_LENGTH))
+
+DEFAULT_LIMITS = FileLimits()
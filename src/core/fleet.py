@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from analyzers import profiling
+from analyzers.issues import json_default
+from .git_changes import GitError
+from .ignore import IgnoreEngine
+from .report_writers import REPORT_WRITERS, get_report_writer
+from .repo_fetcher import RepositoryFetchError, checked_out_repository, is_remote_url
+from .scanner import iter_scan_repository
+
+# 断点文件：第一行为本次运行的信息，之后每完成一个仓库追加一行；全部完成后删除
+CHECKPOINT_FILE = 'fleet_checkpoint.jsonl'
+# 汇总文件：本次运行的总计和每个仓库的结果，下一次运行从中读取各仓库的大小
+SUMMARY_FILE = 'fleet_summary.json'
+REPORTS_DIR = 'reports'
+# 同时扫描的仓库数，以及每个仓库每轮最多处理的文件数（轮转调度的时间片）
+DEFAULT_MAX_ACTIVE = 4
+DEFAULT_QUANTUM = 64
+# 汇总中列出的问题最多的仓库数
+TOP_REPOSITORIES = 10
+
+def repository_name(repo):
+    """为仓库生成稳定、可作为文件名的名称，例如 org_app-1a2b3c4d"""
+    path = repo.rstrip('/')
+    if path.endswith('.git'):
+        path = path[:-4]
+    parts = [part for part in re.split(r'[/:\\]', path) if part][-2:]
+    slug = re.sub(r'[^\w.-]+', '_', '_'.join(parts)).strip('._') or 'repo'
+    return f"{slug}-{hashlib.sha1(repo.encode('utf-8')).hexdigest()[:8]}"
+
+def _entry(value, index):
+    if isinstance(value, str):
+        value = {"repo": value}
+    if not isinstance(value, dict) or not value.get("repo"):
+        raise ValueError(f"清单第 {index + 1} 项缺少 repo")
+    repo = value["repo"]
+    return {
+        "repo": repo,
+        "name": value.get("name") or repository_name(repo),
+        "priority": int(value.get("priority", 0)),
+        "ref": value.get("ref"),
+        "exclude": list(value.get("exclude", ())),
+        "index": index
+    }
+
+def load_manifest(path):
+    """读取仓库清单，返回 [{"repo", "name", "priority", "ref", "exclude", "index"}]
+
+    .json 文件为仓库列表或 {"repositories": [...]}，每项为地址或 {"repo", "priority", "ref", "exclude", "name"}；
+    其他文件每行一个仓库，可在地址后跟优先级（数字越大越先扫描），# 开头的行为注释。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+            values = data.get("repositories", []) if isinstance(data, dict) else data
+        else:
+            values = []
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                if len(fields) > 2 or (len(fields) == 2 and not re.fullmatch(r'-?\d+', fields[1])):
+                    raise ValueError(f"无法解析清单行: {line.strip()}")
+                values.append({"repo": fields[0], "priority": int(fields[1]) if len(fields) == 2 else 0})
+    repositories = [_entry(value, index) for index, value in enumerate(values)]
+    names = Counter(entry["name"] for entry in repositories)
+    duplicates = [name for name, count in names.items() if count > 1]
+    if duplicates:
+        raise ValueError(f"清单中有重复的仓库: {', '.join(sorted(duplicates))}")
+    return repositories
+
+def manifest_digest(repositories):
+    """清单内容的摘要，清单变化后不再沿用旧的断点"""
+    data = json.dumps([[entry["repo"], entry["name"], entry["priority"], entry["ref"], entry["exclude"]]
+                       for entry in repositories], sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+def previous_sizes(out_dir):
+    """上一次运行中各仓库分析的文件数 {名称: 文件数}，没有记录时为空"""
+    try:
+        with open(os.path.join(out_dir, SUMMARY_FILE), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {result["name"]: result.get("files", 0) for result in summary.get("results", [])
+            if result.get("status") == "ok"}
+
+def schedule_order(repositories, sizes):
+    """按优先级从高到低、同一优先级内按上次的大小从大到小排序（最大者优先，缩短整体完成时间）
+
+    没有上次大小的仓库（新加入或上次失败）排在同一优先级的最前面，按可能很大处理。
+    """
+    return sorted(repositories, key=lambda entry: (-entry["priority"], entry["name"] in sizes,
+                                                   -sizes.get(entry["name"], 0), entry["index"]))
+
+def _read_checkpoint(path, digest):
+    """返回 {"started", "completed": {名称: 结果}}；断点不存在或属于其他清单时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return None
+    if header.get("manifest") != digest:
+        return None
+    completed = {}
+    for line in lines[1:]:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            # 中断时写了一半的行
+            break
+        completed[result["name"]] = result
+    return {"started": header.get("started"), "completed": completed}
+
+class _Checkpoint:
+    """追加写入的断点文件，每条结果写入后立即 fsync
+
+    打开时先把运行信息和已完成的结果重写到临时文件再替换原文件，
+    去掉中断时写了一半的最后一行，之后追加的结果不会与它拼成无效的一行。
+    """
+
+    def __init__(self, path, digest, started, completed):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"record": "run", "manifest": digest, "started": started}) + '\n')
+            f.writelines(json.dumps(result, ensure_ascii=False) + '\n' for result in completed.values())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def _result(entry, status, seconds, message=None, files=0, total_issues=0, issue_types=None, report=None):
+    result = {"name": entry["name"], "repo": entry["repo"], "priority": entry["priority"], "status": status,
+              "seconds": round(seconds, 3), "files": files, "total_issues": total_issues,
+              "issue_types": issue_types or {}}
+    if message is not None:
+        result["message"] = message
+    if report is not None:
+        result["report"] = report
+    return result
+
+class _ActiveRepository:
+    """正在扫描的仓库：结果生成器、临时报告和统计"""
+    __slots__ = ('entry', 'stack', 'results', 'report', 'report_path', 'temp_path', 'writer', 'started',
+                 'files', 'issue_types', 'commit')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.stack = ExitStack()
+        self.results = None
+        self.report = None
+        self.report_path = None
+        self.temp_path = None
+        self.writer = None
+        self.started = time.perf_counter()
+        self.files = 0
+        self.issue_types = Counter()
+        self.commit = None
+
+    def discard(self):
+        """关闭生成器（取消尚未开始的任务）并删除未完成的报告"""
+        if self.results is not None:
+            self.results.close()
+        if self.report is not None:
+            self.report.close()
+            try:
+                os.unlink(self.temp_path)
+            except OSError:
+                pass
+        self.stack.close()
+
+class FleetScanner:
+    """在一个共享的进程池上扫描清单中的所有仓库
+
+    仓库按 schedule_order 依次进入活动集合（最多 max_active 个），活动仓库轮流各处理至多
+    quantum 个文件，所有仓库的分析任务都提交到同一个进程池：大仓库只占一个活动位置和
+    1/max_active 的轮次，不会让其余仓库一直等待。每完成一个仓库，报告原子写入
+    out_dir/reports，结果追加到断点文件；中断后再次运行同一清单时跳过已完成的仓库。
+    """
+
+    def __init__(self, repositories, out_dir, jobs=1, cache=None, fmt='jsonl', limits=None,
+                 max_active=DEFAULT_MAX_ACTIVE, quantum=DEFAULT_QUANTUM, fetch_options=None, on_complete=None):
+        if fmt not in REPORT_WRITERS:
+            raise ValueError(f"不支持的报告格式: {fmt}")
+        self.repositories = repositories
+        self.out_dir = out_dir
+        self.jobs = jobs
+        self.cache = cache
+        self.fmt = fmt
+        self.limits = limits
+        self.max_active = max(1, max_active)
+        self.quantum = max(1, quantum)
+        self.fetch_options = fetch_options or {}
+        self.on_complete = on_complete
+        self.executor = None
+
+    def _report_path(self, entry):
+        extension = os.path.splitext(REPORT_WRITERS[self.fmt].default_filename)[1]
+        return os.path.join(self.out_dir, REPORTS_DIR, entry["name"] + extension)
+
+    def _start(self, entry):
+        """检出（远程仓库）并开始扫描一个仓库"""
+        active = _ActiveRepository(entry)
+        try:
+            path = entry["repo"]
+            if is_remote_url(path):
+                checkout = active.stack.enter_context(checked_out_repository(
+                    path, ref=entry["ref"], **self.fetch_options
+                ))
+                path, active.commit = checkout["path"], checkout["commit"]
+            elif not os.path.isdir(path):
+                raise FileNotFoundError("仓库路径不存在")
+            active.report_path = self._report_path(entry)
+            directory = os.path.dirname(active.report_path)
+            fd, active.temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+            active.report = os.fdopen(fd, 'w', encoding='utf-8')
+            options = {"base_dir": path} if self.fmt == 'sarif' else {}
+            active.writer = get_report_writer(self.fmt, active.report, **options)
+            active.writer.begin()
+            active.results = iter_scan_repository(path, self.jobs, self.cache, executor=self.executor,
+                                                  ignore=IgnoreEngine(path, entry["exclude"]), limits=self.limits)
+        except Exception:
+            active.discard()
+            raise
+        return active
+
+    def _advance(self, active):
+        """处理至多 quantum 个文件，仓库扫描完成时返回 True"""
+        for _ in range(self.quantum):
+            file_info = next(active.results, None)
+            if file_info is None:
+                return True
+            active.files += 1
+            active.issue_types.update(issue.get('type', 'unknown') for issue in file_info['issues'])
+            active.writer.write_file(file_info)
+        return False
+
+    def _finish(self, active):
+        active.writer.finish()
+        active.report.close()
+        active.report = None
+        os.replace(active.temp_path, active.report_path)
+        active.stack.close()
+        result = _result(active.entry, "ok", time.perf_counter() - active.started, files=active.files,
+                         total_issues=sum(active.issue_types.values()), issue_types=dict(active.issue_types),
+                         report=active.report_path)
+        if active.commit:
+            result["commit"] = active.commit
+        return result
+
+    @profiling.profiled("fleet.run")
+    def run(self, resume=True):
+        """扫描全部仓库并返回汇总（同时写入 out_dir/fleet_summary.json）"""
+        os.makedirs(os.path.join(self.out_dir, REPORTS_DIR), exist_ok=True)
+        digest = manifest_digest(self.repositories)
+        checkpoint_path = os.path.join(self.out_dir, CHECKPOINT_FILE)
+        previous = _read_checkpoint(checkpoint_path, digest) if resume else None
+        completed = previous["completed"] if previous else {}
+        started = previous["started"] if previous else time.time()
+        sizes = previous_sizes(self.out_dir)
+        pending = deque(entry for entry in schedule_order(self.repositories, sizes)
+                        if entry["name"] not in completed)
+        results = dict(completed)
+        checkpoint = _Checkpoint(checkpoint_path, digest, started, completed)
+        active = deque()
+        scan_started = time.perf_counter()
+        if self.jobs > 1:
+            # 只有并行分析时才需要 multiprocessing，延迟导入以缩短启动时间
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+
+        def record(result):
+            results[result["name"]] = result
+            checkpoint.append(result)
+            if self.on_complete is not None:
+                self.on_complete(result, len(results), len(self.repositories))
+
+        try:
+            while pending or active:
+                while pending and len(active) < self.max_active:
+                    entry = pending.popleft()
+                    try:
+                        active.append(self._start(entry))
+                    except (OSError, RepositoryFetchError, GitError) as e:
+                        record(_result(entry, "error", 0, str(e)))
+                if not active:
+                    continue
+                current = active.popleft()
+                try:
+                    done = self._advance(current)
+                except (OSError, RepositoryFetchError, GitError) as e:
+                    current.discard()
+                    record(_result(current.entry, "error", time.perf_counter() - current.started, str(e)))
+                    continue
+                if done:
+                    record(self._finish(current))
+                else:
+                    active.append(current)
+        finally:
+            for current in active:
+                current.discard()
+            checkpoint.close()
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+
+        summary = summarize(self.repositories, results, started, time.perf_counter() - scan_started,
+                            resumed=len(completed))
+        _write_json_atomically(os.path.join(self.out_dir, SUMMARY_FILE), summary)
+        os.unlink(checkpoint_path)
+        return summary
+
+def summarize(repositories, results, started, seconds, resumed=0):
+    """汇总所有仓库的结果；results 按清单顺序列出"""
+    ordered = [results[entry["name"]] for entry in repositories if entry["name"] in results]
+    issue_types = Counter()
+    for result in ordered:
+        issue_types.update(result.get("issue_types", {}))
+    ok = [result for result in ordered if result["status"] == "ok"]
+    return {
+        "started": started,
+        "finished": time.time(),
+        "seconds": round(seconds, 3),
+        "repositories": len(repositories),
+        "scanned": len(ok),
+        "failed": len(ordered) - len(ok),
+        "resumed": resumed,
+        "files": sum(result.get("files", 0) for result in ordered),
+        "total_issues": sum(result.get("total_issues", 0) for result in ordered),
+        "issue_types": dict(issue_types.most_common()),
+        "top_repositories": [{"name": result["name"], "repo": result["repo"], "total_issues": result["total_issues"]}
+                             for result in sorted(ok, key=lambda result: -result["total_issues"])[:TOP_REPOSITORIES]],
+        "results": ordered
+    }
+
+def _write_json_atomically(path, value):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False, indent=2, default=json_default)
+    os.replace(temp_path, path)
+
+def scan_fleet(manifest_path, out_dir, resume=True, **options):
+    """读取清单并扫描其中所有仓库，返回汇总；options 传给 FleetScanner"""
+    return FleetScanner(load_manifest(manifest_path), out_dir, **options).run(resume=resume)
@@ -0,0 +1,90 @@
+import os
+import subprocess
+from .plugins import source_extensions
+
+class GitError(Exception):
+    """git 命令执行失败"""
+
+def _git(repo_path, *args):
+    """在仓库中执行 git 命令，返回标准输出（bytes）"""
+    try:
+        completed = subprocess.run(
+            ['git', '-C', repo_path] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+        )
+    except OSError as e:
+        raise GitError(f"无法执行 git: {e}")
+    if completed.returncode != 0:
+        raise GitError(completed.stderr.decode('utf-8', 'replace').strip() or f"git {args[0]} 失败")
+    return completed.stdout
+
+def _rev_parse(repo_path, rev):
+    return _git(repo_path, 'rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}").decode().strip()
+
+def head_commit(repo_path):
+    """返回 (HEAD 的提交哈希, 提交时间戳)，不是 git 仓库时抛出 GitError"""
+    sha, timestamp = _git(repo_path, 'log', '-1', '--format=%H %ct').decode().split()
+    return sha, int(timestamp)
+
+def _parse_name_status(output):
+    """解析 `git diff --name-status -z` 的输出，产出 (状态, 旧路径, 新路径)"""
+    fields = output.decode('utf-8', 'surrogateescape').split('\0')
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        if status[0] in ('R', 'C'):
+            yield status[0], fields[i + 1], fields[i + 2]
+            i += 3
+        else:
+            yield status[0], fields[i + 1], fields[i + 1]
+            i += 2
+
+def changed_files(repo_path, since=None, diff=None, extensions=None):
+    """列出两个版本之间变更的源码文件（仅使用本地 git，不访问网络）
+
+    since: 与该版本相比，工作区中变更的文件（含未提交和未跟踪的文件）；
+    diff:  "base..head" 或 "base...head"（相对合并基准），head 必须是当前检出的提交。
+    返回 {"changed": [...], "deleted": [...], "renamed": [(旧, 新), ...]}，
+    路径为 repo_path 下的完整路径；出错时返回 {"error": ...}。
+    extensions 默认为已注册插件支持的扩展名。
+    """
+    extensions = tuple(extensions) if extensions is not None else source_extensions()
+    try:
+        if since:
+            output = _git(repo_path, 'diff', '--name-status', '-z', '-M', '--relative', since)
+            untracked = _git(repo_path, 'ls-files', '--others', '--exclude-standard', '-z')
+        elif diff:
+            if '...' in diff:
+                base, head = diff.split('...', 1)
+            elif '..' in diff:
+                base, head = diff.split('..', 1)
+            else:
+                base, head = diff, 'HEAD'
+            head = head or 'HEAD'
+            if _rev_parse(repo_path, head) != _rev_parse(repo_path, 'HEAD'):
+                return {"error": f"{head} 不是当前检出的提交，请先检出后再分析"}
+            revisions = [f"{base}...{head}"] if '...' in diff else [base, head]
+            output = _git(repo_path, 'diff', '--name-status', '-z', '-M', '--relative', *revisions)
+            untracked = b''
+        else:
+            return {"error": "需要指定 since 或 diff"}
+    except GitError as e:
+        return {"error": f"git 执行失败: {e}"}
+
+    result = {"changed": [], "deleted": [], "renamed": []}
+    for status, old_path, new_path in _parse_name_status(output):
+        if status == 'D':
+            if old_path.endswith(extensions):
+                result["deleted"].append(os.path.join(repo_path, old_path))
+            continue
+        if status == 'R' and old_path.endswith(extensions):
+            result["renamed"].append((os.path.join(repo_path, old_path), os.path.join(repo_path, new_path)))
+        if new_path.endswith(extensions):
+            result["changed"].append(os.path.join(repo_path, new_path))
+
+    for path in untracked.decode('utf-8', 'surrogateescape').split('\0'):
+        if path and path.endswith(extensions):
+            result["changed"].append(os.path.join(repo_path, path))
+
+    result["changed"] = sorted(set(result["changed"]))
+    return result
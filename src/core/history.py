@@ -0,0 +1,286 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter, deque
+from analyzers import profiling
+from analyzers.issues import compact_issues
+from .file_limits import DEFAULT_LIMITS, SNIFF_BYTES
+from .git_changes import GitError, _git
+from .ignore import IgnoreEngine
+from .plugins import plugin_for
+from .scanner import BATCH_SIZE, MAX_PENDING_BATCHES_PER_JOB, _analyze_file
+
+# 普通文件的 git 对象模式（不含符号链接 120000 和子模块 160000）
+_FILE_MODES = frozenset(('100644', '100755'))
+# 等待分析结果的提交数上限，超出后先取回结果，限制内存中的文件列表数
+MAX_WAITING_COMMITS = 64
+# 超出大小限制的 blob 从 cat-file 管道中按块丢弃
+_DISCARD_CHUNK = 1024 * 1024
+
+def list_commits(repo_path, rev_range, max_count=None):
+    """返回 rev_range 中的提交 [(哈希, 提交时间戳)]，从旧到新；max_count 限制为最近的若干个"""
+    args = ['log', '--format=%H %ct', '--reverse']
+    if max_count:
+        args.append(f'--max-count={max_count}')
+    output = _git(repo_path, *args, rev_range, '--')
+    return [(sha, int(timestamp)) for sha, timestamp in (line.split() for line in output.decode().splitlines())]
+
+def _decode(path):
+    # 同一路径出现在许多提交的文件快照中，驻留后共享一个字符串对象
+    return sys.intern(path.decode('utf-8', 'surrogateescape'))
+
+def _list_tree(repo_path, commit):
+    """产出提交中普通文件的 (路径, blob 哈希)"""
+    for record in _git(repo_path, 'ls-tree', '-r', '-z', '--full-tree', commit).split(b'\0'):
+        if not record:
+            continue
+        info, _, path = record.partition(b'\t')
+        mode, kind, sha = info.decode().split()
+        if kind == 'blob' and mode in _FILE_MODES:
+            yield _decode(path), sys.intern(sha)
+
+def _diff_tree(repo_path, old, new):
+    """产出两个提交之间的变化 (路径, 新 blob 哈希)，删除或变为非普通文件时哈希为 None"""
+    fields = _git(repo_path, 'diff-tree', '-r', '-z', '--no-renames', '--no-commit-id', old, new).split(b'\0')
+    for i in range(0, len(fields) - 1, 2):
+        if not fields[i]:
+            break
+        _, new_mode, _, new_sha, status = fields[i].decode().lstrip(':').split()
+        path = _decode(fields[i + 1])
+        if status == 'D' or new_mode not in _FILE_MODES:
+            yield path, None
+        else:
+            yield path, sys.intern(new_sha)
+
+class BlobReader:
+    """通过一个常驻的 `git cat-file --batch` 进程读取 blob 内容"""
+
+    def __init__(self, repo_path):
+        try:
+            self._process = subprocess.Popen(['git', '-C', repo_path, 'cat-file', '--batch'],
+                                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as e:
+            raise GitError(f"无法执行 git: {e}")
+
+    def read(self, sha, max_bytes=0):
+        """返回 (大小, 内容)；超过 max_bytes（非 0）时内容为 None，不在内存中保留"""
+        self._process.stdin.write(sha.encode() + b'\n')
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError(f"无法读取对象: {sha}")
+        size = int(header[2])
+        if max_bytes and size > max_bytes:
+            remaining = size + 1
+            while remaining:
+                remaining -= len(self._process.stdout.read(min(remaining, _DISCARD_CHUNK)))
+            return size, None
+        data = self._process.stdout.read(size)
+        self._process.stdout.read(1)
+        return size, data
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+
+def _analyze_blobs(items, roles):
+    """在工作进程中分析一批 blob：写入临时文件（保留扩展名以选择语言插件）后执行各功能"""
+    directory = tempfile.mkdtemp(prefix='coderevive-blobs-')
+    try:
+        results = []
+        for sha, path, data in items:
+            file_path = os.path.join(directory, sha + os.path.splitext(path)[1])
+            with open(file_path, 'wb') as f:
+                f.write(data)
+            results.append({role: _analyze_file(file_path, role) for role in roles})
+            os.unlink(file_path)
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+class _HistoryAnalyzer:
+    """按 (blob 哈希, 语言) 分析并记住结果，调用方在它不再被引用时从 results 中移除
+
+    同一内容在不同语言的文件中（例如 a.py 和 b.js）由各自的分析器分析，结果分开保存。
+    """
+
+    def __init__(self, repo_path, jobs, cache, limits, roles):
+        self.jobs = jobs
+        self.cache = cache
+        self.limits = limits
+        self.roles = roles
+        self.results = {}
+        self.reader = BlobReader(repo_path)
+        self.executor = None
+        if jobs > 1:
+            # 只有并行分析时才需要 multiprocessing，延迟导入以缩短启动时间
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=jobs)
+        self.batch = []
+        self.futures = deque()
+        self.analyzed = 0
+
+    def _skipped(self, skipped):
+        return {role: ([skipped] if role == 'smells' else None) for role in self.roles}
+
+    def request(self, blob, path):
+        """安排分析一个 (blob 哈希, 语言)；已有结果（含缓存命中和被跳过的文件）时立即记录"""
+        size, data = self.reader.read(blob[0], self.limits.max_bytes)
+        skipped = self.limits.check_size(path, size)
+        if skipped is None and data is not None:
+            skipped = self.limits.check_head(data[:SNIFF_BYTES], size)
+        if skipped is not None:
+            self.results[blob] = self._skipped(skipped)
+            return
+        keys = None
+        if self.cache is not None:
+            plugin = plugin_for(path)
+            keys = {role: self.cache.make_key(data, plugin.kind(role)) for role in self.roles}
+            cached = {role: self.cache.get(key) for role, key in keys.items()}
+            cached['smells'] = compact_issues(cached['smells'])
+            if all(value is not None for value in cached.values()):
+                self.results[blob] = cached
+                return
+        self.analyzed += 1
+        self.batch.append((blob, path, data, keys))
+        if self.executor is None or len(self.batch) >= BATCH_SIZE:
+            self.submit()
+
+    def submit(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        items = [(blob[0], path, data) for blob, path, data, _ in batch]
+        if self.executor is None:
+            self._store(batch, _analyze_blobs(items, self.roles))
+            return
+        self.futures.append((batch, self.executor.submit(_analyze_blobs, items, self.roles)))
+        while len(self.futures) >= self.jobs * MAX_PENDING_BATCHES_PER_JOB:
+            self.collect()
+
+    def collect(self):
+        """取回最早提交的一批结果，没有进行中的任务时提交当前批次"""
+        if not self.futures:
+            self.submit()
+            if not self.futures:
+                return False
+        batch, future = self.futures.popleft()
+        self._store(batch, future.result())
+        return True
+
+    def _store(self, batch, results):
+        for (blob, _, _, keys), result in zip(batch, results):
+            self.results[blob] = result
+            if keys is not None:
+                for role, key in keys.items():
+                    self.cache.put(key, result[role])
+
+    def close(self):
+        # fork 出的工作进程继承了 cat-file 的管道，先结束它们，cat-file 才能读到输入结束
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.reader.close()
+
+def _commit_result(commit, commit_time, files, results, roles):
+    file_results = []
+    total_issues = 0
+    for path, blob in sorted(files.items()):
+        result = results[blob]
+        entry = {"path": path, "language": blob[1], "blob": blob[0], "issues": result['smells']}
+        if 'metrics' in roles and result['metrics'] is not None:
+            entry["metrics"] = result['metrics']
+        total_issues += len(entry["issues"])
+        file_results.append(entry)
+    return {"commit": commit, "time": commit_time, "files": file_results, "total_issues": total_issues}
+
+@profiling.profiled("history.scan")
+def iter_history(repo_path, rev_range, jobs=1, cache=None, limits=None, excludes=(), metrics=False,
+                 max_count=None, stats=None):
+    """按从旧到新的顺序逐个产出 rev_range 中每个提交的分析结果
+
+    直接从对象库读取树（ls-tree / diff-tree）和 blob（cat-file --batch），不检出工作区；
+    每个 blob 在仍被引用期间只分析一次（并按内容缓存），未变化的文件在之后的提交中直接复用结果，
+    因此耗时取决于不同 blob 的数量，而不是提交数 × 文件数；不再被引用的结果随即丢弃，内存不随
+    历史长度增长。jobs > 1 时在进程池中分析。
+    结果为 {"commit", "time", "total_issues", "files": [{"path", "language", "blob", "issues",
+    "metrics"（metrics=True 时）}]}；stats 为 dict 时累计 commits、blobs（读取的 blob 数）、
+    analyzed（实际分析的 blob 数）。
+    """
+    limits = limits or DEFAULT_LIMITS
+    roles = ('smells', 'metrics') if metrics else ('smells',)
+    ignore = IgnoreEngine(repo_path, excludes)
+    commits = list_commits(repo_path, rev_range, max_count)
+    stats = stats if stats is not None else {}
+    stats.update(commits=0, blobs=0, analyzed=0)
+
+    def wanted(path):
+        return plugin_for(path) is not None and not ignore.is_ignored_relpath(path)
+
+    analyzer = _HistoryAnalyzer(repo_path, jobs, cache, limits, roles)
+    files = {}
+    previous = None
+    # (blob 哈希, 语言) -> 当前文件快照和等待中的提交快照对它的引用数；降为 0 时丢弃其结果，
+    # 内存中只保留仍会用到的 blob。之后再次出现的 blob 重新请求（有缓存时直接命中）
+    refs = Counter()
+    # 等待分析结果的提交: (哈希, 时间, 文件快照, 尚未得到结果的 blob)
+    waiting = deque()
+
+    def release(blob):
+        refs[blob] -= 1
+        if not refs[blob]:
+            del refs[blob]
+            analyzer.results.pop(blob, None)
+
+    def finish(commit_info):
+        waiting.popleft()
+        stats["commits"] += 1
+        result = _commit_result(commit_info[0], commit_info[1], commit_info[2], analyzer.results, roles)
+        for blob in commit_info[2].values():
+            release(blob)
+        return result
+
+    try:
+        for commit, commit_time in commits:
+            changes = _list_tree(repo_path, commit) if previous is None else _diff_tree(repo_path, previous, commit)
+            # 旧 blob 在整个提交处理完后才释放，重命名或移动的文件不会被丢弃后重新分析
+            replaced = []
+            for path, sha in changes:
+                old = files.pop(path, None)
+                if old is not None:
+                    replaced.append(old)
+                if sha is not None and wanted(path):
+                    blob = (sha, plugin_for(path).language)
+                    files[path] = blob
+                    if blob not in refs:
+                        stats["blobs"] += 1
+                        analyzer.request(blob, path)
+                    refs[blob] += 1
+            for blob in replaced:
+                release(blob)
+            previous = commit
+            snapshot = dict(files)
+            refs.update(snapshot.values())
+            waiting.append((commit, commit_time, snapshot, {blob for blob in snapshot.values()
+                                                             if blob not in analyzer.results}))
+            while waiting:
+                commit_info = waiting[0]
+                commit_info[3].difference_update([blob for blob in commit_info[3] if blob in analyzer.results])
+                if commit_info[3]:
+                    if len(waiting) <= MAX_WAITING_COMMITS:
+                        break
+                    analyzer.collect()
+                    continue
+                yield finish(commit_info)
+        while waiting:
+            commit_info = waiting[0]
+            commit_info[3].difference_update([blob for blob in commit_info[3] if blob in analyzer.results])
+            if commit_info[3]:
+                analyzer.collect()
+                continue
+            yield finish(commit_info)
+    finally:
+        stats["analyzed"] = analyzer.analyzed
+        analyzer.close()
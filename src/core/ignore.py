@@ -0,0 +1,243 @@
+import os
+import re
+
+# 项目级排除规则文件（放在仓库根目录，语法同 .gitignore）
+PROJECT_IGNORE_FILE = '.coderevive-ignore'
+GITIGNORE_FILE = '.gitignore'
+# 默认排除：隐藏目录、虚拟环境、依赖、构建产物和缓存；可以在 .gitignore 或项目规则中用 "!" 重新包含
+DEFAULT_EXCLUDES = (
+    '.*/',
+    'venv/',
+    'node_modules/',
+    'bower_components/',
+    'vendor/',
+    'third_party/',
+    '__pycache__/',
+    'dist/',
+    'build/',
+    'site-packages/',
+    '*.egg-info/',
+)
+
+def _translate(pattern):
+    """把一条 gitignore 通配模式转换为正则表达式（* 和 ? 不匹配 /，** 匹配任意层目录）"""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/') \
+                    and (i + 2 == n or pattern[i + 2] == '/'):
+                if i + 2 == n:
+                    parts.append('.*')
+                    i += 2
+                else:
+                    parts.append('(?:.*/)?')
+                    i += 3
+                continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            parts.append('[^/]*')
+            continue
+        if c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = i + 1
+            if end < n and pattern[end] in '!^':
+                end += 1
+            if end < n and pattern[end] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                parts.append(f'[{body}]')
+                i = end
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+def _parse(line):
+    """解析一行规则，返回 (是否为否定规则, 是否只匹配目录, 正则)，空行和注释返回 None"""
+    line = line.rstrip('\r\n')
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    # 含有 "/"（结尾的除外）的模式相对规则文件所在目录，否则匹配任意层的名称
+    anchored = '/' in line
+    line = line.lstrip('/')
+    if not line:
+        return None
+    return negated, dir_only, ('' if anchored else '(?:.*/)?') + _translate(line)
+
+class IgnoreRules:
+    """一个规则文件（或一组规则）编译后的匹配器
+
+    连续的、类型相同（否定与否、是否只匹配目录）的规则合并为一个正则，
+    匹配时从后往前检查各组，第一个匹配的组决定结果（即最后一条匹配的规则生效）。
+    """
+
+    def __init__(self, lines, base=''):
+        self.base = base
+        groups = []
+        for line in lines:
+            rule = _parse(line)
+            if rule is None:
+                continue
+            negated, dir_only, regex = rule
+            if groups and groups[-1][:2] == [negated, dir_only]:
+                groups[-1][2].append(regex)
+            else:
+                groups.append([negated, dir_only, [regex]])
+        self._groups = [
+            (negated, dir_only, re.compile('|'.join(f'(?:{regex})' for regex in regexes)).fullmatch)
+            for negated, dir_only, regexes in reversed(groups)
+        ]
+
+    def __bool__(self):
+        return bool(self._groups)
+
+    def match(self, rel_path, is_dir=False):
+        """rel_path 为相对仓库根目录的 / 分隔路径；返回 True（排除）、False（重新包含）或 None（无规则匹配）"""
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        for negated, dir_only, fullmatch in self._groups:
+            if (is_dir or not dir_only) and fullmatch(rel_path):
+                return not negated
+        return None
+
+def read_rules(path, base=''):
+    """读取规则文件，文件不存在或无法读取时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            rules = IgnoreRules(f, base)
+    except OSError:
+        return None
+    return rules or None
+
+class IgnoreEngine:
+    """仓库遍历的排除规则：默认规则、项目规则、各级 .gitignore 和额外的排除模式
+
+    优先级从低到高为：DEFAULT_EXCLUDES、.git/info/exclude、仓库根目录的
+    .coderevive-ignore、各级 .gitignore（越深越优先）、excludes 参数。
+    被排除的目录在遍历时整体跳过，不再进入；stats 记录跳过的目录数以及
+    直接被规则排除的文件数和字节数（不统计被跳过目录内部的文件）。
+    """
+
+    def __init__(self, root, excludes=(), defaults=DEFAULT_EXCLUDES):
+        self.root = root
+        self._abs_root = os.path.abspath(root)
+        self._defaults = tuple(defaults)
+        self._base = self._load_base()
+        self.excludes = tuple(excludes)
+        self._override = IgnoreRules(self.excludes)
+        self._gitignores = {}
+        self.stats = {"skipped_dirs": 0, "skipped_files": 0, "skipped_bytes": 0}
+
+    def _load_base(self):
+        base = list(self._defaults)
+        for path in (os.path.join(self.root, '.git', 'info', 'exclude'), os.path.join(self.root, PROJECT_IGNORE_FILE)):
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    base.extend(f)
+            except OSError:
+                pass
+        return IgnoreRules(base)
+
+    def _decide(self, chain, rel_path, is_dir):
+        result = self._override.match(rel_path, is_dir)
+        if result is not None:
+            return result
+        for rules in reversed(chain):
+            result = rules.match(rel_path, is_dir)
+            if result is not None:
+                return result
+        return bool(self._base.match(rel_path, is_dir))
+
+    def _gitignore(self, rel_dir):
+        """is_ignored 使用的 .gitignore 缓存（遍历时直接读取，不缓存）"""
+        if rel_dir not in self._gitignores:
+            directory = os.path.join(self.root, *rel_dir.split('/')) if rel_dir else self.root
+            self._gitignores[rel_dir] = read_rules(os.path.join(directory, GITIGNORE_FILE), rel_dir)
+        return self._gitignores[rel_dir]
+
+    def invalidate(self):
+        """规则文件（.gitignore、.coderevive-ignore、.git/info/exclude）修改后重新读取规则"""
+        self._base = self._load_base()
+        self._gitignores.clear()
+
+    def is_ignored(self, path, is_dir=False):
+        """判断单个路径是否被排除（任何一级上级目录被排除时也算被排除），仓库外的路径返回 False"""
+        rel = os.path.relpath(os.path.abspath(path), self._abs_root)
+        if rel == '.' or rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return False
+        names = rel.split(os.sep)
+        chain = []
+        for depth in range(len(names)):
+            rules = self._gitignore('/'.join(names[:depth]))
+            if rules is not None:
+                chain.append(rules)
+            last = depth == len(names) - 1
+            if self._decide(chain, '/'.join(names[:depth + 1]), is_dir or not last):
+                return True
+        return False
+
+    def is_ignored_relpath(self, rel_path):
+        """只按默认规则、项目规则和 excludes 判断 / 分隔的相对路径，不访问文件系统（例如 git 历史中的路径）"""
+        names = rel_path.split('/')
+        for depth in range(1, len(names) + 1):
+            if self._decide((), '/'.join(names[:depth]), depth < len(names)):
+                return True
+        return False
+
+    def iter_files(self, extensions=None):
+        """按 os.walk（自顶向下）的顺序产出未被排除的文件路径，extensions 不为 None 时只产出这些扩展名的文件"""
+        stats = self.stats
+        stack = [(self.root, '', ())]
+        while stack:
+            directory, rel_dir, chain = stack.pop()
+            rules = read_rules(os.path.join(directory, GITIGNORE_FILE), rel_dir)
+            if rules is not None:
+                chain = chain + (rules,)
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if self._decide(chain, rel_path, True):
+                        stats["skipped_dirs"] += 1
+                    elif not entry.is_symlink():
+                        subdirs.append((entry.path, rel_path, chain))
+                    continue
+                if self._decide(chain, rel_path, False):
+                    stats["skipped_files"] += 1
+                    try:
+                        stats["skipped_bytes"] += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+                elif extensions is None or entry.name.endswith(extensions):
+                    yield entry.path
+            stack.extend(reversed(subdirs))
@@ -0,0 +1,339 @@
+import heapq
+import json
+import math
+import os
+import time
+from array import array
+from .scanner import _iter_analyzed
+
+try:
+    import numpy as np
+except ImportError:  # 未安装 NumPy 时用 array 和纯 Python 实现相同的查询，结果一致
+    np = None
+
+# 表名 -> ((列名, array/NumPy 类型码), ...)；每列一个只追加的二进制文件
+TABLES = {
+    "files": (
+        ("path", "I"),
+        ("cyclomatic_complexity", "I"),
+        ("maintainability_index", "f"),
+        ("lines_of_code", "I"),
+    ),
+    "functions": (
+        ("path", "I"),
+        ("function", "I"),
+        ("cyclomatic_complexity", "I"),
+        ("nesting_depth", "I"),
+        ("length", "I"),
+    ),
+}
+# 数值越小越差的指标（其余指标数值越大越差）
+LOWER_IS_WORSE = frozenset(("maintainability_index",))
+DEFAULT_PERCENTILES = (50, 90, 99)
+COMMITS_FILE = 'commits.jsonl'
+
+def _read_lines(path):
+    """读取 JSON Lines 文件；末尾写了一半的行（写入时中断）被截掉"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    end = data.rfind(b'\n') + 1
+    if end < len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+    return [json.loads(line) for line in data[:end].splitlines() if line]
+
+def _percentiles(values, qs):
+    """线性插值的百分位数（与 numpy.percentile 的默认方法相同），values 已排序"""
+    result = {}
+    for q in qs:
+        if not values:
+            result[q] = None
+            continue
+        position = (len(values) - 1) * q / 100
+        low = math.floor(position)
+        high = min(low + 1, len(values) - 1)
+        result[q] = round(float(values[low] + (values[high] - values[low]) * (position - low)), 3)
+    return result
+
+def _directory(path, depth):
+    parts = path.split('/')[:-1][:depth]
+    return '/'.join(parts) or '.'
+
+class _StringTable:
+    """字典编码的字符串表：每个字符串一行（JSON），行号即编号"""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = _read_lines(path)
+        self.ids = {value: i for i, value in enumerate(self.values)}
+        self._pending = []
+
+    def id(self, value):
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+            self._pending.append(value)
+        return index
+
+    def flush(self):
+        if self._pending:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(value, ensure_ascii=False) + '\n' for value in self._pending)
+            self._pending = []
+
+class MetricsStore:
+    """按提交、文件、函数记录复杂度指标的只追加列式存储
+
+    每次 append() 把一个提交的全部文件级和函数级指标追加到各列文件末尾，
+    同一提交的行在每张表中是连续的一段，commits.jsonl 记录各段的范围和
+    预先计算的汇总（用于趋势查询，只需读取这个小文件）。单个提交的查询只读取
+    相应的行段；安装了 NumPy 时用向量化运算，否则用 array 和纯 Python 实现。
+    只支持单个写入者；写入中断时，未写完提交记录的行在下次打开时被截掉。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._entries = _read_lines(os.path.join(directory, COMMITS_FILE))
+        self._by_commit = {entry["commit"]: entry for entry in self._entries}
+        self._paths = _StringTable(os.path.join(directory, 'paths.jsonl'))
+        self._functions = _StringTable(os.path.join(directory, 'functions.jsonl'))
+        self._directories = {}
+        # 截掉没有对应提交记录的行（上次写入中断）
+        for table, columns in TABLES.items():
+            rows = self._entries[-1][table][1] if self._entries else 0
+            for name, code in columns:
+                path = self._column_path(table, name)
+                size = rows * array(code).itemsize
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    with open(path, 'r+b') as f:
+                        f.truncate(size)
+
+    def _column_path(self, table, name):
+        return os.path.join(self.directory, f"{table}.{name}.bin")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, commit):
+        return commit in self._by_commit
+
+    def commits(self):
+        """按记录顺序返回 [{"commit", "time", "summary"}]"""
+        return [{"commit": entry["commit"], "time": entry["time"], "summary": entry["summary"]}
+                for entry in self._entries]
+
+    def trend(self, field="mean_complexity"):
+        """按记录顺序返回 [(提交, 时间, 汇总字段值)]，只读取提交记录"""
+        return [(entry["commit"], entry["time"], entry["summary"].get(field)) for entry in self._entries]
+
+    def append(self, commit, records, commit_time=None):
+        """追加一个提交的指标，返回 (文件行数, 函数行数)
+
+        records 为 {"path"（相对仓库根目录，/ 分隔）, "complexity": analyze_complexity 的结果,
+        "functions": analyze_function_complexity 的 "functions"（可省略）}；
+        复杂度分析失败的文件不记录。同一提交再次追加时，查询使用最后一次的结果。
+        """
+        columns = {table: {name: array(code) for name, code in spec} for table, spec in TABLES.items()}
+        files, functions = columns["files"], columns["functions"]
+        for record in records:
+            complexity = record.get("complexity") or {}
+            if "error" in complexity or "cyclomatic_complexity" not in complexity:
+                continue
+            path_id = self._paths.id(record["path"].replace(os.sep, '/'))
+            files["path"].append(path_id)
+            files["cyclomatic_complexity"].append(complexity["cyclomatic_complexity"])
+            files["maintainability_index"].append(complexity.get("maintainability_index", 0.0))
+            files["lines_of_code"].append(complexity.get("lines_of_code", 0))
+            for function in record.get("functions") or ():
+                functions["path"].append(path_id)
+                functions["function"].append(self._functions.id(function.get("qualname") or function["function"]))
+                functions["cyclomatic_complexity"].append(function["cyclomatic_complexity"])
+                functions["nesting_depth"].append(function.get("nesting_depth", 0))
+                functions["length"].append(function.get("length", 0))
+
+        entry = {"commit": commit, "time": time.time() if commit_time is None else commit_time}
+        for table, table_columns in columns.items():
+            start = self._entries[-1][table][1] if self._entries else 0
+            entry[table] = [start, start + len(table_columns["path"])]
+            for name, values in table_columns.items():
+                with open(self._column_path(table, name), 'ab') as f:
+                    values.tofile(f)
+        entry["summary"] = self._summarize(files, functions)
+        self._paths.flush()
+        self._functions.flush()
+        # 提交记录最后写入，它存在时对应的行一定已经写完
+        with open(os.path.join(self.directory, COMMITS_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._entries.append(entry)
+        self._by_commit[commit] = entry
+        return len(files["path"]), len(functions["path"])
+
+    @staticmethod
+    def _summarize(files, functions):
+        complexity = sorted(files["cyclomatic_complexity"])
+        function_complexity = sorted(functions["cyclomatic_complexity"])
+        count = len(complexity)
+        return {
+            "files": count,
+            "functions": len(function_complexity),
+            "lines_of_code": sum(files["lines_of_code"]),
+            "total_complexity": sum(complexity),
+            "mean_complexity": round(sum(complexity) / count, 3) if count else 0.0,
+            "p90_complexity": _percentiles(complexity, (90,))[90],
+            "mean_maintainability": round(sum(files["maintainability_index"]) / count, 3) if count else 0.0,
+            "p90_function_complexity": _percentiles(function_complexity, (90,))[90]
+        }
+
+    def _entry(self, commit):
+        if not self._entries:
+            raise KeyError("指标库中还没有记录")
+        if commit is None:
+            return self._entries[-1]
+        entry = self._by_commit.get(commit)
+        if entry is None:
+            # 支持唯一的提交哈希前缀
+            matches = {key for key in self._by_commit if key.startswith(commit)}
+            if len(matches) != 1:
+                raise KeyError(f"指标库中没有提交: {commit}")
+            entry = self._by_commit[matches.pop()]
+        return entry
+
+    def _read(self, table, name, entry):
+        """读取一个提交在某列的行段（NumPy 数组或 array）"""
+        code = dict(TABLES[table])[name]
+        start, end = entry[table]
+        itemsize = array(code).itemsize
+        with open(self._column_path(table, name), 'rb') as f:
+            if np is not None:
+                return np.fromfile(f, dtype=code, count=end - start, offset=start * itemsize)
+            values = array(code)
+            f.seek(start * itemsize)
+            values.fromfile(f, end - start)
+            return values
+
+    def _check_metric(self, table, metric):
+        if metric not in dict(TABLES[table]) or metric in ("path", "function"):
+            raise ValueError(f"未知的指标: {table}.{metric}")
+
+    def distribution(self, metric="cyclomatic_complexity", commit=None, table="files", qs=DEFAULT_PERCENTILES):
+        """一个提交中某指标的分布：{"count", "mean", "max", "percentiles": {q: 值}}"""
+        self._check_metric(table, metric)
+        values = self._read(table, metric, self._entry(commit))
+        if len(values) == 0:
+            return {"count": 0, "mean": None, "max": None, "percentiles": {q: None for q in qs}}
+        if np is not None:
+            percentiles = dict(zip(qs, (round(float(v), 3) for v in np.percentile(values.astype(np.float64), qs))))
+            mean, maximum = float(values.mean(dtype=np.float64)), float(values.max())
+        else:
+            ordered = sorted(values)
+            percentiles = _percentiles(ordered, qs)
+            mean, maximum = sum(ordered) / len(ordered), float(ordered[-1])
+        return {"count": len(values), "mean": round(mean, 3), "max": round(maximum, 3), "percentiles": percentiles}
+
+    def _keys(self, table, entry):
+        paths = self._read(table, "path", entry)
+        if table == "files":
+            return paths
+        functions = self._read(table, "function", entry)
+        if np is not None:
+            return (paths.astype(np.uint64) << np.uint64(32)) | functions.astype(np.uint64)
+        return list(zip(paths, functions))
+
+    def top_regressions(self, base, head=None, metric="cyclomatic_complexity", n=10, table="functions"):
+        """head 相对 base 退化最多的 n 个文件或函数（base 中不存在的按 0 计），按退化幅度排序
+
+        返回 [{"path", "function"（函数表）, "base", "head", "delta"}]，只包含确实变差的条目。
+        """
+        self._check_metric(table, metric)
+        base_entry, head_entry = self._entry(base), self._entry(head)
+        base_keys, head_keys = self._keys(table, base_entry), self._keys(table, head_entry)
+        base_values, head_values = self._read(table, metric, base_entry), self._read(table, metric, head_entry)
+        sign = -1.0 if metric in LOWER_IS_WORSE else 1.0
+
+        if np is not None:
+            before = np.zeros(len(head_keys), dtype=np.float64)
+            found = np.zeros(len(head_keys), dtype=bool)
+            if len(base_keys):
+                order = np.argsort(base_keys, kind='stable')
+                sorted_keys = base_keys[order]
+                positions = np.minimum(np.searchsorted(sorted_keys, head_keys), len(sorted_keys) - 1)
+                found = sorted_keys[positions] == head_keys
+                before = np.where(found, base_values[order][positions].astype(np.float64), 0.0)
+            deltas = (head_values.astype(np.float64) - before) * sign
+            rows = [int(i) for i in np.argsort(-deltas, kind='stable')[:n] if deltas[i] > 0]
+            before, found, deltas = before.tolist(), found.tolist(), deltas.tolist()
+        else:
+            # 同一键出现多次时取第一次（与 NumPy 的 searchsorted 一致）
+            lookup = dict(zip(reversed(base_keys), reversed(base_values)))
+            before = [lookup.get(key, 0.0) for key in head_keys]
+            found = [key in lookup for key in head_keys]
+            deltas = [(value - old) * sign for value, old in zip(head_values, before)]
+            rows = [i for i in heapq.nsmallest(n, range(len(deltas)), key=lambda i: (-deltas[i], i)) if deltas[i] > 0]
+
+        paths = self._read(table, "path", head_entry)
+        functions = self._read(table, "function", head_entry) if table == "functions" else None
+        result = []
+        for i in rows:
+            item = {"path": self._paths.values[int(paths[i])]}
+            if functions is not None:
+                item["function"] = self._functions.values[int(functions[i])]
+            item.update({
+                "base": round(float(before[i]), 3) if found[i] else None,
+                "head": round(float(head_values[i]), 3),
+                "delta": round(float(deltas[i]) * sign, 3)
+            })
+            result.append(item)
+        return result
+
+    def _directory_ids(self, depth):
+        """路径编号 -> (目录编号列表, 目录名列表)，随路径表增长增量更新"""
+        ids, names, lookup = self._directories.setdefault(depth, ([], [], {}))
+        for path in self._paths.values[len(ids):]:
+            directory = _directory(path, depth)
+            if directory not in lookup:
+                lookup[directory] = len(names)
+                names.append(directory)
+            ids.append(lookup[directory])
+        return ids, names
+
+    def directory_rollup(self, metric="lines_of_code", commit=None, depth=1):
+        """按目录（取前 depth 层）汇总一个提交的文件级指标：{目录: {"files", "sum", "mean", "max"}}"""
+        self._check_metric("files", metric)
+        entry = self._entry(commit)
+        paths, values = self._read("files", "path", entry), self._read("files", metric, entry)
+        ids, names = self._directory_ids(depth)
+        if np is not None:
+            directories = np.asarray(ids, dtype=np.int64)[paths]
+            counts = np.bincount(directories, minlength=len(names))
+            sums = np.bincount(directories, weights=values.astype(np.float64), minlength=len(names))
+            maxima = np.full(len(names), -np.inf)
+            np.maximum.at(maxima, directories, values.astype(np.float64))
+            present = np.nonzero(counts)[0].tolist()
+            counts, sums, maxima = counts.tolist(), sums.tolist(), maxima.tolist()
+        else:
+            counts, sums, maxima = [0] * len(names), [0.0] * len(names), [-math.inf] * len(names)
+            for path_id, value in zip(paths, values):
+                directory = ids[path_id]
+                counts[directory] += 1
+                sums[directory] += value
+                if value > maxima[directory]:
+                    maxima[directory] = value
+            present = [i for i, count in enumerate(counts) if count]
+        return {
+            names[i]: {"files": counts[i], "sum": round(sums[i], 3), "mean": round(sums[i] / counts[i], 3),
+                       "max": round(float(maxima[i]), 3)}
+            for i in sorted(present, key=lambda i: names[i])
+        }
+
+def record_metrics(store, commit, root, file_paths, jobs=1, cache=None, executor=None, limits=None, commit_time=None):
+    """分析 file_paths 的复杂度（结果按内容缓存），作为 commit 追加到 store，返回 (文件行数, 函数行数)"""
+    records = (
+        dict(metrics, path=os.path.relpath(file_path, root))
+        for file_path, metrics in _iter_analyzed(file_paths, jobs, cache, executor, role='metrics', limits=limits)
+    )
+    return store.append(commit, records, commit_time)
@@ -0,0 +1,158 @@
+import hashlib
+import importlib
+import importlib.util
+import os
+import sys
+
+# 第三方插件的入口点组：名称为扩展名（例如 ".rb"），值指向 LanguagePlugin 实例或返回它的函数
+ENTRY_POINT_GROUP = 'coderevive.plugins'
+
+class LanguagePlugin:
+    """一种语言的分析器和重构函数
+
+    各功能以 "模块:属性" 字符串（或直接以函数）给出，第一次使用时才导入对应模块，
+    只分析 Python 文件时不会导入 JavaScript 分析器，反之亦然。
+    smells(path) -> 问题列表，complexity(path) -> dict，function_complexity(path, top_n)，
+    fingerprints(path) -> 克隆检测指纹（见 analyzers.duplicate_detector），
+    refactor(path) / optimize(path) -> {"message", ...}；除 smells 和 complexity 外都可以省略。
+    """
+
+    def __init__(self, language, extensions, smells, complexity, function_complexity=None,
+                 refactor=None, optimize=None, optimize_label="优化", fingerprints=None):
+        self.language = language
+        self.extensions = tuple(extensions)
+        self.optimize_label = optimize_label
+        self._targets = {
+            "smells": smells,
+            "complexity": complexity,
+            "function_complexity": function_complexity,
+            "fingerprints": fingerprints,
+            "refactor": refactor,
+            "optimize": optimize
+        }
+        self._loaded = {}
+
+    def get(self, role):
+        """返回指定功能的函数（按需导入），插件未提供时返回 None"""
+        func = self._loaded.get(role)
+        if func is not None:
+            return func
+        target = self._targets[role]
+        if isinstance(target, str):
+            module_name, _, attr = target.partition(':')
+            target = getattr(importlib.import_module(module_name), attr)
+        if target is not None:
+            self._loaded[role] = target
+        return target
+
+    def kind(self, role):
+        """分析结果缓存使用的类别名，例如 python_smells"""
+        return f"{self.language}_{role}"
+
+    def source_digest(self):
+        """对提供分析功能的模块源码取哈希（不导入模块），分析代码变化时缓存随之失效"""
+        digest = hashlib.sha256(self.language.encode('utf-8'))
+        for role in _ANALYSIS_ROLES:
+            target = self._targets[role]
+            if target is None:
+                continue
+            if isinstance(target, str):
+                module_name = target.partition(':')[0]
+                spec = importlib.util.find_spec(module_name)
+                origin = spec.origin if spec is not None else None
+            else:
+                module_name = getattr(target, '__module__', None) or ''
+                origin = getattr(sys.modules.get(module_name), '__file__', None)
+            digest.update(f"{role}={module_name}".encode('utf-8'))
+            if origin and os.path.isfile(origin):
+                with open(origin, 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+# 结果会被缓存的功能；refactor / optimize 不影响分析结果
+_ANALYSIS_ROLES = ("smells", "complexity", "function_complexity", "fingerprints")
+
+# 扩展名 -> LanguagePlugin；第三方入口点在解析前保存为 EntryPoint
+PLUGINS = {}
+# 入口点扩展名 -> 提供它的发行包 "名称==版本"
+_DISTRIBUTIONS = {}
+_entry_points_loaded = False
+
+def register_plugin(plugin):
+    """注册语言插件，对其声明的所有扩展名生效（后注册的覆盖先注册的）"""
+    for extension in plugin.extensions:
+        PLUGINS[extension] = plugin
+        _DISTRIBUTIONS.pop(extension, None)
+
+def _load_entry_points():
+    """登记已安装包声明的插件入口点；只读取元数据，插件模块在第一次使用时才导入"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    from importlib.metadata import entry_points
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if PLUGINS.setdefault(entry_point.name, entry_point) is entry_point:
+            dist = getattr(entry_point, 'dist', None)
+            _DISTRIBUTIONS[entry_point.name] = f"{dist.name}=={dist.version}" if dist else entry_point.value
+
+def _resolve(extension):
+    plugin = PLUGINS.get(extension)
+    if plugin is None or isinstance(plugin, LanguagePlugin):
+        return plugin
+    loaded = plugin.load()
+    if not isinstance(loaded, LanguagePlugin):
+        loaded = loaded()
+    for other in loaded.extensions:
+        if PLUGINS.get(other) is plugin or other not in PLUGINS:
+            PLUGINS[other] = loaded
+    PLUGINS[extension] = loaded
+    return loaded
+
+def plugin_for(file_path):
+    """返回处理该文件的插件，不支持的文件返回 None"""
+    extension = os.path.splitext(file_path)[1]
+    if extension not in PLUGINS:
+        _load_entry_points()
+    return _resolve(extension)
+
+def source_extensions():
+    """所有已注册（含第三方）插件支持的扩展名"""
+    _load_entry_points()
+    return tuple(PLUGINS)
+
+def is_source_file(file_path):
+    return os.path.splitext(file_path)[1] in source_extensions()
+
+def plugins_version():
+    """所有插件的版本指纹：入口点插件取发行包版本（不导入插件），其余取分析模块的源码哈希"""
+    _load_entry_points()
+    digest = hashlib.sha256()
+    for extension in sorted(PLUGINS):
+        plugin = PLUGINS[extension]
+        if extension in _DISTRIBUTIONS:
+            version = _DISTRIBUTIONS[extension]
+        else:
+            version = plugin.source_digest()
+        digest.update(f"{extension}:{version}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+register_plugin(LanguagePlugin(
+    "python", ('.py',),
+    smells='analyzers.python_analyzer:detect_code_smells',
+    complexity='analyzers.python_analyzer:analyze_complexity',
+    function_complexity='analyzers.python_analyzer:analyze_function_complexity',
+    fingerprints='analyzers.duplicate_detector:fingerprint_python',
+    refactor='refactors.python_refactor:refactor_long_methods',
+    optimize='refactors.python_refactor:optimize_imports',
+    optimize_label="导入优化"
+))
+register_plugin(LanguagePlugin(
+    "javascript", ('.js',),
+    smells='analyzers.javascript_analyzer:detect_code_smells',
+    complexity='analyzers.javascript_analyzer:analyze_complexity',
+    fingerprints='analyzers.duplicate_detector:fingerprint_javascript',
+    refactor='refactors.javascript_refactor:refactor_long_methods',
+    optimize='refactors.javascript_refactor:optimize_variables',
+    optimize_label="变量优化"
+))
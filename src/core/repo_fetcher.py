@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from contextlib import contextmanager
+from .ignore import GITIGNORE_FILE, PROJECT_IGNORE_FILE
+from .plugins import source_extensions
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有 fcntl，退化为不加锁
+    fcntl = None
+
+DEFAULT_REPO_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'coderevive', 'repos')
+# 稀疏检出时除源码外还保留的文件：排除规则（任意目录下的 .gitignore 和项目规则）
+SPARSE_EXTRA_PATTERNS = (GITIGNORE_FILE, PROJECT_IGNORE_FILE)
+REMOTE_PREFIXES = ('http://', 'https://', 'file://', 'ssh://', 'git://')
+_SCP_LIKE_URL = re.compile(r'^[\w.-]+@[\w.-]+:')
+
+class RepositoryFetchError(Exception):
+    """远程仓库获取或检出失败"""
+
+def is_remote_url(repo_path):
+    """判断是否为需要通过 git 获取的远程仓库地址"""
+    return repo_path.startswith(REMOTE_PREFIXES) or bool(_SCP_LIKE_URL.match(repo_path))
+
+def _repo_key(url):
+    """为仓库地址生成稳定且可读的目录名"""
+    name = url.rstrip('/').rsplit('/', 1)[-1].rsplit(':', 1)[-1]
+    if name.endswith('.git'):
+        name = name[:-4]
+    name = re.sub(r'[^\w.-]', '_', name)[:40] or 'repo'
+    return f"{name}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}"
+
+def _git_env(token):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    if token:
+        # 通过环境变量传递认证头，令牌不会出现在命令行或仓库配置中；
+        # git 子进程（例如部分克隆按需获取对象）会继承这些配置
+        credentials = base64.b64encode(f"x-access-token:{token}".encode('utf-8')).decode('ascii')
+        env.update({
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.extraHeader',
+            'GIT_CONFIG_VALUE_0': f"Authorization: Basic {credentials}"
+        })
+    return env
+
+def _git(args, token=None):
+    completed = subprocess.run(['git'] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=_git_env(token), check=False)
+    if completed.returncode != 0:
+        message = completed.stderr.decode('utf-8', 'replace').strip()
+        raise RepositoryFetchError(message or f"git {args[0]} 失败")
+    return completed.stdout.decode('utf-8', 'replace').strip()
+
+@contextmanager
+def _locked(lock_path):
+    """对单个仓库加排他锁，避免并发运行同时更新镜像或工作区"""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _update_mirror(mirror, url, depth, token):
+    """创建或增量更新本地裸镜像（浅获取，文件内容按需获取）"""
+    if not os.path.isdir(mirror):
+        _git(['init', '-q', '--bare', mirror])
+    _git(['-C', mirror, 'config', 'remote.origin.url', url])
+    args = ['-C', mirror, 'fetch', '-q', '--prune', '--filter=blob:none']
+    if depth:
+        args.append(f'--depth={depth}')
+    _git(args + ['origin', '+refs/heads/*:refs/remotes/origin/*'], token)
+
+def _verify_commit(mirror, rev):
+    try:
+        return _git(['-C', mirror, 'rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}"])
+    except RepositoryFetchError:
+        return None
+
+def _resolve_commit(mirror, ref, depth, token):
+    """解析要检出的提交：指定分支/标签/提交，或远程默认分支
+
+    返回 (提交, 分支名)；ref 为标签或提交时分支名为 None。
+    """
+    if ref:
+        commit = _verify_commit(mirror, f"refs/remotes/origin/{ref}")
+        if commit:
+            return commit, ref
+        commit = _verify_commit(mirror, ref)
+        if commit:
+            return commit, None
+        # 标签或不在分支头上的提交需要单独获取
+        args = ['-C', mirror, 'fetch', '-q', '--filter=blob:none']
+        if depth:
+            args.append(f'--depth={depth}')
+        _git(args + ['origin', ref], token)
+        commit = _verify_commit(mirror, 'FETCH_HEAD')
+        if commit:
+            return commit, None
+        raise RepositoryFetchError(f"找不到版本: {ref}")
+
+    head = _git(['-C', mirror, 'ls-remote', '--symref', 'origin', 'HEAD'], token)
+    match = re.match(r'ref: refs/heads/(\S+)\s+HEAD', head)
+    branches = [match.group(1)] if match else []
+    for branch in branches + ['main', 'master']:
+        commit = _verify_commit(mirror, f"refs/remotes/origin/{branch}")
+        if commit:
+            return commit, branch
+    raise RepositoryFetchError("无法确定远程仓库的默认分支")
+
+def _checkout(mirror, worktree, commit, patterns, token):
+    """在可复用的工作区中稀疏检出指定提交
+
+    复用的工作区的模式与 patterns 不同（例如之后安装了新的语言插件）时重新设置。
+    """
+    if not os.path.exists(os.path.join(worktree, '.git')):
+        _git(['-C', mirror, 'worktree', 'prune'])
+        if os.path.exists(worktree):
+            shutil.rmtree(worktree)
+        _git(['-C', mirror, 'worktree', 'add', '-q', '--no-checkout', '--detach', worktree, commit], token)
+        current = None
+    else:
+        current = _git(['-C', worktree, 'sparse-checkout', 'list']).splitlines()
+    if current != list(patterns):
+        _git(['-C', worktree, 'sparse-checkout', 'set', '--no-cone'] + list(patterns), token)
+    _git(['-C', worktree, 'checkout', '-q', '--detach', '--force', commit], token)
+    _git(['-C', worktree, 'clean', '-q', '-ffdx'])
+
+def sparse_patterns():
+    """稀疏检出的模式：所有已注册（含第三方）插件的扩展名和排除规则文件"""
+    return tuple(f"*{extension}" for extension in source_extensions()) + SPARSE_EXTRA_PATTERNS
+
+@contextmanager
+def checked_out_repository(url, ref=None, token=None, cache_dir=None, depth=1, patterns=None):
+    """获取远程仓库并检出到本地工作区，在 with 块内持有该仓库的锁
+
+    每个仓库保留一个本地裸镜像，后续运行只做增量获取；工作区只稀疏检出
+    patterns（默认为 sparse_patterns()）匹配的文件并在多次运行间复用。产出 {"path", "commit", "branch",
+    "mirror"}，branch 为检出的远程分支（ref 为标签或提交时为 None）；失败时抛出 RepositoryFetchError。
+    """
+    cache_dir = cache_dir or DEFAULT_REPO_CACHE_DIR
+    patterns = patterns or sparse_patterns()
+    key = _repo_key(url)
+    mirror = os.path.join(cache_dir, 'mirrors', f"{key}.git")
+    worktree = os.path.join(cache_dir, 'worktrees', key)
+
+    with _locked(os.path.join(cache_dir, 'locks', f"{key}.lock")):
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+        os.makedirs(os.path.dirname(worktree), exist_ok=True)
+        _update_mirror(mirror, url, depth, token)
+        commit, branch = _resolve_commit(mirror, ref, depth, token)
+        _checkout(mirror, worktree, commit, patterns, token)
+        yield {"path": worktree, "commit": commit, "branch": branch, "mirror": mirror}
+
+def fetch_repository(url, ref=None, token=None, cache_dir=None, depth=1, patterns=None):
+    """获取远程仓库到本地工作区，返回 {"status", "path", "commit", "branch", "mirror"} 或错误信息"""
+    try:
+        with checked_out_repository(url, ref, token, cache_dir, depth, patterns) as checkout:
+            return dict(checkout, status="success")
+    except (RepositoryFetchError, OSError) as e:
+        return {"status": "error", "message": f"获取仓库失败: {e}"}
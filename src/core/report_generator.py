@@ -1,45 +1,58 @@
+from analyzers.profiling import profiled
+
+SECTION_TITLES = {
+    "python": "--- Python文件分析 ---",
+    "javascript": "--- JavaScript文件分析 ---"
+}
+
+def section_title(language):
+    return SECTION_TITLES.get(language) or f"--- {language} 文件分析 ---"
+
+def format_file_issues(file_info):
+    """格式化单个文件的问题列表"""
+    lines = [f"文件: {file_info['path']}"]
+    for issue in file_info['issues']:
+        lines.append(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message', 'No message')}")
+    lines.append("")
+    return lines
+
+def format_suggestions(total_issues):
+    """格式化报告末尾的重构建议"""
+    lines = ["--- 重构建议 ---"]
+    if total_issues == 0:
+        lines.append("未发现明显的代码异味，代码质量良好！")
+    else:
+        lines.append("建议优先处理以下问题:")
+        lines.append("1. 拆分过长的函数，每个函数保持单一职责")
+        lines.append("2. 移除重复的导入和变量声明")
+        lines.append("3. 优化复杂的条件逻辑")
+    return lines
+
+@profiled("report.generate")
 def generate_report(scan_results):
     """生成代码分析报告"""
     if "error" in scan_results:
         return f"错误: {scan_results['error']}"
-    
+
     report = []
     report.append("=== 代码重构分析报告 ===")
     report.append(f"总问题数: {scan_results['total_issues']}")
     report.append("")
-    
-    # Python文件分析
-    if scan_results['python_files']:
-        report.append("--- Python文件分析 ---")
-        report.append(f"发现问题的文件数: {len(scan_results['python_files'])}")
-        report.append("")
-        
-        for file_info in scan_results['python_files']:
-            report.append(f"文件: {file_info['path']}")
-            for issue in file_info['issues']:
-                report.append(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message', 'No message')}")
-            report.append("")
-    
-    # JavaScript文件分析
-    if scan_results['javascript_files']:
-        report.append("--- JavaScript文件分析 ---")
-        report.append(f"发现问题的文件数: {len(scan_results['javascript_files'])}")
-        report.append("")
-        
-        for file_info in scan_results['javascript_files']:
-            report.append(f"文件: {file_info['path']}")
-            for issue in file_info['issues']:
-                report.append(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message', 'No message')}")
+
+    languages = list(SECTION_TITLES)
+    languages += sorted(key[:-len("_files")] for key in scan_results
+                        if key.endswith("_files") and key[:-len("_files")] not in SECTION_TITLES)
+    for language in languages:
+        files = scan_results.get(f"{language}_files")
+        if files:
+            report.append(section_title(language))
+            report.append(f"发现问题的文件数: {len(files)}")
             report.append("")
-    
+
+            for file_info in files:
+                report.extend(format_file_issues(file_info))
+
     # 总结建议
-    report.append("--- 重构建议 ---")
-    if scan_results['total_issues'] == 0:
-        report.append("未发现明显的代码异味，代码质量良好！")
-    else:
-        report.append("建议优先处理以下问题:")
-        report.append("1. 拆分过长的函数，每个函数保持单一职责")
-        report.append("2. 移除重复的导入和变量声明")
-        report.append("3. 优化复杂的条件逻辑")
-    
-    return "\n".join(report)
\ No newline at end of file
+    report.extend(format_suggestions(scan_results['total_issues']))
+
+    return "\n".join(report)
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import tempfile
+from analyzers.profiling import profiled
+from .report_generator import SECTION_TITLES, format_file_issues, format_suggestions, section_title
+
+# 写入器在内存中累积的字符数上限，超过后写入底层文件
+DEFAULT_BUFFER_SIZE = 64 * 1024
+# 文本报告每个语言分节在内存中缓冲的上限，超出后转存到临时文件
+SECTION_SPOOL_BYTES = 1024 * 1024
+
+RULE_DESCRIPTIONS = {
+    "long_function": "函数过长",
+    "duplicate_import": "重复导入",
+    "duplicate_variable": "重复声明变量",
+    "duplicate_code": "重复代码",
+    "similar_file": "相似文件",
+    "skipped_file": "未分析的文件（过大、压缩或生成）",
+    "error": "分析失败"
+}
+
+# SARIF 结果级别，未列出的规则为 warning
+SARIF_LEVELS = {"error": "error", "skipped_file": "note"}
+
+class ReportWriter:
+    """报告写入器基类
+
+    调用顺序为 begin() → write_file()（每个文件一次）→ finish()，
+    写入内容先在内存中缓冲，达到 buffer_size 后批量写入 out，不保存完整报告。
+    """
+    default_filename = "code_refactor_report.txt"
+
+    def __init__(self, out, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.out = out
+        self.buffer_size = buffer_size
+        self.summary = {"total_issues": 0, "python_files": 0, "javascript_files": 0}
+        self._buffer = []
+        self._buffered = 0
+
+    def _write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.out.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def begin(self):
+        pass
+
+    @profiled("report.write_file")
+    def write_file(self, file_info):
+        """写入单个文件的结果 {"path", "language", "issues"}，没有问题的文件会被跳过"""
+        if not file_info['issues']:
+            return
+        self.summary["total_issues"] += len(file_info['issues'])
+        key = f"{file_info['language']}_files"
+        self.summary[key] = self.summary.get(key, 0) + 1
+        self._write_file(file_info)
+
+    def _write_file(self, file_info):
+        raise NotImplementedError
+
+    def finish(self):
+        self.flush()
+
+    def write_all(self, file_results):
+        """消费逐文件结果并写出完整报告，返回汇总信息"""
+        self.begin()
+        for file_info in file_results:
+            self.write_file(file_info)
+        self.finish()
+        return self.summary
+
+class TextReportWriter(ReportWriter):
+    """人类可读的文本报告，格式与 generate_report 相同
+
+    各语言分节先写入内存/临时文件缓冲，结束后再拼接，以便在开头写出总数。
+    """
+
+    def begin(self):
+        self._sections = {}
+
+    def _write_file(self, file_info):
+        language = file_info['language']
+        section = self._sections.get(language)
+        if section is None:
+            section = self._sections[language] = tempfile.SpooledTemporaryFile(
+                max_size=SECTION_SPOOL_BYTES, mode='w+', encoding='utf-8'
+            )
+        section.write("\n".join(format_file_issues(file_info)) + "\n")
+
+    def finish(self):
+        try:
+            self._write("=== 代码重构分析报告 ===\n")
+            self._write(f"总问题数: {self.summary['total_issues']}\n\n")
+            # 内置语言在前，插件提供的其他语言按名称排序
+            languages = [language for language in SECTION_TITLES if language in self._sections]
+            languages += sorted(language for language in self._sections if language not in SECTION_TITLES)
+            for language in languages:
+                section = self._sections[language]
+                self._write(f"{section_title(language)}\n")
+                self._write(f"发现问题的文件数: {self.summary[f'{language}_files']}\n\n")
+                self.flush()
+                section.seek(0)
+                shutil.copyfileobj(section, self.out)
+            self._write("\n".join(format_suggestions(self.summary['total_issues'])))
+            self.flush()
+        finally:
+            for section in self._sections.values():
+                section.close()
+
+class JsonLinesReportWriter(ReportWriter):
+    """JSON Lines 报告：每个问题一行，最后一行为汇总"""
+    default_filename = "code_refactor_report.jsonl"
+
+    def _write_file(self, file_info):
+        for issue in file_info['issues']:
+            record = {"record": "issue", "path": file_info['path'], "language": file_info['language']}
+            record.update(issue)
+            self._write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def finish(self):
+        record = {"record": "summary"}
+        record.update(self.summary)
+        self._write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.flush()
+
+class SarifReportWriter(ReportWriter):
+    """SARIF 2.1.0 报告
+
+    results 数组边分析边写出；规则列表（tool 节点）在结束时写在 results 之后。
+    base_dir 用于把文件路径转换为相对 URI。
+    """
+    default_filename = "code_refactor_report.sarif"
+
+    def __init__(self, out, buffer_size=DEFAULT_BUFFER_SIZE, base_dir=None):
+        super().__init__(out, buffer_size)
+        self.base_dir = base_dir
+        self._rules = {}
+        self._first_result = True
+
+    def begin(self):
+        self._write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+                    '"runs": [{"results": [')
+
+    def _uri(self, path):
+        if self.base_dir and not path.startswith(('http://', 'https://')):
+            path = os.path.relpath(path, self.base_dir)
+        return path.replace(os.sep, '/')
+
+    def _write_file(self, file_info):
+        uri = self._uri(file_info['path'])
+        for issue in file_info['issues']:
+            rule_id = issue.get('type', 'unknown')
+            self._rules.setdefault(rule_id, RULE_DESCRIPTIONS.get(rule_id, rule_id))
+            location = {"physicalLocation": {"artifactLocation": {"uri": uri}}}
+            line = issue.get('line')
+            if isinstance(line, int) and line >= 1:
+                location["physicalLocation"]["region"] = {"startLine": line}
+                end_line = issue.get('end_line')
+                if isinstance(end_line, int) and end_line >= line:
+                    location["physicalLocation"]["region"]["endLine"] = end_line
+            result = {
+                "ruleId": rule_id,
+                "level": SARIF_LEVELS.get(rule_id, "warning"),
+                "message": {"text": issue.get('message', rule_id)},
+                "locations": [location]
+            }
+            self._write(("" if self._first_result else ", ") + json.dumps(result, ensure_ascii=False))
+            self._first_result = False
+
+    def finish(self):
+        driver = {
+            "name": "CodeRevive",
+            "rules": [{"id": rule_id, "shortDescription": {"text": text}} for rule_id, text in self._rules.items()]
+        }
+        self._write('], "tool": {"driver": ' + json.dumps(driver, ensure_ascii=False) + '}}]}\n')
+        self.flush()
+
+REPORT_WRITERS = {
+    "text": TextReportWriter,
+    "jsonl": JsonLinesReportWriter,
+    "sarif": SarifReportWriter
+}
+
+def register_report_writer(name, writer_class):
+    """注册自定义报告格式"""
+    REPORT_WRITERS[name] = writer_class
+
+def get_report_writer(fmt, out, **options):
+    """按格式名创建报告写入器"""
+    if fmt not in REPORT_WRITERS:
+        raise ValueError(f"不支持的报告格式: {fmt}")
+    return REPORT_WRITERS[fmt](out, **options)
+
+def write_report(file_results, out, fmt='text', **options):
+    """以指定格式流式写出报告，返回汇总信息"""
+    return get_report_writer(fmt, out, **options).write_all(file_results)
@@ -1,66 +1,252 @@
 import os
-from analyzers import detect_python_smells, detect_javascript_smells
+from collections import deque
+from time import perf_counter
+from analyzers import profiling
+from analyzers.issues import compact_issues
+from .file_limits import DEFAULT_LIMITS
+from .ignore import IgnoreEngine
+from .plugins import plugin_for, source_extensions
+from .repo_fetcher import checked_out_repository, is_remote_url, RepositoryFetchError
 
-def scan_repository(repo_path):
-    """扫描仓库中的所有代码文件"""
+# 每个进程池任务包含的文件数，以及每个工作进程允许排队的任务数（限制内存占用）
+BATCH_SIZE = 16
+MAX_PENDING_BATCHES_PER_JOB = 2
+
+def _file_metrics(file_path):
+    """文件级复杂度和函数级指标（插件提供 function_complexity 时），供指标库记录"""
+    plugin = plugin_for(file_path)
+    metrics = {"complexity": plugin.get('complexity')(file_path), "functions": []}
+    function_complexity = plugin.get('function_complexity')
+    if function_complexity is not None:
+        metrics["functions"] = function_complexity(file_path).get("functions", [])
+    return metrics
+
+def _analyze_file(file_path, role='smells'):
+    """分析单个文件，返回问题列表（role 为其他插件功能时返回该功能的结果）"""
+    if role == 'metrics':
+        return _file_metrics(file_path)
+    if role != 'smells':
+        return plugin_for(file_path).get(role)(file_path)
+    detect_smells = plugin_for(file_path).get('smells')
+    profiler = profiling.active()
+    if profiler is None:
+        return detect_smells(file_path)
+
+    started = perf_counter()
+    issues = detect_smells(file_path)
+    elapsed = perf_counter() - started
+    size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    profiler.add_time("scan.analyze_file", elapsed)
+    profiler.count("scan.analyzed_files")
+    profiler.count("scan.bytes", size)
+    profiler.record_file(file_path, elapsed, size)
+    return issues
+
+def _analyze_batch(file_paths, profile=False, role='smells'):
+    """在工作进程中分析一批文件，返回 (问题列表, 性能分析快照或 None)"""
+    if not profile:
+        return [_analyze_file(file_path, role) for file_path in file_paths], None
+    profiler = profiling.enable()
+    try:
+        return [_analyze_file(file_path, role) for file_path in file_paths], profiler.snapshot()
+    finally:
+        profiling.disable()
+
+def _iter_source_files(repo_path, ignore=None):
+    """按 os.walk 顺序列出需要分析的文件（已注册插件支持的扩展名），跳过 ignore 规则排除的文件和目录"""
+    if ignore is None:
+        ignore = IgnoreEngine(repo_path)
+    return ignore.iter_files(source_extensions())
+
+def _iter_batches(file_paths, batch_size):
+    batch = []
+    for file_path in file_paths:
+        batch.append(file_path)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class _Batch:
+    """提交到进程池的一批未命中缓存的文件"""
+    __slots__ = ('paths', 'future')
+
+    def __init__(self):
+        self.paths = []
+        self.future = None
+
+def _cache_lookup(cache, file_path, role='smells'):
+    """返回 (缓存键, 缓存的问题列表)，未启用缓存或未命中时问题列表为 None"""
+    if cache is None:
+        return None, None
+    key = cache.key_for_file(file_path, plugin_for(file_path).kind(role))
+    if key is None:
+        return None, None
+    cached = cache.get(key)
+    return key, (compact_issues(cached) if role == 'smells' else cached)
+
+def _iter_analyzed(file_paths, jobs, cache=None, executor=None, role='smells', limits=None):
+    """按输入顺序产出 (文件路径, 问题列表)，jobs > 1 时使用进程池
+
+    传入 executor 时使用这个已有的（常驻）进程池且不关闭它；生成器提前关闭时
+    只取消本次提交但尚未开始的任务。role 指定执行的插件功能（默认为代码异味检测），
+    结果按内容哈希缓存在该功能对应的缓存类别下。
+    超出 limits（FileLimits，默认 DEFAULT_LIMITS）的文件不读取全文也不分发：
+    代码异味检测产出一条 skipped_file 问题，其他功能直接略过该文件。
+    """
+    limits = limits or DEFAULT_LIMITS
+    shared = executor is not None
+    if jobs <= 1 and not shared:
+        for file_path in file_paths:
+            skipped = limits.check(file_path)
+            if skipped is not None:
+                if role == 'smells':
+                    yield file_path, [skipped]
+                continue
+            key, issues = _cache_lookup(cache, file_path, role)
+            if issues is None:
+                issues = _analyze_file(file_path, role)
+                if key is not None:
+                    cache.put(key, issues)
+            yield file_path, issues
+        return
+
+    if not shared:
+        # 只有并行分析时才需要 multiprocessing，延迟导入以缩短启动时间
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    jobs = max(jobs, 1)
+    # 工作进程中单独收集性能数据，随结果传回主进程合并
+    profiler = profiling.active()
+    # 待产出的条目: (文件路径, 缓存键, 已有结果, 所属批次, 批内序号)
+    pending = deque()
+    batch = _Batch()
+    in_flight = 0
+    max_in_flight = jobs * MAX_PENDING_BATCHES_PER_JOB
+    max_pending = max_in_flight * BATCH_SIZE * 2
+
+    def drain_one():
+        nonlocal batch, in_flight
+        file_path, key, issues, owner, index = pending.popleft()
+        if issues is None:
+            if owner.future is None:
+                # 当前批次尚未提交，先提交再等待，保证输出顺序
+                owner.future = executor.submit(_analyze_batch, owner.paths, profiler is not None, role)
+                batch = _Batch()
+                in_flight += 1
+            results, snapshot = owner.future.result()
+            issues = results[index]
+            if index == len(results) - 1:
+                in_flight -= 1
+                if snapshot is not None:
+                    profiler.merge(snapshot)
+            if key is not None:
+                cache.put(key, issues)
+        return file_path, issues
+
+    try:
+        for file_path in file_paths:
+            skipped = limits.check(file_path)
+            if skipped is not None:
+                if role == 'smells':
+                    pending.append((file_path, None, [skipped], None, 0))
+            else:
+                key, issues = _cache_lookup(cache, file_path, role)
+                if issues is not None:
+                    pending.append((file_path, key, issues, None, 0))
+                else:
+                    batch.paths.append(file_path)
+                    pending.append((file_path, key, None, batch, len(batch.paths) - 1))
+                    if len(batch.paths) >= BATCH_SIZE:
+                        batch.future = executor.submit(_analyze_batch, batch.paths, profiler is not None, role)
+                        batch = _Batch()
+                        in_flight += 1
+                        # 按提交顺序取回结果，保证与串行扫描顺序一致，同时限制排队任务数
+                        while in_flight >= max_in_flight:
+                            yield drain_one()
+            # 队首已有结果（缓存命中、跳过的文件）时立即产出，不等待后续遍历；
+            # 等待结果的条目过多时先取回最早的（必要时提交未满的批次），限制内存占用
+            while pending and (pending[0][2] is not None or len(pending) > max_pending):
+                yield drain_one()
+        while pending:
+            yield drain_one()
+    finally:
+        if shared:
+            for entry in pending:
+                owner = entry[3]
+                if owner is not None and owner.future is not None:
+                    owner.future.cancel()
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def _language(file_path):
+    return plugin_for(file_path).language
+
+def iter_scan_repository(repo_path, jobs=1, cache=None, paths=None, fetch_options=None, executor=None, ignore=None,
+                         limits=None):
+    """逐个产出文件的分析结果 {"path", "language", "issues"}
+
+    结果按扫描顺序在分析完成后立即产出（包括进程池模式），不在内存中累积；
+    没有问题的文件也会产出（issues 为空列表）。仓库路径不存在时抛出 FileNotFoundError。
+    远程仓库（http(s)、ssh、file:// 等）先通过本地镜像检出，fetch_options 传给
+    checked_out_repository（例如 ref、token、cache_dir），失败时抛出 RepositoryFetchError。
+    传入 executor 时在该进程池中分析（例如分析服务的常驻进程池）。
+    ignore 为 IgnoreEngine（默认按 .gitignore 和项目规则新建），扫描结束后其 stats 记录跳过的文件。
+    超出 limits（FileLimits）的大文件、压缩或生成的文件以一条 skipped_file 问题产出，不做分析。
+    """
+    if is_remote_url(repo_path):
+        # 扫描期间持有仓库锁，避免并发运行切换同一工作区
+        with checked_out_repository(repo_path, **(fetch_options or {})) as checkout:
+            yield from iter_scan_repository(checkout["path"], jobs, cache, paths, executor=executor, ignore=ignore,
+                                            limits=limits)
+        return
+
+    # 扫描本地目录
+    if not os.path.exists(repo_path):
+        raise FileNotFoundError("仓库路径不存在")
+
+    if ignore is None:
+        ignore = IgnoreEngine(repo_path)
+    if paths is None:
+        file_paths = _iter_source_files(repo_path, ignore)
+    else:
+        extensions = source_extensions()
+        file_paths = (path for path in paths
+                      if path.endswith(extensions) and os.path.isfile(path) and not ignore.is_ignored(path))
+
+    profiler = profiling.active()
+    for file_path, issues in _iter_analyzed(file_paths, jobs, cache, executor, limits=limits):
+        if profiler is not None:
+            profiler.count("scan.files")
+        yield {"path": file_path, "language": _language(file_path), "issues": issues}
+
+@profiling.profiled("scan.repository")
+def scan_repository(repo_path, jobs=1, cache=None, paths=None, fetch_options=None):
+    """扫描仓库中的所有代码文件
+
+    jobs 大于 1 时将单文件分析分发到进程池，结果与串行扫描完全一致；
+    传入 AnalysisCache 时，内容未变化的文件直接使用缓存结果；
+    传入 paths 时只分析这些文件（例如 git 变更文件），不遍历整个仓库。
+    需要逐个处理结果时请使用 iter_scan_repository。
+    """
     results = {
         "python_files": [],
         "javascript_files": [],
         "total_issues": 0
     }
-    
-    # 如果是GitHub URL，MVP阶段我们只做简单处理
-    if repo_path.startswith(('http://', 'https://')):
-        # 在实际应用中，这里应该克隆仓库到本地
-        print(f"注意：在实际应用中，应该克隆仓库: {repo_path}")
-        # 返回模拟数据用于演示
-        return {
-            "python_files": [
-                {
-                    "path": "example.py",
-                    "issues": [
-                        {"type": "long_function", "message": "示例长函数", "line": 10}
-                    ]
-                }
-            ],
-            "javascript_files": [
-                {
-                    "path": "example.js",
-                    "issues": [
-                        {"type": "long_function", "message": "示例JavaScript长函数", "line": 15}
-                    ]
-                }
-            ],
-            "total_issues": 2
-        }
-    
-    # 扫描本地目录
-    if not os.path.exists(repo_path):
-        return {"error": "仓库路径不存在"}
-    
-    for root, dirs, files in os.walk(repo_path):
-        # 跳过隐藏目录和venv等
-        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'venv']
-        
-        for file in files:
-            file_path = os.path.join(root, file)
-            
-            if file.endswith('.py'):
-                issues = detect_python_smells(file_path)
-                if issues:
-                    results["python_files"].append({
-                        "path": file_path,
-                        "issues": issues
-                    })
-                    results["total_issues"] += len(issues)
-            
-            elif file.endswith('.js'):
-                issues = detect_javascript_smells(file_path)
-                if issues:
-                    results["javascript_files"].append({
-                        "path": file_path,
-                        "issues": issues
-                    })
-                    results["total_issues"] += len(issues)
-    
-    return results
\ No newline at end of file
+
+    try:
+        for file_result in iter_scan_repository(repo_path, jobs, cache, paths, fetch_options):
+            issues = file_result["issues"]
+            if not issues:
+                continue
+            results.setdefault(f"{file_result['language']}_files", []).append({
+                "path": file_result["path"],
+                "issues": issues
+            })
+            results["total_issues"] += len(issues)
+    except (FileNotFoundError, RepositoryFetchError) as e:
+        return {"error": str(e)}
+
+    return results
@@ -0,0 +1,445 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import stat
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from analyzers.issues import json_default
+from .cache import AnalysisCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from .plugins import is_source_file, plugin_for
+from .repo_fetcher import is_remote_url
+from .file_limits import FileLimits
+from .ignore import IgnoreEngine
+from .scanner import _analyze_file, _iter_analyzed, _language, iter_scan_repository
+
+# 默认监听地址：缓存目录下的 Unix socket，只有当前用户可以连接
+DEFAULT_SOCKET_PATH = os.path.join(DEFAULT_CACHE_DIR, 'server.sock')
+DEFAULT_ADDRESS = f"unix:{DEFAULT_SOCKET_PATH}"
+# 客户端探测服务是否在运行时的超时（秒），服务不可用时应尽快回退到进程内分析
+PROBE_TIMEOUT = 0.5
+RPC_PATH = '/rpc'
+HEALTH_PATH = '/health'
+
+# JSON-RPC 错误码；-32800 沿用 LSP 的“请求已取消”
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+
+class RequestCancelled(Exception):
+    pass
+
+class ServerUnavailable(Exception):
+    """分析服务没有运行或无法连接"""
+
+class ServerError(Exception):
+    """分析服务返回的 JSON-RPC 错误"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+def parse_address(address):
+    """把 unix:/path、/path、http://host:port 或 host:port 解析为 (协议族, 地址)"""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    if address.startswith(os.sep):
+        return 'unix', address
+    if address.startswith('http://'):
+        address = address[len('http://'):].rstrip('/')
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"无效的服务地址: {address}")
+    return 'tcp', (host, int(port))
+
+def _warm_worker():
+    """在工作进程中执行一次，确保进程已启动且分析器已导入"""
+    return os.getpid()
+
+def _analyze_file_details(file_path):
+    """在工作进程中分析单个文件的代码异味和复杂度"""
+    plugin = plugin_for(file_path)
+    return {
+        "path": file_path,
+        "language": plugin.language,
+        "issues": _analyze_file(file_path),
+        "complexity": plugin.get('complexity')(file_path)
+    }
+
+def _source_file(path):
+    if not isinstance(path, str) or not os.path.isabs(path):
+        raise ValueError(f"需要绝对路径: {path}")
+    if not is_source_file(path):
+        raise ValueError(f"不支持的文件类型: {path}")
+    if not os.path.isfile(path):
+        raise ValueError(f"文件不存在: {path}")
+    return path
+
+class AnalysisService:
+    """分析服务的请求处理逻辑：常驻进程池 + 按请求取消
+
+    每个请求在自己的线程中执行，所有请求共享同一个已预热的进程池；
+    请求 id 登记在 _active 中，cancel 方法或客户端断开连接都会停止该请求，
+    并取消其尚未开始的任务。
+    """
+
+    def __init__(self, jobs=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+        self.jobs = max(jobs or os.cpu_count() or 1, 1)
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        self.requests_served = 0
+        self._active = {}
+        self._lock = threading.Lock()
+        self.methods = {
+            "analyze_file": self._analyze_file,
+            "analyze_paths": self._analyze_paths,
+            "scan_repo": self._scan_repo
+        }
+
+    def warm_up(self):
+        """启动全部工作进程，之后的请求不再承担进程启动和导入开销"""
+        futures = [self.executor.submit(_warm_worker) for _ in range(self.jobs)]
+        return sorted({future.result() for future in futures})
+
+    def health(self):
+        with self._lock:
+            return {"status": "ok", "pid": os.getpid(), "jobs": self.jobs,
+                    "active_requests": len(self._active), "requests_served": self.requests_served}
+
+    def _open_cache(self):
+        # sqlite 连接不能跨线程共享，每个请求单独打开
+        if self.cache_dir is None:
+            return None
+        return AnalysisCache(self.cache_dir, max_bytes=self.cache_max_bytes)
+
+    def _analyze_file(self, params, cancelled):
+        future = self.executor.submit(_analyze_file_details, _source_file(params.get("path")))
+        while True:
+            try:
+                return [future.result(timeout=0.1)]
+            except FutureTimeoutError:
+                if cancelled.is_set():
+                    future.cancel()
+                    raise RequestCancelled()
+
+    def _analyze_paths(self, params, cancelled):
+        paths = params.get("paths")
+        if not isinstance(paths, list):
+            raise ValueError("paths 必须是路径列表")
+        paths = [_source_file(path) for path in paths]
+        cache = self._open_cache()
+        try:
+            for file_path, issues in _iter_analyzed(paths, self.jobs, cache, self.executor):
+                yield {"path": file_path, "language": _language(file_path), "issues": issues}
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def _scan_repo(self, params, cancelled):
+        repo = params.get("repo")
+        if not isinstance(repo, str) or is_remote_url(repo) or not os.path.isabs(repo):
+            raise ValueError(f"需要本地仓库的绝对路径: {repo}")
+        paths = params.get("paths")
+        ignore = IgnoreEngine(repo, params.get("exclude") or ())
+        limits = FileLimits.from_params(params)
+        cache = self._open_cache()
+        try:
+            yield from iter_scan_repository(repo, self.jobs, cache, paths, executor=self.executor, ignore=ignore,
+                                            limits=limits)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def cancel(self, request_id):
+        with self._lock:
+            event = self._active.get(request_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def handle(self, request):
+        """处理一个 JSON-RPC 请求，逐条产出要发送的消息
+
+        每个文件的结果作为 "file" 通知立即发送，最后发送带 id 的汇总结果或错误。
+        关闭这个生成器即取消请求。
+        """
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            yield _error(None, INVALID_REQUEST, "无效的请求")
+            return
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if method == "cancel":
+            yield _result(request_id, {"cancelled": self.cancel(params.get("id"))})
+            return
+        handler = self.methods.get(method)
+        if handler is None:
+            yield _error(request_id, METHOD_NOT_FOUND, f"未知的方法: {method}")
+            return
+
+        cancelled = threading.Event()
+        if request_id is not None:
+            with self._lock:
+                self._active[request_id] = cancelled
+        files = 0
+        total_issues = 0
+        results = iter(())
+        try:
+            results = iter(handler(params, cancelled))
+            for file_result in results:
+                if cancelled.is_set():
+                    raise RequestCancelled()
+                files += 1
+                total_issues += len(file_result["issues"])
+                yield {"jsonrpc": "2.0", "method": "file", "params": {"id": request_id, "file": file_result}}
+            yield _result(request_id, {"files": files, "total_issues": total_issues})
+        except RequestCancelled:
+            yield _error(request_id, REQUEST_CANCELLED, "请求已取消")
+        except (ValueError, FileNotFoundError) as e:
+            yield _error(request_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            yield _error(request_id, INTERNAL_ERROR, f"分析失败: {e}")
+        finally:
+            # 关闭分析生成器，取消本请求尚未开始的任务
+            if hasattr(results, 'close'):
+                results.close()
+            with self._lock:
+                if request_id is not None and self._active.get(request_id) is cancelled:
+                    del self._active[request_id]
+                self.requests_served += 1
+
+    def close(self):
+        with self._lock:
+            for event in self._active.values():
+                event.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+def _result(request_id, result):
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """POST /rpc 接收 JSON-RPC 请求并以 NDJSON 流式返回；GET /health 返回服务状态"""
+    server_version = "CodeRevive"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != HEALTH_PATH:
+            self._send_json(404, {"error": "未找到"})
+            return
+        self._send_json(200, self.server.service.health())
+
+    def do_POST(self):
+        if self.path != RPC_PATH:
+            self._send_json(404, {"error": "未找到"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, _error(None, PARSE_ERROR, "无法解析请求"))
+            return
+
+        # HTTP/1.0 响应不带长度，以关闭连接表示结束，每条消息一行
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        messages = self.server.service.handle(request)
+        try:
+            for message in messages:
+                self.wfile.write(json.dumps(message, ensure_ascii=False, default=json_default).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已断开：关闭生成器即取消请求中尚未开始的任务
+            pass
+        finally:
+            messages.close()
+
+class _ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+class _ThreadingTCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+def create_server(address=DEFAULT_ADDRESS, jobs=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES):
+    """创建（尚未开始处理请求的）分析服务，进程池已预热"""
+    family, location = parse_address(address)
+    if family == 'unix':
+        os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+        if os.path.exists(location):
+            if _probe_unix(location):
+                raise OSError(f"分析服务已在运行: {location}")
+            os.unlink(location)
+        server = _ThreadingUnixHTTPServer(location, _RequestHandler)
+        os.chmod(location, stat.S_IRUSR | stat.S_IWUSR)
+    else:
+        server = _ThreadingTCPHTTPServer(location, _RequestHandler)
+    server.service = AnalysisService(jobs, cache_dir, cache_max_bytes)
+    server.service.warm_up()
+    return server
+
+def serve(address=DEFAULT_ADDRESS, jobs=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, on_ready=None):
+    """运行分析服务直到收到 SIGINT/SIGTERM"""
+    server = create_server(address, jobs, cache_dir, cache_max_bytes)
+    if on_ready is not None:
+        on_ready(server)
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            # shutdown() 会等待 serve_forever 返回，不能在同一线程中直接调用
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    previous = signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        server.server_close()
+        server.service.close()
+        family, location = parse_address(address)
+        if family == 'unix' and os.path.exists(location):
+            os.unlink(location)
+
+def _probe_unix(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(PROBE_TIMEOUT)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+class ServerClient:
+    """分析服务的轻量客户端，只依赖标准库"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self._family, self._location = parse_address(address)
+        self._next_id = 0
+
+    def _connection(self, timeout):
+        if self._family == 'unix':
+            return _UnixHTTPConnection(self._location, timeout)
+        return http.client.HTTPConnection(*self._location, timeout=timeout)
+
+    def health(self, timeout=PROBE_TIMEOUT):
+        """返回服务状态，服务不可用时抛出 ServerUnavailable"""
+        connection = self._connection(timeout)
+        try:
+            connection.request('GET', HEALTH_PATH)
+            response = connection.getresponse()
+            return json.loads(response.read())
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise ServerUnavailable(f"无法连接分析服务 {self.address}: {e}") from e
+        finally:
+            connection.close()
+
+    def available(self):
+        try:
+            self.health()
+            return True
+        except ServerUnavailable:
+            return False
+
+    def call(self, method, params=None, request_id=None):
+        """发送请求并逐个产出文件结果；结束后 self.last_result 为汇总结果
+
+        连接失败时抛出 ServerUnavailable，服务返回错误时抛出 ServerError。
+        提前关闭生成器会断开连接，服务端随即取消该请求。
+        """
+        if request_id is None:
+            self._next_id += 1
+            request_id = f"{os.getpid()}-{self._next_id}"
+        body = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+        connection = self._connection(self.timeout)
+        try:
+            try:
+                connection.request('POST', RPC_PATH, body=body.encode('utf-8'),
+                                   headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                raise ServerUnavailable(f"无法连接分析服务 {self.address}: {e}") from e
+            self.last_result = None
+            for line in response:
+                message = json.loads(line)
+                if "error" in message:
+                    raise ServerError(message["error"]["code"], message["error"]["message"])
+                if "result" in message:
+                    self.last_result = message["result"]
+                    return
+                yield message["params"]["file"]
+            raise ServerError(INVALID_REQUEST, "分析服务提前关闭了连接")
+        finally:
+            connection.close()
+
+    def analyze_file(self, path):
+        """返回单个文件的 {"path", "language", "issues", "complexity"}"""
+        return list(self.call("analyze_file", {"path": os.path.abspath(path)}))[0]
+
+    def analyze_paths(self, paths):
+        return self.call("analyze_paths", {"paths": [os.path.abspath(path) for path in paths]})
+
+    def scan(self, repo_path, paths=None, exclude=(), limits=None):
+        """与 iter_scan_repository 相同的逐文件结果，由服务的常驻进程池分析
+
+        exclude 为额外的排除模式，limits 为 FileLimits（默认使用服务端的默认限制）。
+        """
+        params = {"repo": os.path.abspath(repo_path)}
+        if limits is not None:
+            params.update(limits.to_params())
+        if paths is not None:
+            params["paths"] = [os.path.abspath(path) for path in paths]
+        if exclude:
+            params["exclude"] = list(exclude)
+        return self.call("scan_repo", params)
+
+    def cancel(self, request_id):
+        list(self.call("cancel", {"id": request_id}))
+        return self.last_result["cancelled"]
+
+def connect(address=DEFAULT_ADDRESS):
+    """服务在运行时返回 ServerClient，否则返回 None（调用方回退到进程内分析）"""
+    family, location = parse_address(address)
+    if family == 'unix' and not os.path.exists(location):
+        return None
+    client = ServerClient(address)
+    return client if client.available() else None
@@ -0,0 +1,343 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+from analyzers.issues import compact_issues, json_default
+from .cache import analyzer_version
+from .ignore import GITIGNORE_FILE, PROJECT_IGNORE_FILE, IgnoreEngine
+from .plugins import source_extensions
+from .scanner import _iter_analyzed, _iter_source_files, _language
+
+SNAPSHOT_VERSION = 1
+# 收到变更后等待这么久没有新事件再分析，合并编辑器保存、git checkout 等突发事件
+DEFAULT_DEBOUNCE = 0.2
+# 持续有事件时最多推迟这么久
+MAX_DEBOUNCE_DELAY = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify 常量（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+class PollingWatcher:
+    """定期遍历目录比较 (修改时间, 大小) 的变更检测，适用于任何平台"""
+
+    def __init__(self, root, interval=DEFAULT_POLL_INTERVAL, ignore=None):
+        self.root = root
+        self.interval = interval
+        self.ignore = ignore or IgnoreEngine(root)
+        self._stats = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        stats = {}
+        # 每轮重新读取排除规则：新被排除的文件表现为消失，由 AnalysisDaemon.sync 移除
+        self.ignore.invalidate()
+        for file_path in _iter_source_files(self.root, self.ignore):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            stats[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def wait(self, timeout):
+        """等待至多 timeout 秒，返回 (变化的路径集合, 是否需要全量重扫)"""
+        delay = self._next - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set(), False
+        if delay > 0:
+            time.sleep(delay)
+        self._next = time.monotonic() + self.interval
+        stats = self._scan()
+        changed = {path for path, stat in stats.items() if self._stats.get(path) != stat}
+        changed.update(path for path in self._stats if path not in stats)
+        self._stats = stats
+        return changed, False
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """基于 Linux inotify（通过 ctypes 调用）的变更通知，递归监视所有子目录"""
+
+    def __init__(self, root, ignore=None):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.root = root
+        self.extensions = source_extensions()
+        self.ignore = ignore or IgnoreEngine(root)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_tree(self, directory):
+        """监视 directory 及其子目录，返回其中已有的源码文件"""
+        found = set()
+        for current, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not self.ignore.is_ignored(os.path.join(current, d), is_dir=True)]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                if current == directory and directory == self.root:
+                    raise OSError(errno, f"无法监视目录: {current}")
+                continue
+            self._dirs[wd] = current
+            found.update(path for path in (os.path.join(current, name) for name in files if name.endswith(self.extensions))
+                         if not self.ignore.is_ignored(path))
+        return found
+
+    def wait(self, timeout):
+        """等待至多 timeout 秒，返回 (变化的路径集合, 是否需要全量重扫)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set(), False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        changed = set()
+        rescan = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if name in (GITIGNORE_FILE, PROJECT_IGNORE_FILE):
+                # 排除规则变化：重新加载规则并全量重扫
+                self.ignore.invalidate()
+                rescan = True
+                continue
+            if mask & IN_ISDIR:
+                if self.ignore.is_ignored(path, is_dir=True):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._add_tree(path))
+                else:
+                    # 目录被删除或移走：由调用方根据路径前缀处理其中的文件
+                    changed.add(path)
+            elif name.endswith(self.extensions) and not self.ignore.is_ignored(path):
+                changed.add(path)
+        return changed, rescan
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def create_watcher(root, poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False, ignore=None):
+    """优先使用 inotify，不可用时（非 Linux、监视数达到上限等）退化为轮询；ignore 为共用的 IgnoreEngine"""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root, ignore)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, poll_interval, ignore)
+
+class AnalysisDaemon:
+    """常驻内存的仓库分析服务
+
+    启动时加载快照并只重新分析 (修改时间, 大小) 变化的文件；之后订阅文件系统
+    变更，合并突发事件后只分析变化的文件。停止时把全部结果写入快照，
+    下次启动即为热启动。on_update(summary) 在每轮更新后调用。
+    excludes 为额外的排除模式（同 --exclude），与 .gitignore 和项目规则一起决定监视和分析的文件；
+    超出 limits（FileLimits）的文件以一条 skipped_file 问题记录，不做分析。
+    """
+
+    def __init__(self, repo_path, jobs=1, cache=None, snapshot_path=None, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False, on_update=None, excludes=(),
+                 limits=None):
+        self.repo_path = os.path.abspath(repo_path)
+        self.ignore = IgnoreEngine(self.repo_path, excludes)
+        self.limits = limits
+        # jobs > 1 时整个运行期间共用一个进程池，不为每轮更新重新启动工作进程
+        self.executor = None
+        self.jobs = jobs
+        self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.on_update = on_update
+        # 路径 -> (修改时间, 大小, 问题列表)
+        self.results = {}
+        self.watcher = None
+        self._stop = threading.Event()
+        self._running = False
+        self._version = analyzer_version()
+
+    def load_snapshot(self):
+        """加载快照，返回加载的文件数；快照不存在、损坏或分析器版本不同时返回 0"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("analyzer_version") != self._version \
+                or snapshot.get("root") != self.repo_path:
+            return 0
+        self.results = {path: (entry[0], entry[1], compact_issues(entry[2])) for path, entry in snapshot["files"].items()}
+        return len(self.results)
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "analyzer_version": self._version,
+            "root": self.repo_path,
+            "files": self.results
+        }
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, default=json_default)
+        os.replace(temp_path, self.snapshot_path)
+
+    def sync(self, paths=None):
+        """重新分析变化的文件；paths 为 None 时检查整个仓库，返回本轮汇总"""
+        deleted = []
+        if paths is None:
+            self.ignore.invalidate()
+            candidates = set(_iter_source_files(self.repo_path, self.ignore))
+            # 已删除或被排除规则排除（例如修改了 .gitignore）的文件不再报告
+            for path in [path for path in self.results if path not in candidates]:
+                del self.results[path]
+                deleted.append(path)
+        else:
+            candidates = set()
+            extensions = source_extensions()
+            for path in paths:
+                if path in self.results or path.endswith(extensions):
+                    candidates.add(path)
+                # 目录被删除或移走时，其中已知的文件都需要检查
+                prefix = path.rstrip(os.sep) + os.sep
+                candidates.update(known for known in self.results if known.startswith(prefix))
+
+        changed = []
+        stats = {}
+        for path in sorted(candidates):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is None or self.ignore.is_ignored(path):
+                # 已删除或已被排除规则排除
+                if self.results.pop(path, None) is not None:
+                    deleted.append(path)
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            entry = self.results.get(path)
+            if entry is None or (entry[0], entry[1]) != key:
+                changed.append(path)
+                stats[path] = key
+
+        for path, issues in _iter_analyzed(changed, self.jobs, self.cache, self._executor(), limits=self.limits):
+            self.results[path] = (stats[path][0], stats[path][1], issues)
+        if self.cache is not None:
+            self.cache.flush()
+
+        summary = {
+            "analyzed": changed,
+            "deleted": deleted,
+            "files": len(self.results),
+            "total_issues": sum(len(entry[2]) for entry in self.results.values())
+        }
+        if self.on_update is not None and (changed or deleted or paths is None):
+            self.on_update(summary)
+        return summary
+
+    def file_results(self):
+        """按路径顺序产出当前所有文件的结果 {"path", "language", "issues"}"""
+        for path in sorted(self.results):
+            yield {"path": path, "language": _language(path), "issues": self.results[path][2]}
+
+    def _executor(self):
+        if self.executor is None and self.jobs > 1:
+            # 只有并行分析时才需要 multiprocessing，延迟导入以缩短启动时间
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self.executor
+
+    def stop(self):
+        """请求停止（可在信号处理函数或其他线程中调用）
+
+        run() 正在运行时由它在退出前关闭进程池，否则（只调用过 sync()）在这里关闭。
+        """
+        self._stop.set()
+        if not self._running:
+            self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def run(self):
+        """阻塞运行直到 stop()；退出前保存快照"""
+        self._running = True
+        self.load_snapshot()
+        self.watcher = create_watcher(self.repo_path, self.poll_interval, self.force_polling, self.ignore)
+        try:
+            self.sync()
+            pending = set()
+            first_event = last_event = 0.0
+            while not self._stop.is_set():
+                changed, rescan = self.watcher.wait(min(self.debounce, self.poll_interval) or 0.05)
+                now = time.monotonic()
+                if rescan:
+                    pending.clear()
+                    self.sync()
+                    continue
+                if changed:
+                    if not pending:
+                        first_event = now
+                    pending.update(changed)
+                    last_event = now
+                if pending and (now - last_event >= self.debounce or now - first_event >= MAX_DEBOUNCE_DELAY):
+                    batch, pending = pending, set()
+                    self.sync(batch)
+        finally:
+            self.watcher.close()
+            self._running = False
+            self._shutdown_executor()
+            self.save_snapshot()
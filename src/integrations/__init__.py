@@ -1,6 +1,11 @@
 from .github_integration import connect_to_repo, create_pull_request
+from .github_client import GitHubClient, GitHubAPIError, get_client, parse_repo_url
 
 __all__ = [
     'connect_to_repo',
-    'create_pull_request'
+    'create_pull_request',
+    'GitHubClient',
+    'GitHubAPIError',
+    'get_client',
+    'parse_repo_url'
 ]
\ No newline at end of file
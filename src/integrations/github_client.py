@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_BASE = 'https://api.github.com'
+# 每个连接池保留的长连接数（并发上传时按线程数调整）
+DEFAULT_POOL_SIZE = 10
+# 条件请求缓存保留的 GET 响应数
+ETAG_CACHE_SIZE = 256
+# 5xx 与连接错误的重试次数，以及指数退避的初始秒数
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+# 等待限流重置的最长秒数，超过则直接报错而不是挂起
+MAX_RATE_LIMIT_WAIT = 15 * 60
+
+_GITHUB_URL = re.compile(r'github\.com[/:]([^/]+)/([^/]+?)(?:\.git)?/?$')
+_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'PATCH')
+
+# 非 JSON 响应在错误信息中保留的字符数
+_ERROR_SNIPPET_CHARS = 200
+
+class GitHubAPIError(Exception):
+    """GitHub API 返回错误状态码"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} - {message}")
+        self.status_code = status_code
+        self.message = message
+
+def parse_repo_url(repo_url):
+    """从仓库 URL 中提取 (owner, repo)，格式无效时抛出 ValueError"""
+    if 'github.com' not in repo_url:
+        raise ValueError("不支持的仓库URL格式")
+    match = _GITHUB_URL.search(repo_url)
+    if not match:
+        raise ValueError("无效的仓库URL格式")
+    return match.group(1), match.group(2)
+
+class GitHubClient:
+    """带连接池、条件请求缓存和限流退避的 GitHub REST API 客户端
+
+    同一客户端的所有请求复用一个 requests.Session（保持长连接）；GET 响应按 ETag
+    缓存，再次请求时发送 If-None-Match，304 直接返回缓存内容且不消耗限流配额；
+    剩余配额为 0 或收到 Retry-After 时等待后重试。客户端可在多线程间共享。
+    """
+
+    def __init__(self, token=None, api_base=None, pool_size=DEFAULT_POOL_SIZE, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, max_wait=MAX_RATE_LIMIT_WAIT, timeout=30, sleep=time.sleep):
+        self.api_base = (api_base or os.environ.get('GITHUB_API_URL') or DEFAULT_API_BASE).rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/vnd.github.v3+json',
+            'User-Agent': 'CodeRevive'
+        })
+        if token:
+            self.session.headers['Authorization'] = f'token {token}'
+        self.rate_limit = {"limit": None, "remaining": None, "reset": None}
+        self._etags = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _url(self, path):
+        return path if path.startswith(('http://', 'https://')) else f"{self.api_base}/{path.lstrip('/')}"
+
+    def _update_rate_limit(self, response):
+        headers = response.headers
+        with self._lock:
+            for field in ("limit", "remaining", "reset"):
+                value = headers.get(f'X-RateLimit-{field.capitalize()}')
+                if value is not None and value.isdigit():
+                    self.rate_limit[field] = int(value)
+
+    def _wait(self, seconds):
+        if seconds > self.max_wait:
+            raise GitHubAPIError(403, f"API 速率限制，需等待 {int(seconds)} 秒")
+        if seconds > 0:
+            self._sleep(seconds)
+
+    def _rate_limit_delay(self, response):
+        """被限流时返回需要等待的秒数，否则返回 None"""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and retry_after.isdigit():
+            return int(retry_after)
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            reset = response.headers.get('X-RateLimit-Reset', '')
+            return max(int(reset) - time.time(), 0) + 1 if reset.isdigit() else self.backoff
+        return None
+
+    def _wait_for_quota(self):
+        """配额已用完时在发出请求前等待重置"""
+        with self._lock:
+            remaining, reset = self.rate_limit["remaining"], self.rate_limit["reset"]
+        if remaining == 0 and reset:
+            delay = reset - time.time() + 1
+            if delay > 0:
+                self._wait(delay)
+                with self._lock:
+                    self.rate_limit["remaining"] = None
+
+    def request(self, method, path, json=None, params=None):
+        """发送请求并返回 (状态码, JSON 数据)，非 2xx 状态抛出 GitHubAPIError"""
+        method = method.upper()
+        url = self._url(path)
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        headers = {}
+        cached = None
+        if method == 'GET':
+            with self._lock:
+                cached = self._etags.get(cache_key)
+            if cached:
+                headers['If-None-Match'] = cached[0]
+
+        attempt = 0
+        while True:
+            self._wait_for_quota()
+            try:
+                response = self.session.request(method, url, json=json, params=params, headers=headers,
+                                                timeout=self.timeout)
+            except requests.ConnectionError:
+                if method not in _IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                self._sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+            self._update_rate_limit(response)
+
+            # 被限流的请求未被服务器处理，任何方法都可以重试
+            delay = self._rate_limit_delay(response)
+            if delay is not None and attempt < self.max_retries:
+                self._wait(delay)
+                attempt += 1
+                continue
+            if response.status_code >= 500 and method in _IDEMPOTENT_METHODS and attempt < self.max_retries:
+                self._sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+            break
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self._etags.move_to_end(cache_key)
+            return 200, cached[1]
+
+        try:
+            data = response.json() if response.content else None
+        except ValueError:
+            # 代理或网关返回的 HTML 错误页等非 JSON 响应
+            raise GitHubAPIError(response.status_code,
+                                 f"非 JSON 响应: {response.text[:_ERROR_SNIPPET_CHARS].strip() or response.reason}")
+        if response.status_code >= 400:
+            message = data.get('message', 'Unknown error') if isinstance(data, dict) else response.reason
+            raise GitHubAPIError(response.status_code, message)
+
+        etag = response.headers.get('ETag')
+        if method == 'GET' and etag:
+            with self._lock:
+                self._etags[cache_key] = (etag, data)
+                self._etags.move_to_end(cache_key)
+                while len(self._etags) > ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return response.status_code, data
+
+    def get(self, path, params=None):
+        return self.request('GET', path, params=params)[1]
+
+    def post(self, path, json=None):
+        return self.request('POST', path, json=json)[1]
+
+    def patch(self, path, json=None):
+        return self.request('PATCH', path, json=json)[1]
+
+    def close(self):
+        self.session.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(token=None, api_base=None):
+    """按令牌和 API 地址返回共享的客户端，使连接池和缓存在多次调用间复用"""
+    api_base = (api_base or os.environ.get('GITHUB_API_URL') or DEFAULT_API_BASE).rstrip('/')
+    with _clients_lock:
+        client = _clients.get((token, api_base))
+        if client is None:
+            client = _clients[(token, api_base)] = GitHubClient(token, api_base)
+        return client
@@ -1,93 +1,161 @@
-import requests
+import base64
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .github_client import DEFAULT_POOL_SIZE, GitHubAPIError, get_client, parse_repo_url
 
-def connect_to_repo(repo_url, access_token):
+# 重构提交所在的分支，重复运行时更新同一分支和 PR
+DEFAULT_PR_BRANCH = 'coderevive/refactor'
+
+def connect_to_repo(repo_url, access_token, api_base=None):
     """连接到GitHub仓库"""
     try:
         # 从URL中提取所有者和仓库名
-        if 'github.com/' in repo_url:
-            parts = repo_url.split('github.com/')[1]
-            if '/' in parts:
-                owner, repo = parts.split('/', 1)
-                repo = repo.replace('.git', '')
-            else:
-                return {"status": "error", "message": "无效的仓库URL格式"}
-        else:
-            return {"status": "error", "message": "不支持的仓库URL格式"}
-        
-        # 调用GitHub API检查仓库
-        headers = {
-            'Authorization': f'token {access_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        
-        api_url = f'https://api.github.com/repos/{owner}/{repo}'
-        response = requests.get(api_url, headers=headers)
-        
-        if response.status_code == 200:
-            repo_info = response.json()
-            return {
-                "status": "connected",
-                "repo_info": {
-                    "owner": owner,
-                    "name": repo,
-                    "full_name": repo_info.get('full_name'),
-                    "description": repo_info.get('description')
-                }
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"连接失败: {response.status_code} - {response.json().get('message', 'Unknown error')}"
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    try:
+        # 调用GitHub API检查仓库（共享客户端复用连接并缓存响应）
+        repo_info = get_client(access_token, api_base).get(f'repos/{owner}/{repo}')
+        return {
+            "status": "connected",
+            "repo_info": {
+                "owner": owner,
+                "name": repo,
+                "full_name": repo_info.get('full_name'),
+                "description": repo_info.get('description')
             }
-    
+        }
+    except GitHubAPIError as e:
+        return {"status": "error", "message": f"连接失败: {e.status_code} - {e.message}"}
     except Exception as e:
         return {"status": "error", "message": f"连接失败: {str(e)}"}
 
-def create_pull_request(repo_url, access_token, changes, title, description):
-    """创建GitHub拉取请求提交重构建议"""
+def git_blob_sha(content):
+    """计算内容对应的 git blob SHA（与服务器端一致，用于判断是否需要上传）"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+def _encode(content):
+    return content.encode('utf-8') if isinstance(content, str) else content
+
+def _ref_sha(client, owner, repo, branch):
+    """返回分支指向的提交 SHA，分支不存在时返回 None"""
     try:
-        # 解析仓库信息
-        if 'github.com/' in repo_url:
-            parts = repo_url.split('github.com/')[1]
-            if '/' in parts:
-                owner, repo = parts.split('/', 1)
-                repo = repo.replace('.git', '')
-            else:
-                return {"status": "error", "message": "无效的仓库URL格式"}
+        return client.get(f'repos/{owner}/{repo}/git/ref/heads/{branch}')['object']['sha']
+    except GitHubAPIError as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+def _tree_blobs(client, owner, repo, tree_sha):
+    """返回树中所有文件 {路径: (mode, sha)}，树过大被截断时返回已列出的部分"""
+    tree = client.get(f'repos/{owner}/{repo}/git/trees/{tree_sha}', params={"recursive": "1"})
+    return {entry['path']: (entry['mode'], entry['sha']) for entry in tree.get('tree', []) if entry['type'] == 'blob'}
+
+def _upload_blobs(client, owner, repo, contents, workers):
+    """并发上传 {sha: 内容} 中的 blob"""
+    def upload(item):
+        sha, content = item
+        data = client.post(f'repos/{owner}/{repo}/git/blobs',
+                           json={"content": base64.b64encode(content).decode('ascii'), "encoding": "base64"})
+        if data['sha'] != sha:
+            raise GitHubAPIError(500, f"blob 校验失败: {sha}")
+
+    if not contents:
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(contents))) as executor:
+        list(executor.map(upload, contents.items()))
+
+def create_pull_request(repo_url, access_token, changes, title, description, branch=DEFAULT_PR_BRANCH,
+                        base=None, api_base=None, workers=DEFAULT_POOL_SIZE, parent=None):
+    """创建GitHub拉取请求提交重构建议
+
+    changes 为 [{"path": 仓库内相对路径, "content": 新内容（str/bytes，None 表示删除）}]。
+    所有修改通过 Git Data API 合并为一次提交：只上传服务器上还没有的 blob（并发），
+    然后创建一棵树和一个提交，更新 branch 并打开（或复用已有的）PR。重复运行时
+    内容相同的提交、分支和 PR 都会被复用。需要令牌对仓库有推送权限。
+    parent 为生成这些修改时扫描的提交：目标分支此后有新提交时拒绝创建，
+    避免基于新提交的树静默覆盖其中的修改。
+    """
+    try:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    try:
+        client = get_client(access_token, api_base)
+        base = base or client.get(f'repos/{owner}/{repo}')['default_branch']
+        base_sha = _ref_sha(client, owner, repo, base)
+        if base_sha is None:
+            return {"status": "error", "message": f"创建PR失败: 目标分支不存在: {base}"}
+        if parent is not None and parent != base_sha:
+            return {"status": "error", "message": f"创建PR失败: 目标分支 {base} 已更新到 {base_sha[:12]}，"
+                                                  f"修改基于 {parent[:12]}，请重新扫描"}
+        base_tree = client.get(f'repos/{owner}/{repo}/git/commits/{base_sha}')['tree']['sha']
+        existing = _tree_blobs(client, owner, repo, base_tree)
+        known_shas = {sha for _, sha in existing.values()}
+
+        # 已存在的 PR 分支上的 blob 也无需重新上传
+        head_sha = _ref_sha(client, owner, repo, branch)
+        head_commit = client.get(f'repos/{owner}/{repo}/git/commits/{head_sha}') if head_sha else None
+        if head_commit:
+            known_shas.update(sha for _, sha in _tree_blobs(client, owner, repo, head_commit['tree']['sha']).values())
+
+        entries = []
+        uploads = {}
+        for change in changes:
+            path = change['path'].replace(os.sep, '/')
+            current = existing.get(path)
+            if change.get('content') is None:
+                if current:
+                    entries.append({"path": path, "mode": current[0], "type": "blob", "sha": None})
+                continue
+            content = _encode(change['content'])
+            sha = git_blob_sha(content)
+            if current and current[1] == sha:
+                continue
+            if sha not in known_shas:
+                uploads[sha] = content
+            entries.append({"path": path, "mode": current[0] if current else '100644', "type": "blob", "sha": sha})
+
+        if not entries:
+            return {"status": "no_changes", "message": "没有需要提交的修改", "changes_count": 0}
+
+        _upload_blobs(client, owner, repo, uploads, workers)
+        tree_sha = client.post(f'repos/{owner}/{repo}/git/trees', json={"base_tree": base_tree, "tree": entries})['sha']
+
+        if head_commit and head_commit['tree']['sha'] == tree_sha and \
+                [parent['sha'] for parent in head_commit['parents']] == [base_sha]:
+            commit_sha = head_sha
         else:
-            return {"status": "error", "message": "不支持的仓库URL格式"}
-        
-        # 在实际应用中，这里需要：
-        # 1. Fork仓库
-        # 2. Clone到本地
-        # 3. 应用更改
-        # 4. Push到fork的仓库
-        # 5. 创建PR
-        
-        # MVP阶段：我们只是模拟这个过程
-        headers = {
-            'Authorization': f'token {access_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        
-        # 模拟PR创建
-        # 注意：在实际实现中，需要先push更改到分支
-        pr_data = {
-            "title": title,
-            "body": description,
-            "head": "refactor-branch",  # 实际应用中应该是包含更改的分支
-            "base": "main"  # 目标分支
-        }
-        
-        # 这里只是返回模拟结果，实际应用中需要调用GitHub API
-        pr_url = f"https://github.com/{owner}/{repo}/pull/new/refactor-branch"
-        
+            commit_sha = client.post(f'repos/{owner}/{repo}/git/commits',
+                                     json={"message": title, "tree": tree_sha, "parents": [base_sha]})['sha']
+
+        if head_sha is None:
+            client.post(f'repos/{owner}/{repo}/git/refs', json={"ref": f"refs/heads/{branch}", "sha": commit_sha})
+        elif head_sha != commit_sha:
+            client.patch(f'repos/{owner}/{repo}/git/refs/heads/{branch}', json={"sha": commit_sha, "force": True})
+
+        open_prs = client.get(f'repos/{owner}/{repo}/pulls',
+                              params={"head": f"{owner}:{branch}", "base": base, "state": "open"})
+        if open_prs:
+            pr = open_prs[0]
+        else:
+            pr = client.post(f'repos/{owner}/{repo}/pulls',
+                             json={"title": title, "body": description, "head": branch, "base": base})
+
         return {
             "status": "created",
-            "pr_url": pr_url,
+            "pr_url": pr['html_url'],
             "message": f"拉取请求已创建: {title}",
-            "changes_count": len(changes)
+            "changes_count": len(entries),
+            "commit": commit_sha,
+            "uploaded_blobs": len(uploads),
+            "reused_pr": bool(open_prs)
         }
-    
+
+    except GitHubAPIError as e:
+        return {"status": "error", "message": f"创建PR失败: {e.status_code} - {e.message}"}
     except Exception as e:
-        return {"status": "error", "message": f"创建PR失败: {str(e)}"}
\ No newline at end of file
+        return {"status": "error", "message": f"创建PR失败: {str(e)}"}
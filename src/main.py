@@ -1,73 +1,194 @@
 import argparse
 import os
-from analyzers import detect_python_smells, detect_javascript_smells, analyze_python_complexity, analyze_javascript_complexity
-from refactors import refactor_python_long_methods, optimize_python_imports, refactor_javascript_long_methods, optimize_javascript_variables
-from integrations.github_integration import connect_to_repo, create_pull_request
-from core.scanner import scan_repository
-from core.report_generator import generate_report
+import shutil
+import sys
+from contextlib import ExitStack
+from analyzers import profiling
+from core.cache import DEFAULT_CACHE_DIR
+from core.file_limits import DEFAULT_MAX_FILE_BYTES, DEFAULT_MAX_LINE_LENGTH, FileLimits
+from core.plugins import plugin_for, source_extensions
+from core.report_writers import get_report_writer, REPORT_WRITERS
+from core.repo_fetcher import is_remote_url, DEFAULT_REPO_CACHE_DIR
+
+# 其余模块（GitHub 集成及 requests、重构、进程池、分析服务、监视器等）在用到时才导入，
+# 单文件分析和 pre-commit 等短时运行不为用不到的功能付出导入开销。
+# 可用 `python -X importtime src/main.py --file x.py --analyze-only` 查看导入耗时。
+
+# --profile 输出的文件名
+PROFILE_JSON = 'coderevive_profile.json'
+PROFILE_PROMETHEUS = 'coderevive_profile.prom'
 
 def main():
     parser = argparse.ArgumentParser(description='代码库静默持续重构服务 - MVP版')
-    parser.add_argument('--repo', type=str, required=True, help='仓库URL或本地路径')
+    parser.add_argument('--repo', type=str, help='仓库URL或本地路径')
     parser.add_argument('--token', type=str, help='GitHub访问令牌（如果是GitHub仓库）')
+    parser.add_argument('--api-base', type=str, help='GitHub API 地址（默认: $GITHUB_API_URL 或 https://api.github.com）')
+    parser.add_argument('--ref', type=str, help='远程仓库要检出的分支、标签或提交（默认: 远程默认分支）')
+    parser.add_argument('--repo-cache-dir', type=str, default=DEFAULT_REPO_CACHE_DIR, help='远程仓库本地镜像与工作区目录')
     parser.add_argument('--analyze-only', action='store_true', help='仅分析不重构')
+    parser.add_argument('--dry-run', action='store_true', help='只输出重构修改的 unified diff，不写文件也不创建PR')
     parser.add_argument('--file', type=str, help='分析单个文件（可选）')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='并行分析的进程数（默认: CPU核数）')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help='分析结果缓存目录')
+    parser.add_argument('--cache-max-mb', type=int, default=256, help='缓存大小上限（MB），超出后按LRU淘汰')
+    parser.add_argument('--no-cache', action='store_true', help='禁用分析结果缓存')
+    parser.add_argument('--format', type=str, default='text', choices=sorted(REPORT_WRITERS), help='报告格式（默认: text）')
+    parser.add_argument('--output', type=str, help='报告文件路径（默认按格式命名）')
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument('--since', type=str, help='仅分析相对该版本变更的文件（含未提交的修改）')
+    scope.add_argument('--diff', type=str, help='仅分析 base..head（或 base...head）之间变更的文件')
+    parser.add_argument('--profile', action='store_true', help='输出性能分析结果（JSON 汇总和 Prometheus textfile）')
+    parser.add_argument('--profile-dir', type=str, default='.', help='性能分析结果的输出目录')
+    parser.add_argument('--cprofile', type=str, help='额外保存主进程的 cProfile 数据到该文件')
+    parser.add_argument('--watch', action='store_true', help='常驻运行：监视本地仓库的变更并持续更新报告（仅分析）')
+    parser.add_argument('--snapshot', type=str, help='--watch 的结果快照文件（默认保存在缓存目录下）')
+    parser.add_argument('--debounce-ms', type=int, default=200, help='--watch 合并变更事件的等待时间（毫秒）')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='无法使用 inotify 时的轮询间隔（秒）')
+    parser.add_argument('--force-polling', action='store_true', help='--watch 始终使用轮询检测变更')
+    parser.add_argument('--serve', action='store_true', help='作为常驻分析服务运行（预热的进程池，HTTP/JSON-RPC）')
+    parser.add_argument('--server', type=str,
+                        help='分析服务地址：unix:/path 或 host:port（默认: 缓存目录下的 server.sock；扫描时若服务在运行则交给服务分析）')
+    parser.add_argument('--no-server', action='store_true', help='不使用分析服务，始终在本进程内分析')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='额外排除的路径（.gitignore 语法，可重复；另见仓库根目录的 .coderevive-ignore）')
+    parser.add_argument('--max-file-kb', type=int, default=DEFAULT_MAX_FILE_BYTES // 1024,
+                        help='超过该大小（KB）的文件不分析，在报告中列为跳过（0 表示不限制）')
+    parser.add_argument('--max-line-length', type=int, default=DEFAULT_MAX_LINE_LENGTH,
+                        help='文件开头出现超过该长度的行时视为压缩文件并跳过（0 表示不检查）')
+    parser.add_argument('--record-metrics', action='store_true', help='把当前提交的复杂度指标追加到指标库（用于技术债务趋势）')
+    parser.add_argument('--debt-trend', action='store_true', help='输出指标库中的技术债务趋势、最近一次的退化热点和目录汇总')
+    parser.add_argument('--metrics-dir', type=str, help='指标库目录（默认: 缓存目录下按仓库区分）')
+    parser.add_argument('--duplicates', action='store_true', help='检测仓库范围内的重复代码和高度相似的文件')
+    parser.add_argument('--history', type=str, metavar='REV_RANGE',
+                        help='逐个分析该范围内的提交（例如 HEAD~500..HEAD），直接读取 git 对象，每个 blob 只分析一次（仅分析）')
+    parser.add_argument('--history-limit', type=int, help='--history 只分析最近的若干个提交')
+    parser.add_argument('--fleet', type=str, metavar='MANIFEST',
+                        help='批量扫描清单中的所有仓库（共享进程池、优先级、断点续扫，仅分析）')
+    parser.add_argument('--fleet-dir', type=str, default='coderevive_fleet', help='--fleet 的报告、断点和汇总目录')
+    parser.add_argument('--fleet-concurrency', type=int, help='--fleet 同时扫描的仓库数（默认: 4）')
+    parser.add_argument('--fleet-restart', action='store_true', help='--fleet 忽略上次中断留下的断点，重新扫描全部仓库')
     args = parser.parse_args()
+    if not (args.repo or args.file or args.serve or args.fleet):
+        parser.error("需要提供 --repo 或 --file（或使用 --serve 启动分析服务、--fleet 批量扫描）")
+    
+    # 未启用时埋点只检查一次全局变量，几乎没有开销
+    profiler = profiling.enable() if args.profile else None
+    cprofiler = None
+    if args.cprofile:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    try:
+        run(args)
+    finally:
+        if cprofiler:
+            cprofiler.disable()
+            cprofiler.dump_stats(args.cprofile)
+            print(f"cProfile 数据已保存到: {os.path.abspath(args.cprofile)}")
+        if profiler:
+            profiling.disable()
+            os.makedirs(args.profile_dir, exist_ok=True)
+            json_path = os.path.join(args.profile_dir, PROFILE_JSON)
+            prom_path = os.path.join(args.profile_dir, PROFILE_PROMETHEUS)
+            profiler.write_json(json_path)
+            profiler.write_prometheus(prom_path)
+            print_profile_summary(profiler)
+            print(f"性能分析结果已保存到: {os.path.abspath(json_path)}, {os.path.abspath(prom_path)}")
+
+def print_profile_summary(profiler, limit=10):
+    """在终端输出耗时最多的计时器和最慢的文件"""
+    summary = profiler.summary()
+    print(f"\n--- 性能分析（总耗时 {summary['wall_seconds']:.3f} 秒）---")
+    timers = sorted(summary['timers'].items(), key=lambda item: -item[1]['total_seconds'])[:limit]
+    for name, timer in timers:
+        print(f"  {name}: {timer['total_seconds']:.3f} 秒 / {timer['calls']} 次（最长 {timer['max_seconds'] * 1000:.1f} 毫秒）")
+    if summary['slowest_files']:
+        print("最慢的文件:")
+        for entry in summary['slowest_files']:
+            print(f"  {entry['path']}: {entry['seconds'] * 1000:.1f} 毫秒（{entry['bytes']} 字节）")
+
+def run(args):
+    """执行一次分析或重构"""
+    if args.serve:
+        from core import server
+        server.serve(
+            args.server or server.DEFAULT_ADDRESS, jobs=args.jobs, cache_dir=None if args.no_cache else args.cache_dir,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            on_ready=lambda _: print(f"分析服务已启动: {args.server or server.DEFAULT_ADDRESS}（{args.jobs} 个工作进程，按 Ctrl+C 停止）")
+        )
+        print("分析服务已停止")
+        return
+    
+    cache = None
+    if not args.no_cache:
+        from core.cache import AnalysisCache
+        cache = AnalysisCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
     
+    limits = FileLimits(args.max_file_kb * 1024, args.max_line_length)
     print("===== 代码重构服务启动 =====")
     
-    # 1. 处理单个文件分析
-    if args.file:
-        print(f"\n分析文件: {args.file}")
-        
-        if args.file.endswith('.py'):
-            issues = detect_python_smells(args.file)
-            complexity = analyze_python_complexity(args.file)
-            
-            print(f"\n代码异味: {len(issues)} 个")
-            for issue in issues:
-                print(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message')}")
-            
-            print(f"\n复杂度分析:")
-            print(f"  - 圈复杂度: {complexity.get('cyclomatic_complexity')}")
-            print(f"  - 可维护性指数: {complexity.get('maintainability_index')}")
-            print(f"  - 代码行数: {complexity.get('lines_of_code')}")
-            
-            if not args.analyze_only:
-                print("\n执行重构...")
-                refactor_result = refactor_python_long_methods(args.file)
-                print(f"长方法重构: {refactor_result['message']}")
-                
-                optimize_result = optimize_python_imports(args.file)
-                print(f"导入优化: {optimize_result['message']}")
-        
-        elif args.file.endswith('.js'):
-            issues = detect_javascript_smells(args.file)
-            complexity = analyze_javascript_complexity(args.file)
-            
-            print(f"\n代码异味: {len(issues)} 个")
-            for issue in issues:
-                print(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message')}")
-            
-            print(f"\n复杂度分析:")
-            print(f"  - 圈复杂度: {complexity.get('cyclomatic_complexity')}")
-            print(f"  - 可维护性指数: {complexity.get('maintainability_index')}")
-            print(f"  - 代码行数: {complexity.get('lines_of_code')}")
-            
-            if not args.analyze_only:
-                print("\n执行重构...")
-                refactor_result = refactor_javascript_long_methods(args.file)
-                print(f"长方法重构: {refactor_result['message']}")
-                
-                optimize_result = optimize_javascript_variables(args.file)
-                print(f"变量优化: {optimize_result['message']}")
-        
+    # 各分支提前返回时也要释放仓库锁并关闭缓存
+    try:
+        if args.fleet:
+            scan_fleet_manifest(args, cache, limits)
+        elif args.file:
+            analyze_file(args, cache, limits)
         else:
-            print("不支持的文件类型，仅支持 .py 和 .js 文件")
-        
+            with ExitStack() as repo_lock:
+                analyze_repository(args, cache, limits, repo_lock)
+    finally:
+        if cache:
+            cache.close()
+
+def analyze_file(args, cache, limits):
+    """分析（并重构）单个文件：按扩展名找到语言插件，只导入该语言的分析器"""
+    print(f"\n分析文件: {args.file}")
+    
+    plugin = plugin_for(args.file)
+    if plugin is None:
+        print(f"不支持的文件类型，仅支持 {', '.join(source_extensions())} 文件")
         return
     
-    # 2. 处理仓库分析
+    skipped = limits.check(args.file)
+    if skipped is not None:
+        print(skipped['message'])
+        return
+    
+    smells_kind, complexity_kind = plugin.kind('smells'), plugin.kind('complexity')
+    issues = cache.analyze(args.file, smells_kind) if cache else plugin.get('smells')(args.file)
+    complexity = cache.analyze(args.file, complexity_kind) if cache else plugin.get('complexity')(args.file)
+    
+    print(f"\n代码异味: {len(issues)} 个")
+    for issue in issues:
+        print(f"  - 行 {issue.get('line', '?')}: [{issue.get('type', 'unknown')}] {issue.get('message')}")
+    
+    print(f"\n复杂度分析:")
+    print(f"  - 圈复杂度: {complexity.get('cyclomatic_complexity')}")
+    print(f"  - 可维护性指数: {complexity.get('maintainability_index')}")
+    print(f"  - 代码行数: {complexity.get('lines_of_code')}")
+    
+    function_complexity = plugin.get('function_complexity')
+    hotspots = function_complexity(args.file, top_n=5).get('functions', []) if function_complexity else []
+    if hotspots:
+        print(f"\n复杂度最高的函数:")
+        for func in hotspots:
+            print(f"  - 行 {func['line']}: {func['qualname']} 圈复杂度 {func['cyclomatic_complexity']}, "
+                  f"嵌套深度 {func['nesting_depth']}, {func['length']} 行, {func['parameters']} 个参数")
+    
+    if not args.analyze_only:
+        print("\n执行重构...")
+        refactor = plugin.get('refactor')
+        if refactor:
+            refactor_result = refactor(args.file)
+            print(f"长方法重构: {refactor_result['message']}")
+        
+        optimize = plugin.get('optimize')
+        if optimize:
+            optimize_result = optimize(args.file)
+            print(f"{plugin.optimize_label}: {optimize_result['message']}")
+
+def analyze_repository(args, cache, limits, repo_lock):
+    """分析（并重构）本地或远程仓库；远程仓库的检出登记到 repo_lock，扫描结束前持有仓库锁"""
     if args.repo.startswith(('http://', 'https://')):
         # GitHub仓库
         if not args.token:
@@ -75,7 +196,8 @@ def main():
             return
         
         print(f"\n连接到GitHub仓库: {args.repo}")
-        repo_info = connect_to_repo(args.repo, args.token)
+        from integrations.github_integration import connect_to_repo
+        repo_info = connect_to_repo(args.repo, args.token, args.api_base)
         
         if repo_info['status'] != 'connected':
             print(f"错误: {repo_info['message']}")
@@ -83,53 +205,400 @@ def main():
         
         print(f"成功连接到仓库: {repo_info['repo_info']['full_name']}")
     
-    # 扫描仓库
+    # 远程仓库先增量获取到本地镜像并稀疏检出，扫描结束前持有仓库锁
+    scan_path = args.repo
+    if is_remote_url(args.repo):
+        print(f"\n获取仓库: {args.repo}")
+        from core.repo_fetcher import checked_out_repository, RepositoryFetchError
+        try:
+            checkout = repo_lock.enter_context(checked_out_repository(
+                args.repo, ref=args.ref, token=args.token, cache_dir=args.repo_cache_dir
+            ))
+        except RepositoryFetchError as e:
+            print(f"错误: 获取仓库失败: {e}")
+            return
+        scan_path = checkout['path']
+        print(f"已检出提交 {checkout['commit'][:12]} 到 {scan_path}")
+    
+    # 只分析 git 变更的文件
+    paths = None
+    if args.since or args.diff:
+        from core.git_changes import changed_files
+        diff_result = changed_files(scan_path, since=args.since, diff=args.diff)
+        if "error" in diff_result:
+            print(f"错误: {diff_result['error']}")
+            return
+        paths = diff_result['changed']
+        print(f"\n变更文件: {len(paths)} 个，删除 {len(diff_result['deleted'])} 个，重命名 {len(diff_result['renamed'])} 个")
+    
+    # 扫描仓库：逐文件流式写入报告，不在内存中保存完整结果
     print("\n开始扫描仓库...")
-    scan_results = scan_repository(args.repo)
+    if not os.path.exists(scan_path):
+        print("\n错误: 仓库路径不存在")
+        return
+    
+    if args.watch:
+        if is_remote_url(args.repo) or not os.path.isdir(scan_path):
+            print("错误: --watch 仅支持本地仓库目录")
+            return
+        watch(args, scan_path, cache, limits)
+        return
+    
+    if args.history:
+        analyze_history(args, scan_path, cache, limits)
+        return
+    
+    # 只记录需要重构的文件及问题数，供后续重构步骤使用
+    files_to_refactor = {"python": [], "javascript": []}
+    
+    # 因过大、压缩或生成而跳过的文件不参与重构
+    too_large = []
+    
+    def track(file_results):
+        for file_info in file_results:
+            if file_info['issues'] and file_info['issues'][0].get('type') == 'skipped_file':
+                too_large.append(file_info['issues'][0])
+            elif file_info['issues']:
+                files_to_refactor.setdefault(file_info['language'], []).append(
+                    {"file": file_info['path'], "issues": len(file_info['issues'])}
+                )
+            yield file_info
+    
+    # 遍历时按 .gitignore、项目规则和 --exclude 跳过依赖、构建产物等目录
+    from core.ignore import IgnoreEngine
+    ignore = IgnoreEngine(scan_path, args.exclude)
     
-    # 生成分析报告
-    report = generate_report(scan_results)
-    print(f"\n{report}")
+    # 重复代码需要整个仓库的指纹索引，先于逐文件扫描完成，结果合并到各文件的问题列表
+    duplicates = {}
+    if args.duplicates and os.path.isdir(scan_path):
+        from core.clones import clone_issues, find_clones
+        from core.scanner import _iter_source_files
+        clones = find_clones(_iter_source_files(scan_path, IgnoreEngine(scan_path, args.exclude)), jobs=args.jobs,
+                             cache=cache, report_paths=paths, limits=limits)
+        print(f"重复代码: {len(clones['clones'])} 处，相似文件: {len(clones['similar_files'])} 对"
+              f"（{clones['files']} 个文件，{clones['fingerprints']} 个指纹）")
+        duplicates = clone_issues(clones)
+    
+    def with_duplicates(file_results):
+        for file_info in file_results:
+            extra = duplicates.get(os.path.abspath(file_info['path']))
+            if extra:
+                file_info = dict(file_info, issues=file_info['issues'] + extra)
+            yield file_info
+    
+    # 分析服务在运行时交给服务的常驻进程池分析，否则在本进程内分析
+    from core import server
+    client = None if args.no_server or not os.path.isdir(scan_path) else server.connect(args.server or server.DEFAULT_ADDRESS)
+    if client:
+        print(f"使用分析服务: {client.address}")
+    
+    writer_class = REPORT_WRITERS[args.format]
+    report_file = args.output or writer_class.default_filename
+    options = {"base_dir": scan_path} if args.format == 'sarif' and os.path.isdir(scan_path) else {}
+    try:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            summary = get_report_writer(args.format, f, **options).write_all(
+                with_duplicates(track(iter_scan_results(client, scan_path, args.jobs, cache, paths, ignore, limits)))
+            )
+    except server.ServerError as e:
+        print(f"错误: 分析服务返回错误: {e}")
+        return
+    finally:
+        if cache:
+            stats = cache.stats()
+            if client is None or stats['hits'] or stats['misses']:
+                print(f"缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} / 淘汰 {stats['evictions']}")
+            cache.close()
     
-    # 保存报告到文件
-    report_file = "code_refactor_report.txt"
-    with open(report_file, 'w', encoding='utf-8') as f:
-        f.write(report)
+    # 文本报告直接输出到终端，机器可读格式只输出汇总
+    if args.format == 'text':
+        print()
+        with open(report_file, 'r', encoding='utf-8') as f:
+            shutil.copyfileobj(f, sys.stdout)
+        print()
+    else:
+        print(f"\n总问题数: {summary['total_issues']}（Python文件 {summary['python_files']} 个，"
+              f"JavaScript文件 {summary['javascript_files']} 个）")
+    skipped = ignore.stats
+    if skipped['skipped_dirs'] or skipped['skipped_files']:
+        print(f"已跳过: {skipped['skipped_dirs']} 个目录，{skipped['skipped_files']} 个文件"
+              f"（{skipped['skipped_bytes'] / 1024:.1f} KB）")
+    if too_large:
+        print(f"未分析的大文件、压缩或生成的文件: {len(too_large)} 个"
+              f"（{sum(issue['size'] for issue in too_large) / 1024:.1f} KB，见报告中的 skipped_file）")
     print(f"\n报告已保存到: {os.path.abspath(report_file)}")
     
+    if (args.record_metrics or args.debt_trend) and os.path.isdir(scan_path):
+        from core.metrics_store import MetricsStore
+        store = MetricsStore(args.metrics_dir or default_metrics_dir(args.cache_dir, scan_path))
+        if args.record_metrics:
+            record_current_metrics(store, scan_path, args, limits)
+        if args.debt_trend:
+            print_debt_trend(store)
+    
     # 执行重构
     if not args.analyze_only:
         print("\n执行重构操作...")
-        # 在MVP阶段，我们只是模拟重构操作
-        changes = []
+        # 收集所有需要重构的文件，并行计算修改（此时不写任何文件）
+        changes = files_to_refactor["python"] + files_to_refactor["javascript"]
         
-        # 收集所有需要重构的文件
-        for file_info in scan_results.get('python_files', []):
-            changes.append({"file": file_info['path'], "issues": len(file_info['issues'])})
+        print(f"发现 {len(changes)} 个文件需要重构")
+        from refactors import build_changeset
+        changeset = build_changeset([change['file'] for change in changes], jobs=args.jobs)
+        print(f"可自动修复 {len(changeset)} 个文件")
+        for error in changeset.errors:
+            print(f"  - 跳过 {error['file']}: {error['message']}")
         
-        for file_info in scan_results.get('javascript_files', []):
-            changes.append({"file": file_info['path'], "issues": len(file_info['issues'])})
+        if args.dry_run:
+            print()
+            for diff in changeset.iter_diff(scan_path):
+                sys.stdout.write(diff)
         
-        print(f"发现 {len(changes)} 个文件需要重构")
+        # 如果是GitHub仓库，把修改合并为一次提交并向检出的分支创建PR（--ref 为标签或提交时
+        # 没有目标分支，不创建）；本地仓库直接原子写入
+        elif args.repo.startswith(('http://', 'https://')) and checkout['branch'] is None:
+            print(f"--ref {args.ref} 不是分支，无法创建PR，修改未写入（可使用 --dry-run 查看）")
         
-        # 如果是GitHub仓库，创建PR
-        if args.repo.startswith(('http://', 'https://')):
+        elif args.repo.startswith(('http://', 'https://')):
+            file_changes = [
+                {"path": os.path.relpath(edit.path, scan_path), "content": edit.new}
+                for edit in changeset.edits
+            ]
+            from integrations.github_integration import create_pull_request
             pr_result = create_pull_request(
                 args.repo, 
                 args.token, 
-                changes, 
+                file_changes, 
                 "代码自动重构建议", 
-                "基于代码质量分析的自动重构建议\n\n请查看附件报告获取详细信息。"
+                "基于代码质量分析的自动重构建议\n\n请查看附件报告获取详细信息。",
+                base=checkout['branch'],
+                api_base=args.api_base,
+                parent=checkout['commit']
             )
             
-            if pr_result['status'] == 'created':
+            if pr_result['status'] == 'no_changes':
+                print(f"\n{pr_result['message']}")
+            elif pr_result['status'] == 'created':
                 print(f"\n✅ 拉取请求已创建")
                 print(f"📋 PR URL: {pr_result['pr_url']}")
                 print(f"🔍 包含 {pr_result['changes_count']} 个文件的重构建议")
             else:
                 print(f"\n❌ 创建PR失败: {pr_result['message']}")
+        
+        elif is_remote_url(args.repo):
+            print("非GitHub远程仓库不支持创建PR，修改未写入（可使用 --dry-run 查看）")
+        
+        else:
+            apply_result = changeset.apply()
+            print(apply_result['message'])
     
     print("\n===== 分析完成 =====")
 
+def iter_scan_results(client, scan_path, jobs, cache, paths, ignore=None, limits=None):
+    """优先使用分析服务；连接失败时（此时尚未产出任何结果）回退到进程内分析"""
+    from core import server
+    from core.scanner import iter_scan_repository
+    if client is not None:
+        try:
+            yield from client.scan(scan_path, paths, ignore.excludes if ignore else (), limits)
+            return
+        except server.ServerUnavailable as e:
+            print(f"{e}，改为在本进程内分析")
+    yield from iter_scan_repository(scan_path, jobs=jobs, cache=cache, paths=paths, ignore=ignore, limits=limits)
+
+def default_metrics_dir(cache_dir, repo_path):
+    """每个仓库目录一个指标库"""
+    import hashlib
+    key = hashlib.sha1(os.path.abspath(repo_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'metrics', key)
+
+def record_current_metrics(store, repo_path, args, limits):
+    """以 HEAD 的提交哈希记录工作区的指标（复杂度结果与扫描共用分析缓存）"""
+    from core.cache import AnalysisCache
+    from core.git_changes import GitError, head_commit
+    from core.ignore import IgnoreEngine
+    from core.metrics_store import record_metrics
+    from core.scanner import _iter_source_files
+    try:
+        commit, commit_time = head_commit(repo_path)
+    except GitError as e:
+        print(f"错误: 无法确定当前提交，未记录指标: {e}")
+        return
+    # 同一提交重复运行时不再追加，避免指标库随重复记录增长
+    if commit in store:
+        print(f"提交 {commit[:12]} 的指标已记录，跳过")
+        return
+    cache = None if args.no_cache else AnalysisCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    try:
+        files, functions = record_metrics(
+            store, commit, repo_path, _iter_source_files(repo_path, IgnoreEngine(repo_path, args.exclude)),
+            jobs=args.jobs, cache=cache, limits=limits, commit_time=commit_time
+        )
+    finally:
+        if cache:
+            cache.close()
+    print(f"已记录提交 {commit[:12]} 的指标: {files} 个文件，{functions} 个函数")
+
+def print_debt_trend(store, limit=10):
+    """输出最近 limit 次记录的趋势、最近一次相对上一次的退化热点和按目录的代码行数"""
+    if not len(store):
+        print("指标库中还没有记录（使用 --record-metrics 记录）")
+        return
+    import time
+    print("\n技术债务趋势:")
+    for entry in store.commits()[-limit:]:
+        summary = entry["summary"]
+        print(f"  {entry['commit'][:12]} {time.strftime('%Y-%m-%d', time.localtime(entry['time']))}  "
+              f"文件 {summary['files']}  代码行 {summary['lines_of_code']}  "
+              f"平均圈复杂度 {summary['mean_complexity']}  P90 {summary['p90_complexity']}  "
+              f"平均可维护性 {summary['mean_maintainability']}")
+    commits = store.commits()
+    if len(commits) >= 2:
+        regressions = store.top_regressions(commits[-2]["commit"], commits[-1]["commit"], n=limit)
+        if regressions:
+            print("\n复杂度增加最多的函数:")
+            for item in regressions:
+                base = "新增" if item["base"] is None else f"{item['base']:g}"
+                print(f"  {item['path']}:{item['function']}  {base} -> {item['head']:g} (+{item['delta']:g})")
+    print("\n按目录汇总（代码行）:")
+    for directory, rollup in store.directory_rollup("lines_of_code").items():
+        print(f"  {directory}: {rollup['files']} 个文件，{rollup['sum']:g} 行")
+
+def scan_fleet_manifest(args, cache, limits):
+    """--fleet: 扫描清单中的所有仓库，逐个输出完成情况，最后输出汇总"""
+    from core.fleet import DEFAULT_MAX_ACTIVE, SUMMARY_FILE, FleetScanner, load_manifest
+    max_active = args.fleet_concurrency or DEFAULT_MAX_ACTIVE
+    try:
+        repositories = load_manifest(args.fleet)
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法读取仓库清单: {e}")
+        if cache:
+            cache.close()
+        return
+    print(f"\n批量扫描 {len(repositories)} 个仓库（同时 {max_active} 个，{args.jobs} 个工作进程）")
+    
+    def on_complete(result, done, total):
+        if result['status'] == 'ok':
+            print(f"  [{done}/{total}] {result['name']}: {result['files']} 个文件，"
+                  f"{result['total_issues']} 个问题（{result['seconds']:.1f} 秒）")
+        else:
+            print(f"  [{done}/{total}] {result['name']}: 失败: {result['message']}")
+    
+    scanner = FleetScanner(repositories, args.fleet_dir, jobs=args.jobs, cache=cache, fmt=args.format, limits=limits,
+                           max_active=max_active, on_complete=on_complete,
+                           fetch_options={"token": args.token, "cache_dir": args.repo_cache_dir})
+    try:
+        summary = scanner.run(resume=not args.fleet_restart)
+    except KeyboardInterrupt:
+        print("\n已中断，再次运行同一清单时从断点继续")
+        return
+    finally:
+        if cache:
+            cache.close()
+    if summary['resumed']:
+        print(f"从断点继续: {summary['resumed']} 个仓库已在上次完成")
+    print(f"\n扫描完成: {summary['scanned']} 个仓库，失败 {summary['failed']} 个，"
+          f"{summary['files']} 个文件，总问题数 {summary['total_issues']}（{summary['seconds']:.1f} 秒）")
+    for issue_type, count in list(summary['issue_types'].items())[:10]:
+        print(f"  {issue_type}: {count}")
+    if summary['top_repositories']:
+        print("问题最多的仓库:")
+        for item in summary['top_repositories']:
+            print(f"  {item['name']}: {item['total_issues']}")
+    print(f"报告目录: {os.path.abspath(args.fleet_dir)}，汇总: {os.path.abspath(os.path.join(args.fleet_dir, SUMMARY_FILE))}")
+
+def analyze_history(args, repo_path, cache, limits):
+    """--history: 逐个提交输出问题数并把结果按 JSON 行写入报告；--record-metrics 时把每个提交的指标追加到指标库"""
+    import json
+    import time
+    from core.git_changes import GitError
+    from analyzers.issues import json_default
+    from core.history import iter_history
+    store = None
+    if args.record_metrics or args.debt_trend:
+        from core.metrics_store import MetricsStore
+        store = MetricsStore(args.metrics_dir or default_metrics_dir(args.cache_dir, repo_path))
+    report_file = args.output or 'code_refactor_history.jsonl'
+    stats = {}
+    started = time.perf_counter()
+    try:
+        with open(report_file, 'w', encoding='utf-8') as report:
+            for result in iter_history(repo_path, args.history, jobs=args.jobs, cache=cache, limits=limits,
+                                       excludes=args.exclude, metrics=args.record_metrics,
+                                       max_count=args.history_limit, stats=stats):
+                report.write(json.dumps(result, ensure_ascii=False, default=json_default) + "\n")
+                print(f"  {result['commit'][:12]} {time.strftime('%Y-%m-%d', time.localtime(result['time']))}  "
+                      f"文件 {len(result['files'])}  问题 {result['total_issues']}")
+                if store is not None and args.record_metrics and result['commit'] not in store:
+                    store.append(result['commit'], (dict(entry['metrics'], path=entry['path'])
+                                                    for entry in result['files'] if 'metrics' in entry),
+                                 result['time'])
+    except GitError as e:
+        print(f"错误: 读取提交历史失败: {e}")
+        return
+    finally:
+        if cache:
+            cache.close()
+    print(f"\n已分析 {stats.get('commits', 0)} 个提交，读取 {stats.get('blobs', 0)} 个文件版本"
+          f"（实际分析 {stats.get('analyzed', 0)} 个，其余来自缓存或被跳过），"
+          f"耗时 {time.perf_counter() - started:.1f} 秒")
+    print(f"报告已保存到: {os.path.abspath(report_file)}")
+    if store is not None and args.debt_trend:
+        print_debt_trend(store)
+
+def default_snapshot_path(cache_dir, repo_path):
+    """每个仓库目录一个快照文件"""
+    import hashlib
+    key = hashlib.sha1(os.path.abspath(repo_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'snapshots', f"{key}.json")
+
+def write_report_atomically(fmt, report_file, file_results, **options):
+    """先写临时文件再替换，读者不会看到写了一半的报告"""
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(report_file))
+    fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            summary = get_report_writer(fmt, f, **options).write_all(file_results)
+        os.replace(temp_path, report_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return summary
+
+def watch(args, repo_path, cache, limits=None):
+    """常驻分析：每轮增量更新后重写报告，收到 SIGINT/SIGTERM 时保存快照退出"""
+    import signal
+    from core.watcher import AnalysisDaemon
+    report_file = args.output or REPORT_WRITERS[args.format].default_filename
+    options = {"base_dir": repo_path} if args.format == 'sarif' else {}
+    snapshot_path = args.snapshot or default_snapshot_path(args.cache_dir, repo_path)
+    
+    def on_update(update):
+        write_report_atomically(args.format, report_file, daemon.file_results(), **options)
+        print(f"已更新: 重新分析 {len(update['analyzed'])} 个文件，删除 {len(update['deleted'])} 个；"
+              f"共 {update['files']} 个文件，{update['total_issues']} 个问题")
+    
+    daemon = AnalysisDaemon(
+        repo_path, jobs=args.jobs, cache=cache, snapshot_path=snapshot_path,
+        debounce=args.debounce_ms / 1000, poll_interval=args.poll_interval,
+        force_polling=args.force_polling, on_update=on_update, excludes=args.exclude,
+        limits=limits
+    )
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    print(f"监视仓库变更: {os.path.abspath(repo_path)}（按 Ctrl+C 停止）")
+    print(f"报告: {os.path.abspath(report_file)}")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        if cache:
+            cache.close()
+    print(f"\n快照已保存到: {snapshot_path}")
+    print("\n===== 监视已停止 =====")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
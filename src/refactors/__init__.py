@@ -1,9 +1,21 @@
 from .python_refactor import refactor_long_methods as refactor_python_long_methods, optimize_imports as optimize_python_imports
 from .javascript_refactor import refactor_long_methods as refactor_javascript_long_methods, optimize_variables as optimize_javascript_variables
+from .changeset import ChangeSet, FileEdit, build_changeset, compute_edit, register_fixer
+from .pipeline import Edit, Fixer, FixerPipeline, SourceFile, register_pipeline_fixer
 
 __all__ = [
     'refactor_python_long_methods',
     'optimize_python_imports',
     'refactor_javascript_long_methods',
-    'optimize_javascript_variables'
+    'optimize_javascript_variables',
+    'ChangeSet',
+    'FileEdit',
+    'build_changeset',
+    'compute_edit',
+    'register_fixer',
+    'Edit',
+    'Fixer',
+    'FixerPipeline',
+    'SourceFile',
+    'register_pipeline_fixer'
 ]
\ No newline at end of file
@@ -0,0 +1,158 @@
+import difflib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from analyzers import profiling
+
+# 每个扩展名对应的源码修复函数列表：fixer(source) -> (新源码, 修改列表)，按注册顺序执行
+FIXERS = {}
+# 分发到进程池时每批处理的文件数
+CHUNK_SIZE = 16
+
+def register_fixer(extension, fixer):
+    """为指定扩展名注册源码修复函数"""
+    FIXERS.setdefault(extension, []).append(fixer)
+
+def read_source(file_path):
+    """读取源码，保留原有换行符"""
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+class FileEdit:
+    """单个文件的修改：原内容、新内容以及各修复函数报告的修改项"""
+    __slots__ = ('path', 'original', 'new', 'changes', 'error')
+
+    def __init__(self, path, original, new=None, changes=None, error=None):
+        self.path = path
+        self.original = original
+        self.new = original if new is None else new
+        self.changes = changes or []
+        self.error = error
+
+    @property
+    def changed(self):
+        return self.error is None and self.new != self.original
+
+    def diff(self, base_dir=None):
+        """返回 unified diff 文本，内容未变化时为空字符串"""
+        if not self.changed:
+            return ''
+        name = os.path.relpath(self.path, base_dir) if base_dir else self.path
+        name = name.replace(os.sep, '/')
+        return ''.join(difflib.unified_diff(
+            self.original.splitlines(keepends=True), self.new.splitlines(keepends=True),
+            fromfile=f"a/{name}", tofile=f"b/{name}"
+        ))
+
+def compute_edit(file_path, fixers=None):
+    """读取一次文件并依次执行修复函数，返回 FileEdit（不写文件）"""
+    fixers = FIXERS.get(os.path.splitext(file_path)[1], []) if fixers is None else fixers
+    try:
+        original = read_source(file_path)
+    except (OSError, UnicodeDecodeError) as e:
+        return FileEdit(file_path, None, error=str(e))
+
+    source = original
+    changes = []
+    try:
+        for fixer in fixers:
+            source, fixer_changes = fixer(source)
+            changes.extend(fixer_changes)
+    except Exception as e:
+        return FileEdit(file_path, original, error=str(e))
+    return FileEdit(file_path, original, source, changes)
+
+def _compute_edits(file_paths):
+    return [compute_edit(file_path) for file_path in file_paths]
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class ChangeSet:
+    """多个文件的修改集合，支持 dry-run diff 和原子写入"""
+
+    def __init__(self, edits=()):
+        self.edits = []
+        self.errors = []
+        for edit in edits:
+            self.add(edit)
+
+    def add(self, edit):
+        if edit.error is not None:
+            self.errors.append({"file": edit.path, "message": edit.error})
+        elif edit.changed:
+            self.edits.append(edit)
+
+    def __len__(self):
+        return len(self.edits)
+
+    def iter_diff(self, base_dir=None):
+        for edit in self.edits:
+            yield edit.diff(base_dir)
+
+    def diff(self, base_dir=None):
+        """返回所有修改的 unified diff"""
+        return ''.join(self.iter_diff(base_dir))
+
+    @profiling.profiled("refactor.apply")
+    def apply(self):
+        """原子地写入所有修改
+
+        先把所有新内容写入同目录下的临时文件，并确认磁盘上的文件在计算修改后
+        没有被改动；全部成功后再逐个 os.replace。任何一步失败都会清理临时文件、
+        恢复已替换的文件，磁盘上不会留下写了一半的文件。未变化的文件不会被写入。
+        """
+        staged = []
+        try:
+            for edit in self.edits:
+                if read_source(edit.path) != edit.original:
+                    raise RuntimeError(f"文件在修改期间已变化: {edit.path}")
+                fd, temp_path = tempfile.mkstemp(prefix='.coderevive-', dir=os.path.dirname(edit.path) or '.')
+                staged.append((edit, temp_path))
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                    f.write(edit.new)
+                    f.flush()
+                    os.fsync(f.fileno())
+                shutil.copymode(edit.path, temp_path)
+        except Exception as e:
+            for _, temp_path in staged:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+            return {"status": "error", "message": f"应用修改失败: {e}", "applied": []}
+
+        applied = []
+        try:
+            for edit, temp_path in staged:
+                os.replace(temp_path, edit.path)
+                applied.append(edit)
+        except OSError as e:
+            # 回滚已替换的文件，并清理剩余的临时文件
+            for edit in applied:
+                with open(edit.path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(edit.original)
+            for _, temp_path in staged[len(applied):]:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+            return {"status": "error", "message": f"应用修改失败: {e}", "applied": []}
+
+        return {
+            "status": "success",
+            "message": f"已修改 {len(applied)} 个文件",
+            "applied": [edit.path for edit in applied]
+        }
+
+@profiling.profiled("refactor.changeset")
+def build_changeset(file_paths, jobs=1):
+    """并行计算多个文件的修改并返回 ChangeSet，不写任何文件"""
+    file_paths = list(file_paths)
+    if jobs <= 1 or len(file_paths) <= CHUNK_SIZE:
+        return ChangeSet(_compute_edits(file_paths))
+
+    changeset = ChangeSet()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for edits in executor.map(_compute_edits, _chunks(file_paths, CHUNK_SIZE)):
+            for edit in edits:
+                changeset.add(edit)
+    return changeset
@@ -0,0 +1,337 @@
+import ast
+import re
+from bisect import bisect_left, bisect_right
+from analyzers import profiling
+from analyzers.javascript_tokenizer import tokenize
+from .changeset import register_fixer
+
+_LINE_BREAK_RE = re.compile(r'\r\n|\r|\n')
+_JS_STATEMENT_KEYWORDS = frozenset(('var', 'let', 'const', 'function', 'class', 'return', 'if', 'for', 'while'))
+# 行首出现这些记号时，上一条没有分号的语句会与它连起来解析（ASI 不生效）
+_JS_CONTINUATION_PUNCTS = frozenset(('(', '[', '+', '-'))
+_JS_CONTINUATION_KINDS = frozenset(('template', 'regex', 'div'))
+
+class Edit:
+    """对原始源码的一处替换，偏移量为左闭右开区间（插入时 start == end）"""
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start, end, text=''):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def overlaps(self, other):
+        if self.start == self.end == other.start == other.end:
+            return True
+        return self.start < other.end and other.start < self.end
+
+class SourceFile:
+    """只加载一次的源码及其共享表示
+
+    行起始偏移在构造时计算；Python 的 AST 和 JavaScript 的记号流在第一次使用时
+    构建，之后所有修复器共享。修复器产生的 Edit 都基于原始源码的偏移，
+    因此前一个修复器不会使后一个修复器看到的位置失效。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.line_starts = [0] + [match.end() for match in _LINE_BREAK_RE.finditer(source)]
+        self._tree = None
+        self._tokens = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = profiling.call("python.parse", ast.parse, self.source)
+        return self._tree
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = profiling.call("javascript.tokenize", tokenize, self.source)
+        return self._tokens
+
+    def line_of(self, offset):
+        """返回偏移量所在的行号（从 1 开始）"""
+        return bisect_right(self.line_starts, offset)
+
+    def offset(self, lineno, col_offset):
+        """把 AST 的 (行号, UTF-8 字节列) 转换为字符偏移"""
+        line_start = self.line_starts[lineno - 1]
+        line = self.source[line_start:line_start + col_offset]
+        if line.isascii():
+            return line_start + col_offset
+        return line_start + len(line.encode('utf-8')[:col_offset].decode('utf-8', 'ignore'))
+
+    def node_span(self, node):
+        return self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset)
+
+    def removal(self, start, end):
+        """删除 [start, end)；若删除后该行只剩空白，则整行删除（含换行符）"""
+        line = self.line_of(start)
+        line_start = self.line_starts[line - 1]
+        end_line = self.line_of(max(end - 1, start))
+        line_end = self.line_starts[end_line] if end_line < len(self.line_starts) else len(self.source)
+        rest = self.source[end:line_end]
+        if not self.source[line_start:start].strip() and not rest.strip():
+            return Edit(line_start, line_end)
+        return Edit(start, end)
+
+class Fixer:
+    """修复器基类：检查 SourceFile 并返回 [(Edit, 修改说明)]，不修改源码"""
+    extensions = ()
+
+    def fix(self, source_file):
+        raise NotImplementedError
+
+class DuplicateImportFixer(Fixer):
+    """移除模块顶层完全相同的重复导入（名字和别名都相同）"""
+    extensions = ('.py',)
+
+    def _statement_removal(self, source_file, node):
+        start, end = source_file.node_span(node)
+        source = source_file.source
+        # 同一行用分号分隔的多条语句：连同分号一起删除
+        after = end
+        while after < len(source) and source[after] in ' \t':
+            after += 1
+        if after < len(source) and source[after] == ';':
+            end = after + 1
+            while end < len(source) and source[end] in ' \t':
+                end += 1
+        else:
+            before = start
+            while before > 0 and source[before - 1] in ' \t':
+                before -= 1
+            if before > 0 and source[before - 1] == ';':
+                start = before - 1
+        return source_file.removal(start, end)
+
+    def _alias_removals(self, source_file, node, duplicates):
+        """只删除重复的导入名及其逗号，语句中的其他内容（包括注释）保持不变，返回 [(导入名, Edit)]
+
+        没有导入名位置信息（Python 3.10 之前）时返回空列表，不修改该语句。
+        """
+        if getattr(node.names[0], 'end_lineno', None) is None:
+            return []
+        source = source_file.source
+        parenthesized = source[source_file.node_span(node)[1] - 1] == ')'
+        removed = {id(alias) for alias in duplicates}
+        last_kept = max(i for i, alias in enumerate(node.names) if id(alias) not in removed)
+        edits = []
+        trailing = None
+        for index, alias in enumerate(node.names):
+            if id(alias) not in removed:
+                continue
+            if index > last_kept and not parenthesized:
+                # 不带括号的语句末尾的名字：从最后一个保留的名字之后整段删除（同一行内，没有注释）
+                if trailing is None:
+                    kept = node.names[last_kept]
+                    end = node.names[-1]
+                    trailing = Edit(source_file.offset(kept.end_lineno, kept.end_col_offset),
+                                    source_file.offset(end.end_lineno, end.end_col_offset))
+                edits.append((alias, trailing))
+                continue
+            start = source_file.offset(alias.lineno, alias.col_offset)
+            end = source_file.offset(alias.end_lineno, alias.end_col_offset)
+            after = end
+            while after < len(source) and source[after] in ' \t':
+                after += 1
+            if after < len(source) and source[after] == ',':
+                # 连同后面的逗号和同一行的空白一起删除；括号内最后一个名字没有逗号时，
+                # 前一个名字后的逗号成为合法的尾随逗号，不跨越中间的注释
+                end = after + 1
+                while end < len(source) and source[end] in ' \t':
+                    end += 1
+            edits.append((alias, source_file.removal(start, end)))
+        return edits
+
+    def fix(self, source_file):
+        results = []
+        seen = set()
+        for node in source_file.tree.body:
+            if isinstance(node, ast.Import):
+                keys = [("import", alias.name, alias.asname) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                keys = [("from", node.level, node.module, alias.name, alias.asname) for alias in node.names]
+            else:
+                continue
+
+            kept = []
+            duplicates = []
+            for alias, key in zip(node.names, keys):
+                if key in seen:
+                    duplicates.append(alias)
+                else:
+                    seen.add(key)
+                    kept.append(alias)
+            if not duplicates:
+                continue
+
+            if kept:
+                edits = self._alias_removals(source_file, node, duplicates)
+            else:
+                edit = self._statement_removal(source_file, node)
+                edits = [(alias, edit) for alias in duplicates]
+            for alias, edit in edits:
+                name = alias.name if isinstance(node, ast.Import) else f"{node.module or '.' * node.level}.{alias.name}"
+                results.append((edit, {
+                    "type": "remove_duplicate_import",
+                    "line": node.lineno,
+                    "import": name,
+                    "message": f"移除重复导入 '{name}'"
+                }))
+        return results
+
+class DuplicateVariableFixer(Fixer):
+    """处理同一代码块中重复的 var/let 声明
+
+    带初始值的重复声明改为赋值（`var a = 2;` → `a = 2;`），不带初始值的直接删除；
+    多个声明符、const 以及 for 循环头中的声明保持不变。删除后紧跟的语句以 `(`、`[`、
+    模板字符串、`+`、`-` 或 `/` 开头时也保持不变，以免它被并入上一条没有分号的语句。
+    """
+    extensions = ('.js',)
+
+    def _continues_previous(self, tokens, index):
+        if index >= len(tokens.kinds):
+            return False
+        kind = tokens.kinds[index]
+        return kind in _JS_CONTINUATION_KINDS or (kind == 'punct' and tokens.values[index] in _JS_CONTINUATION_PUNCTS)
+
+    def _initializer_end(self, tokens, index):
+        """返回初始值表达式之后的记号下标"""
+        kinds, values, pairs = tokens.kinds, tokens.values, tokens.pairs
+        count = len(kinds)
+        first = index
+        while index < count:
+            value = values[index]
+            if kinds[index] == 'punct':
+                if value in ('(', '[', '{'):
+                    index = pairs.get(index, count - 1) + 1
+                    continue
+                if value in (',', ';', ')', ']', '}'):
+                    break
+            elif kinds[index] == 'name' and index != first and value in _JS_STATEMENT_KEYWORDS:
+                break
+            index += 1
+        return index
+
+    def fix(self, source_file):
+        tokens = source_file.tokens
+        kinds, values, starts, ends, pairs = tokens.kinds, tokens.values, tokens.starts, tokens.ends, tokens.pairs
+        count = len(kinds)
+        results = []
+        seen = set()
+        blocks = []
+
+        for i in range(count):
+            value = values[i]
+            if kinds[i] == 'punct':
+                if value == '{':
+                    blocks.append(i)
+                elif value == '}' and blocks and pairs.get(i) == blocks[-1]:
+                    blocks.pop()
+                continue
+            if value not in ('var', 'let', 'const') or kinds[i] != 'name' or i + 1 >= count \
+                    or kinds[i + 1] != 'name' or (i >= 1 and values[i - 1] in ('.', '(')):
+                continue
+
+            name = values[i + 1]
+            key = (blocks[-1] if blocks else -1, name)
+            if key not in seen:
+                seen.add(key)
+                continue
+            if value == 'const':
+                continue
+
+            following = i + 2
+            if following < count and values[following] == '=':
+                end = self._initializer_end(tokens, following + 1)
+                if end < count and values[end] == ',':
+                    continue
+                edit = Edit(starts[i], starts[i + 1])
+            elif following >= count or values[following] == ';':
+                if self._continues_previous(tokens, following + 1):
+                    continue
+                edit = source_file.removal(starts[i], ends[following] if following < count else ends[i + 1])
+            elif values[following] != ',' and source_file.line_of(starts[following]) > source_file.line_of(starts[i + 1]):
+                if self._continues_previous(tokens, following):
+                    continue
+                edit = source_file.removal(starts[i], ends[i + 1])
+            else:
+                continue
+
+            results.append((edit, {
+                "type": "remove_duplicate_variable",
+                "line": source_file.line_of(starts[i]),
+                "variable": name,
+                "message": f"移除重复声明的变量 '{name}'"
+            }))
+        return results
+
+class FixerPipeline:
+    """对单个文件依次执行多个修复器，只解析一次、只生成一次新源码
+
+    所有修复器都基于同一份原始源码产生 Edit；与先前修复器的修改重叠的 Edit
+    会被丢弃（先注册的修复器优先）。最后一次性拼接出新源码。
+    """
+
+    def __init__(self, fixers):
+        self.fixers = list(fixers)
+
+    def __call__(self, source):
+        """返回 (新源码, 修改列表)，没有修改时原样返回源码"""
+        source_file = SourceFile(source)
+        accepted = []
+        changes = []
+        for fixer in self.fixers:
+            for edit, change in profiling.call(f"fixer.{type(fixer).__name__}", fixer.fix, source_file):
+                if any(edit is other for other in accepted) or self._accept(accepted, edit):
+                    changes.append(change)
+
+        if not accepted:
+            return source, changes
+        pieces = []
+        position = 0
+        for edit in accepted:
+            pieces.append(source[position:edit.start])
+            pieces.append(edit.text)
+            position = edit.end
+        pieces.append(source[position:])
+        return ''.join(pieces), changes
+
+    @staticmethod
+    def _accept(accepted, edit):
+        """按起始位置有序插入不重叠的 Edit，重叠时返回 False"""
+        index = bisect_left([other.start for other in accepted], edit.start)
+        for neighbour in accepted[max(index - 1, 0):index + 1]:
+            if edit.overlaps(neighbour):
+                return False
+        accepted.insert(index, edit)
+        return True
+
+# 每个扩展名默认启用的修复器类，按执行顺序排列
+PIPELINE_FIXERS = {}
+
+def register_pipeline_fixer(fixer_class):
+    """注册修复器类，对其声明的所有扩展名生效"""
+    for extension in fixer_class.extensions:
+        PIPELINE_FIXERS.setdefault(extension, []).append(fixer_class)
+
+def default_pipeline(extension):
+    """按注册顺序创建指定扩展名的修复流水线"""
+    return FixerPipeline(fixer_class() for fixer_class in PIPELINE_FIXERS.get(extension, []))
+
+def run_python_fixers(source):
+    """对 Python 源码执行所有已注册的修复器"""
+    return default_pipeline('.py')(source)
+
+def run_javascript_fixers(source):
+    """对 JavaScript 源码执行所有已注册的修复器"""
+    return default_pipeline('.js')(source)
+
+register_pipeline_fixer(DuplicateImportFixer)
+register_pipeline_fixer(DuplicateVariableFixer)
+# 变更集引擎对每个文件只调用一次流水线，新增修复器不会增加文件读写次数
+register_fixer('.py', run_python_fixers)
+register_fixer('.js', run_javascript_fixers)
@@ -1,6 +1,9 @@
 import unittest
 import os
-from src.analyzers import detect_python_smells, detect_javascript_smells
+import tempfile
+from src.analyzers import detect_python_smells, detect_javascript_smells, analyze_python_complexity, analyze_python_function_complexity
+from src.analyzers import python_engine
+from src.analyzers.javascript_tokenizer import build_index, index_file
 
 class TestAnalyzers(unittest.TestCase):
     def test_python_analyzer_missing_file(self):
@@ -13,5 +16,94 @@ class TestAnalyzers(unittest.TestCase):
         self.assertEqual(len(issues), 1)
         self.assertEqual(issues[0]['type'], "error")
 
+    def test_python_engine_single_parse(self):
+        code = "import os\nimport os\ndef f():\n" + "    x = 1\n" * 35
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
+            f.write(code)
+        try:
+            issues = detect_python_smells(f.name)
+            self.assertEqual([issue['type'] for issue in issues], ["long_function", "duplicate_import"])
+            analysis = python_engine.analyze_file(f.name)
+            self.assertIs(analysis, python_engine.analyze_file(f.name))
+            self.assertEqual(analyze_python_complexity(f.name), analysis.complexity())
+        finally:
+            os.unlink(f.name)
+
+    def test_memo_sees_same_size_rewrite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            py_path = os.path.join(directory, 'mod.py')
+            js_path = os.path.join(directory, 'app.js')
+            versions = {py_path: ("import os\nimport os\n", "import os\nimport re\n"),
+                        js_path: ("function a() {}\n", "function b() {}\n")}
+            for path, (before, _) in versions.items():
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(before)
+            self.assertEqual(len(detect_python_smells(py_path)), 1)
+            self.assertEqual([span.name for span in index_file(js_path).functions], ['a'])
+            # 同一时间刻度内大小不变的改写：修改时间和大小都与之前相同
+            for path, (_, after) in versions.items():
+                stat = os.stat(path)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(after)
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            self.assertEqual(detect_python_smells(py_path), [])
+            self.assertEqual([span.name for span in index_file(js_path).functions], ['b'])
+
+    def test_python_engine_syntax_error(self):
+        analysis = python_engine.analyze_source("def (:\n")
+        self.assertEqual(analysis.code_smells()[0]['type'], "error")
+        self.assertIn("error", analysis.complexity())
+
+    def test_python_function_metrics(self):
+        code = (
+            "class A:\n"
+            "    def simple(self):\n"
+            "        return 1\n"
+            "    def branchy(self, a, b, *args):\n"
+            "        if a and b:\n"
+            "            for x in args:\n"
+            "                if x:\n"
+            "                    pass\n"
+            "        elif a:\n"
+            "            pass\n"
+        )
+        table = python_engine.analyze_source(code).function_metrics
+        self.assertEqual(len(table), 2)
+        hotspot = table.top(1)[0]
+        self.assertEqual(hotspot['qualname'], "A.branchy")
+        self.assertEqual(hotspot['cyclomatic_complexity'], 6)
+        self.assertEqual(hotspot['nesting_depth'], 3)
+        self.assertEqual(hotspot['parameters'], 4)
+        self.assertEqual([row['function'] for row in table.above(2)], ["branchy"])
+
+    def test_python_function_complexity_api(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
+            f.write("def f(x):\n    return x if x else 0\n")
+        try:
+            result = analyze_python_function_complexity(f.name, top_n=1)
+            self.assertEqual(result['functions'][0]['cyclomatic_complexity'], 2)
+            self.assertIn("functions", analyze_python_complexity(f.name, top_n=1))
+            self.assertIn("error", analyze_python_function_complexity(f.name, metric='unknown'))
+        finally:
+            os.unlink(f.name)
+
+    def test_javascript_index_ignores_braces_in_literals(self):
+        code = (
+            "function outer(a) {\n"
+            "  var s = '}}}';\n"
+            "  var t = `${ {a: 1}.a } }`;\n"
+            "  var r = /[}]/g; // }\n"
+            "  return a / 2;\n"
+            "}\n"
+            "const arrow = (x) => {\n  return x;\n};\n"
+            "class K {\n  method() {\n    return 1;\n  }\n}\n"
+        )
+        spans = [(span.name, span.kind, span.start_line, span.end_line) for span in build_index(code).functions]
+        self.assertEqual(spans, [
+            ("outer", "function", 1, 6),
+            ("arrow", "arrow", 7, 9),
+            ("method", "method", 11, 13)
+        ])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
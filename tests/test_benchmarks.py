@@ -0,0 +1,41 @@
+import unittest
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic_repo import generate_repository
+from run_benchmarks import compare, percentile
+
+class TestBenchmarks(unittest.TestCase):
+    def test_generator_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            summary = generate_repository(first, files=12, directory_depth=2, files_per_directory=3)
+            self.assertEqual(summary, generate_repository(second, files=12, directory_depth=2, files_per_directory=3))
+            self.assertEqual(summary["files"], 12)
+            for root, _, names in os.walk(first):
+                for name in names:
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as a, open(path.replace(first, second, 1), 'rb') as b:
+                        self.assertEqual(a.read(), b.read())
+        with self.assertRaises(ValueError):
+            generate_repository(first, unknown=1)
+
+    def test_compare_directions(self):
+        base = {"metrics": {"scan_jobs1_files_per_s": 100.0, "python_smells_p50_ms": 10.0, "peak_rss_mb": 50.0}}
+        head = {"metrics": {"scan_jobs1_files_per_s": 85.0, "python_smells_p50_ms": 9.0, "peak_rss_mb": 54.0}}
+        regressed = {name for name, _, _, _, bad in compare(base, head, 10.0) if bad}
+        self.assertEqual(regressed, {"scan_jobs1_files_per_s"})
+        regressed = {name for name, _, _, _, bad in compare(base, head, 10.0, {"peak_rss_mb": 5.0}) if bad}
+        self.assertEqual(regressed, {"scan_jobs1_files_per_s", "peak_rss_mb"})
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
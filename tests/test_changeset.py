@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from refactors import build_changeset, optimize_python_imports
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+class TestChangeSet(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+        self.dup_py = os.path.join(self.dir, 'dup.py')
+        self.clean_py = os.path.join(self.dir, 'clean.py')
+        self.dup_js = os.path.join(self.dir, 'dup.js')
+        write(self.dup_py, "import os\r\nimport os\r\nx = 1\r\n")
+        write(self.clean_py, "import os\n\nx = 1\n")
+        write(self.dup_js, "var a = 1;\nvar a = 2;\n")
+        self.paths = [self.dup_py, self.clean_py, self.dup_js]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_unchanged_file_not_written(self):
+        os.utime(self.clean_py, ns=(1, 1))
+        result = optimize_python_imports(self.clean_py)
+        self.assertEqual(result['changes'], [])
+        self.assertEqual(os.stat(self.clean_py).st_mtime_ns, 1)
+
+    def test_dry_run_diff_and_apply(self):
+        changeset = build_changeset(self.paths)
+        self.assertEqual([edit.path for edit in changeset.edits], [self.dup_py, self.dup_js])
+        diff = changeset.diff(self.dir)
+        self.assertIn("--- a/dup.js\n+++ b/dup.js\n", diff)
+        self.assertIn("-var a = 2;\n", diff)
+        self.assertEqual(read(self.dup_js), "var a = 1;\nvar a = 2;\n")
+
+        result = changeset.apply()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(read(self.dup_js), "var a = 1;\na = 2;\n")
+        self.assertEqual(read(self.dup_py), "import os\r\nx = 1\r\n")
+        self.assertEqual(sorted(os.listdir(self.dir)), ['clean.py', 'dup.js', 'dup.py'])
+
+    def test_conflict_leaves_files_untouched(self):
+        changeset = build_changeset(self.paths)
+        write(self.dup_js, "var b = 1;\n")
+        result = changeset.apply()
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(read(self.dup_py), "import os\r\nimport os\r\nx = 1\r\n")
+        self.assertEqual(sorted(os.listdir(self.dir)), ['clean.py', 'dup.js', 'dup.py'])
+
+    def test_parallel_matches_serial(self):
+        paths = []
+        for i in range(40):
+            path = os.path.join(self.dir, f"m{i}.py")
+            write(path, "import sys\nimport sys\n" if i % 2 else "import sys\n")
+            paths.append(path)
+        serial = build_changeset(paths)
+        parallel = build_changeset(paths, jobs=2)
+        self.assertEqual([(e.path, e.new) for e in serial.edits], [(e.path, e.new) for e in parallel.edits])
+        self.assertEqual(len(serial), 20)
+
+if __name__ == '__main__':
+    unittest.main()
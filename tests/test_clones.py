@@ -0,0 +1,147 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.cache import AnalysisCache
+from core.clones import clone_issues, find_clones
+
+ORIGINAL = '''import json
+
+
+def load_orders(path, limit):
+    """读取订单"""
+    with open(path, 'r', encoding='utf-8') as f:
+        orders = json.load(f)
+    result = []
+    for order in orders:
+        if order['status'] == 'paid' and order['amount'] > 100:
+            total = order['amount'] * 0.9 + order.get('shipping', 0)
+            result.append({"id": order['id'], "total": total})
+        elif order['status'] == 'pending':
+            result.append({"id": order['id'], "total": 0})
+        if len(result) >= limit:
+            break
+    return sorted(result, key=lambda item: item['total'])
+'''
+
+# 只改了变量名、字面量和格式的复制
+RENAMED = '''def unrelated():
+    return 42
+
+
+def read_invoices(filename, max_count):
+    with open(filename, 'r', encoding='utf-8') as handle:
+        invoices = json.load(handle)
+    out = []
+    for inv in invoices:
+        if inv['state'] == 'done' and inv['value'] > 250:
+            amount = inv['value'] * 0.8 + inv.get('fee', 1)
+            out.append({"key": inv['key'], "amount": amount})
+        elif inv['state'] == 'open':
+            out.append({"key": inv['key'], "amount": 5})
+        if len(out) >= max_count:
+            break
+    return sorted(out, key=lambda x: x['amount'])
+'''
+
+UNRELATED = '''class Matrix:
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+
+    def transpose(self):
+        return Matrix(zip(*self.rows))
+
+    def __mul__(self, other):
+        columns = other.transpose().rows
+        return Matrix([[sum(a * b for a, b in zip(row, col)) for col in columns] for row in self.rows])
+'''
+
+def functions(count, offset=0):
+    return [f"def handler_{i}(request):\n    value = request.get('k{i + offset}')\n"
+            f"    if value is None:\n        return {{'error': {i}}}\n"
+            f"    return {{'ok': value * {i + 1}, 'name': '{i}'}}\n\n" for i in range(count)]
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestCloneDetection(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.repo, name)
+
+    def test_renamed_clone_is_found(self):
+        write(self.path('orders.py'), ORIGINAL)
+        write(self.path('invoices.py'), RENAMED)
+        write(self.path('matrix.py'), UNRELATED)
+        result = find_clones([self.path('orders.py'), self.path('invoices.py'), self.path('matrix.py')])
+        self.assertEqual(result['files'], 3)
+        self.assertEqual(len(result['clones']), 1)
+        first, second = result['clones'][0]['locations']
+        self.assertEqual(first['path'], self.path('orders.py'))
+        self.assertEqual(second['path'], self.path('invoices.py'))
+        self.assertLessEqual(first['start_line'], 7)
+        self.assertGreaterEqual(first['end_line'], 16)
+        self.assertEqual(second['start_line'], first['start_line'])
+
+        issues = clone_issues(result)
+        self.assertEqual(issues[self.path('invoices.py')][0]['type'], 'duplicate_code')
+        self.assertNotIn(self.path('matrix.py'), issues)
+
+    def test_unrelated_files_have_no_clones(self):
+        write(self.path('orders.py'), ORIGINAL)
+        write(self.path('matrix.py'), UNRELATED)
+        result = find_clones([self.path('orders.py'), self.path('matrix.py')])
+        self.assertEqual(result['clones'], [])
+        self.assertEqual(result['similar_files'], [])
+
+    def test_reordered_file_is_similar(self):
+        blocks = functions(12)
+        write(self.path('a.py'), ''.join(blocks))
+        write(self.path('b.py'), ''.join(blocks[6:] + blocks[:6]))
+        result = find_clones([self.path('a.py'), self.path('b.py')])
+        self.assertEqual([pair['paths'] for pair in result['similar_files']], [[self.path('a.py'), self.path('b.py')]])
+        self.assertEqual(clone_issues(result)[self.path('b.py')][0]['type'], 'similar_file')
+
+    def test_cache_only_refingerprints_changed_files(self):
+        write(self.path('orders.py'), ORIGINAL)
+        write(self.path('invoices.py'), RENAMED)
+        write(self.path('matrix.py'), UNRELATED)
+        files = [self.path('orders.py'), self.path('invoices.py'), self.path('matrix.py')]
+        cache = AnalysisCache(os.path.join(self.repo, '.cache'))
+        first = find_clones(files, cache=cache)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+        write(self.path('matrix.py'), UNRELATED + "\n\nIDENTITY = Matrix([[1, 0], [0, 1]])\n")
+        second = find_clones(files, cache=cache)
+        cache.close()
+        self.assertEqual(cache.stats()['misses'], 4)
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(first['clones'], second['clones'])
+
+    def test_spilled_index_matches_in_memory_index(self):
+        files = []
+        for i in range(6):
+            write(self.path(f"m{i}.py"), ''.join(functions(8, offset=i)) + (ORIGINAL if i % 2 else RENAMED))
+            files.append(self.path(f"m{i}.py"))
+        in_memory = find_clones(files)
+        spilled = find_clones(files, max_buffered=10, work_dir=self.repo)
+        self.assertTrue(in_memory['clones'])
+        self.assertEqual(in_memory, spilled)
+
+        only = find_clones(files, report_paths=[self.path('m0.py')])
+        self.assertTrue(only['clones'])
+        for clone in only['clones']:
+            self.assertIn(self.path('m0.py'), [location['path'] for location in clone['locations']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from analyzers.file_memo import read_text
+from core.clones import find_clones
+from core.file_limits import FileLimits
+from core.scanner import iter_scan_repository
+
+def write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content.encode('utf-8') if isinstance(content, str) else content)
+
+class TestFileLimits(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.repo, name)
+
+    def test_check_reasons(self):
+        write(self.path('big.py'), "x = 1\n" * 400)
+        write(self.path('bundle.js'), "var a=1;" * 100)
+        write(self.path('app.min.js'), "var a = 1;\n")
+        write(self.path('pb2.py'), "# Generated by protoc. DO NOT EDIT!\nx = 1\n")
+        write(self.path('data.py'), b"x = 1\n\0\0")
+        write(self.path('ok.py'), "x = 1\n")
+        limits = FileLimits(max_bytes=1024, max_line_length=200)
+        reasons = {name: (limits.check(self.path(name)) or {}).get('reason')
+                   for name in ('big.py', 'bundle.js', 'app.min.js', 'pb2.py', 'data.py', 'ok.py')}
+        self.assertEqual(reasons, {'big.py': 'too_large', 'bundle.js': 'minified', 'app.min.js': 'minified',
+                                   'pb2.py': 'generated', 'data.py': 'binary', 'ok.py': None})
+        self.assertIsNone(FileLimits(0, 0).check(self.path('bundle.js')))
+
+    def test_scan_reports_skipped_files_in_order(self):
+        for i in range(20):
+            write(self.path(f"m{i:02}.py"), "import os\nimport os\n")
+        write(self.path('m05.py'), "x = [" + "1, " * 2000 + "]\n")
+        limits = FileLimits(max_line_length=1000)
+        serial = list(iter_scan_repository(self.repo, limits=limits))
+        parallel = list(iter_scan_repository(self.repo, jobs=2, limits=limits))
+        self.assertEqual(serial, parallel)
+        skipped = [result for result in serial if result['issues'][0]['type'] == 'skipped_file']
+        self.assertEqual([os.path.basename(result['path']) for result in skipped], ['m05.py'])
+        self.assertEqual(len(serial), 20)
+
+        clones = find_clones([self.path('m05.py')], limits=limits)
+        self.assertEqual(clones['files'], 0)
+
+    def test_read_text_matches_text_mode(self):
+        write(self.path('empty.py'), b"")
+        write(self.path('crlf.py'), "a = 1\r\nb = '中文'\rc = 2\n")
+        self.assertEqual(read_text(self.path('empty.py')), "")
+        with open(self.path('crlf.py'), 'r', encoding='utf-8') as f:
+            self.assertEqual(read_text(self.path('crlf.py')), f.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.cache import AnalysisCache
+from core.fleet import CHECKPOINT_FILE, SUMMARY_FILE, FleetScanner, load_manifest, schedule_order
+from core.report_writers import JsonLinesReportWriter, REPORT_WRITERS, register_report_writer
+from core.scanner import iter_scan_repository
+
+def make_repo(root, name, files):
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    for i in range(files):
+        with open(os.path.join(path, f"mod{i}.py"), 'w', encoding='utf-8') as f:
+            f.write("import os\nimport os\n")
+    return path
+
+# 测试用报告格式：记录每次写入时所属的仓库和已查询的缓存次数
+WRITES = []
+
+class RecordingWriter(JsonLinesReportWriter):
+    cache = None
+
+    def write_file(self, file_info):
+        WRITES.append((os.path.basename(os.path.dirname(file_info['path'])), self.cache.hits + self.cache.misses))
+        super().write_file(file_info)
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = self._tmp.name
+        self.mono = make_repo(root, 'mono', 20)
+        self.small = make_repo(root, 'small', 2)
+        self.urgent = make_repo(root, 'urgent', 1)
+        self.manifest = os.path.join(root, 'repos.txt')
+        with open(self.manifest, 'w', encoding='utf-8') as f:
+            f.write(f"# 每晚扫描\n{self.small}\n{self.mono}\n{self.urgent} 5\n{os.path.join(root, 'missing')}\n")
+        self.repositories = load_manifest(self.manifest)
+        self.names = {entry["repo"]: entry["name"] for entry in self.repositories}
+        self.out_dir = os.path.join(root, 'fleet')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def scan(self, order=None, interrupt_after=None, **options):
+        def on_complete(result, done, total):
+            if order is not None:
+                order.append(result["repo"])
+            if interrupt_after is not None and done == interrupt_after:
+                raise KeyboardInterrupt
+        return FleetScanner(self.repositories, self.out_dir, max_active=2, quantum=1, on_complete=on_complete,
+                            **options).run()
+
+    def test_manifest_and_schedule_order(self):
+        self.assertEqual([entry["priority"] for entry in self.repositories], [0, 0, 5, 0])
+        sizes = {self.names[self.small]: 2, self.names[self.mono]: 20}
+        ordered = [entry["repo"] for entry in schedule_order(self.repositories, sizes)]
+        # 优先级最高的先扫描；同一优先级中没有上次大小的在前，其余从大到小
+        self.assertEqual(ordered[0], self.urgent)
+        self.assertEqual(ordered[2:], [self.mono, self.small])
+
+    def test_fair_share_and_summary(self):
+        order = []
+        summary = self.scan(order)
+        # 大仓库先进入活动集合，但小仓库轮流获得处理机会，先于它完成
+        self.assertLess(order.index(self.small), order.index(self.mono))
+        self.assertEqual((summary["scanned"], summary["failed"], summary["files"]), (3, 1, 23))
+        self.assertEqual(summary["total_issues"], 23)
+        self.assertEqual(summary["issue_types"], {"duplicate_import": 23})
+        self.assertEqual(summary["top_repositories"][0]["repo"], self.mono)
+        mono = next(result for result in summary["results"] if result["repo"] == self.mono)
+        with open(mono["report"], encoding='utf-8') as f:
+            self.assertEqual(len(f.read().splitlines()), 21)
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, CHECKPOINT_FILE)))
+        with open(os.path.join(self.out_dir, SUMMARY_FILE), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["total_issues"], 23)
+
+    def test_resume_after_interruption(self):
+        first = []
+        with self.assertRaises(KeyboardInterrupt):
+            self.scan(first, interrupt_after=2)
+        self.assertEqual(first, [self.urgent, self.small])
+        # 中断时未完成仓库的临时报告被删除
+        self.assertEqual(sorted(os.listdir(os.path.join(self.out_dir, 'reports'))),
+                         sorted(self.names[repo] + '.jsonl' for repo in first))
+        # 中断时写了一半的最后一行不影响之后追加的结果
+        with open(os.path.join(self.out_dir, CHECKPOINT_FILE), 'a', encoding='utf-8') as f:
+            f.write('{"name": "mo')
+        second = []
+        with self.assertRaises(KeyboardInterrupt):
+            self.scan(second, interrupt_after=3)
+        self.assertEqual(len(second), 1)
+        third = []
+        summary = self.scan(third)
+        self.assertEqual(summary["resumed"], 3)
+        self.assertEqual(sorted(first + second + third), sorted(self.names))
+        self.assertEqual(summary["scanned"] + summary["failed"], 4)
+        self.assertEqual(summary["files"], 23)
+
+    def test_cached_monorepo_does_not_starve_small_repository(self):
+        big = make_repo(self._tmp.name, 'big', 150)
+        cache = AnalysisCache(os.path.join(self._tmp.name, 'cache'))
+        register_report_writer('recording', RecordingWriter)
+        RecordingWriter.cache = cache
+        WRITES.clear()
+        try:
+            list(iter_scan_repository(big, cache=cache))
+            lookups = cache.hits + cache.misses
+            repositories = [entry for entry in load_manifest(self.manifest) if entry["repo"] == self.small]
+            repositories.insert(0, dict(repositories[0], repo=big, name='big', index=-1))
+            FleetScanner(repositories, self.out_dir, jobs=2, cache=cache, fmt='recording', max_active=2,
+                         quantum=1).run()
+        finally:
+            REPORT_WRITERS.pop('recording')
+            cache.close()
+        order = [name for name, _ in WRITES]
+        first_small = order.index('small')
+        # 小仓库在大仓库遍历完之前就得到处理，两者交替进行
+        self.assertLess(first_small, 3)
+        self.assertLess(WRITES[first_small][1] - lookups, 20)
+        self.assertEqual(order[:4], ['big', 'small', 'big', 'small'])
+
+if __name__ == '__main__':
+    unittest.main()
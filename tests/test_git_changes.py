@@ -0,0 +1,62 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.git_changes import changed_files
+from core.scanner import scan_repository
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', repo, '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def write(repo, name, content):
+    with open(os.path.join(repo, name), 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestGitChanges(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        git(self.repo, 'init', '-q')
+        write(self.repo, 'keep.py', "import os\n")
+        write(self.repo, 'old_name.py', "import sys\nimport sys\n" + "x = 1\n" * 10)
+        write(self.repo, 'gone.js', "var a = 1;\n")
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'base')
+        git(self.repo, 'tag', 'base')
+
+        git(self.repo, 'mv', 'old_name.py', 'new_name.py')
+        git(self.repo, 'rm', '-q', 'gone.js')
+        write(self.repo, 'added.js', "var b = 1;\nvar b = 2;\n")
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'head')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_diff_range(self):
+        result = changed_files(self.repo, diff='base..HEAD')
+        names = [os.path.basename(path) for path in result['changed']]
+        self.assertEqual(names, ['added.js', 'new_name.py'])
+        self.assertEqual([os.path.basename(path) for path in result['deleted']], ['gone.js'])
+        self.assertEqual([tuple(os.path.basename(p) for p in pair) for pair in result['renamed']],
+                         [('old_name.py', 'new_name.py')])
+
+        scan = scan_repository(self.repo, paths=result['changed'])
+        self.assertEqual(scan['total_issues'], 2)
+
+    def test_since_includes_uncommitted(self):
+        write(self.repo, 'keep.py', "import os\nimport os\n")
+        write(self.repo, 'untracked.py', "x = 1\n")
+        names = [os.path.basename(path) for path in changed_files(self.repo, since='HEAD')['changed']]
+        self.assertEqual(names, ['keep.py', 'untracked.py'])
+
+    def test_bad_revision(self):
+        self.assertIn("error", changed_files(self.repo, since='no-such-rev'))
+
+if __name__ == '__main__':
+    unittest.main()
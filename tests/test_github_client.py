@@ -0,0 +1,115 @@
+import unittest
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+try:
+    import requests  # noqa: F401
+except ImportError:
+    requests = None
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟 GitHub API：/repos/owner/repo 支持 ETag，/limited 第一次返回 429"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get('If-None-Match'), self.headers.get('Authorization')))
+        if self.path == '/repos/owner/repo':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304, headers={'ETag': '"v1"'})
+            else:
+                self._send(200, {"full_name": "owner/repo", "description": "demo"},
+                           {'ETag': '"v1"', 'X-RateLimit-Remaining': '4999', 'X-RateLimit-Limit': '5000'})
+        elif self.path == '/limited':
+            server.limited_calls += 1
+            if server.limited_calls == 1:
+                self._send(429, {"message": "slow down"}, {'Retry-After': '2'})
+            else:
+                self._send(200, {"ok": True})
+        elif self.path == '/gateway':
+            payload = b'<html><body>502 Bad Gateway</body></html>'
+            self.send_response(502)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            self._send(404, {"message": "Not Found"})
+
+@unittest.skipIf(requests is None, "requests 未安装")
+class TestGitHubClient(unittest.TestCase):
+    def setUp(self):
+        from integrations.github_client import GitHubClient
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.limited_calls = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.sleeps = []
+        self.client = GitHubClient('secret', self.api_base, sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_etag_conditional_request(self):
+        first = self.client.get('repos/owner/repo')
+        second = self.client.get('repos/owner/repo')
+        self.assertEqual(first, second)
+        self.assertEqual([etag for _, etag, _ in self.server.requests], [None, '"v1"'])
+        self.assertEqual(self.server.requests[0][2], 'token secret')
+        self.assertEqual(self.client.rate_limit["remaining"], 4999)
+
+    def test_retry_after(self):
+        self.assertEqual(self.client.get('limited'), {"ok": True})
+        self.assertEqual(self.sleeps, [2])
+
+    def test_error_status(self):
+        from integrations.github_client import GitHubAPIError
+        with self.assertRaises(GitHubAPIError) as ctx:
+            self.client.get('missing')
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    def test_non_json_response(self):
+        from integrations.github_client import GitHubAPIError
+        with self.assertRaises(GitHubAPIError) as ctx:
+            self.client.get('gateway')
+        self.assertEqual(ctx.exception.status_code, 502)
+        self.assertIn('502 Bad Gateway', ctx.exception.message)
+
+    def test_connect_to_repo(self):
+        from integrations import connect_to_repo
+        result = connect_to_repo('https://github.com/owner/repo.git', 'secret', self.api_base)
+        self.assertEqual(result['status'], 'connected')
+        self.assertEqual(result['repo_info']['full_name'], 'owner/repo')
+        missing = connect_to_repo('https://github.com/owner/other', 'secret', self.api_base)
+        self.assertEqual(missing['message'], "连接失败: 404 - Not Found")
+
+    def test_parse_repo_url(self):
+        from integrations.github_client import parse_repo_url
+        self.assertEqual(parse_repo_url('https://github.com/owner/repo.git'), ('owner', 'repo'))
+        self.assertEqual(parse_repo_url('git@github.com:owner/repo'), ('owner', 'repo'))
+        with self.assertRaises(ValueError):
+            parse_repo_url('https://gitlab.com/owner/repo')
+
+if __name__ == '__main__':
+    unittest.main()
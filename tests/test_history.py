@@ -0,0 +1,122 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.cache import AnalysisCache
+from core.history import _HistoryAnalyzer, iter_history
+from core.scanner import iter_scan_repository
+
+LONG_FUNCTION = "def long_function(x):\n" + "".join(f"    x = x + {i}\n" for i in range(60)) + "    return x\n"
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', repo] + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def write(repo, name, content):
+    path = os.path.join(repo, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self._tmp.name, 'repo')
+        os.makedirs(self.repo)
+        git(self.repo, 'init', '-q')
+        git(self.repo, 'config', 'user.email', 'test@example.com')
+        git(self.repo, 'config', 'user.name', 'test')
+        self.commit({"app.py": "x = 1\n", "pkg/long.py": LONG_FUNCTION, "web/app.js": "var a = 1;\n",
+                     "README.md": "readme\n", "node_modules/lib/index.js": "var b = 2;\n"})
+        self.commit({"app.py": "import os\nx = 2\n"})
+        self.commit({"pkg/long.py": None, "pkg/moved.py": LONG_FUNCTION})
+        self.commit({"README.md": "changed\n"})
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def commit(self, files):
+        for name, content in files.items():
+            if content is None:
+                git(self.repo, 'rm', '-q', name)
+            else:
+                write(self.repo, name, content)
+                git(self.repo, 'add', name)
+        git(self.repo, 'commit', '-q', '-m', 'change')
+
+    def summary(self, result):
+        return {entry["path"]: sorted(issue["type"] for issue in entry["issues"]) for entry in result["files"]}
+
+    def test_results_match_checkout_scans(self):
+        stats = {}
+        results = list(iter_history(self.repo, 'HEAD', stats=stats))
+        self.assertEqual(len(results), 4)
+        for result in results:
+            git(self.repo, 'checkout', '-q', result["commit"])
+            expected = {os.path.relpath(entry["path"], self.repo): sorted(issue["type"] for issue in entry["issues"])
+                        for entry in iter_scan_repository(self.repo)}
+            self.assertEqual(self.summary(result), expected)
+        self.assertEqual([sorted(self.summary(result)) for result in results][2],
+                         ["app.py", "pkg/moved.py", "web/app.js"])
+        self.assertIn("long_function", self.summary(results[-1])["pkg/moved.py"])
+        # 重命名和只改动非源码文件的提交不产生新的分析
+        self.assertEqual(stats, {"commits": 4, "blobs": 4, "analyzed": 4})
+
+    def test_range_and_cache_reuse(self):
+        cache = AnalysisCache(os.path.join(self._tmp.name, 'cache'))
+        try:
+            first = list(iter_history(self.repo, 'HEAD~2..HEAD', cache=cache, metrics=True))
+            stats = {}
+            second = list(iter_history(self.repo, 'HEAD', cache=cache, metrics=True, max_count=3, stats=stats))
+        finally:
+            cache.close()
+        self.assertEqual([result["commit"] for result in first], [result["commit"] for result in second][1:])
+        self.assertEqual(first, second[1:])
+        self.assertEqual(stats["analyzed"], 0)
+        self.assertEqual(second[-1]["files"][1]["metrics"]["functions"][0]["function"], "long_function")
+
+    def test_unreferenced_results_are_evicted(self):
+        for i in range(10):
+            self.commit({"app.py": f"import os\nimport os\nx = {i}\n"})
+        self.commit({"app.py": "x = 1\n"})  # 恢复第一个提交中的内容
+        resident = []
+        request = _HistoryAnalyzer.request
+
+        def record(analyzer, sha, path):
+            resident.append(len(analyzer.results))
+            return request(analyzer, sha, path)
+
+        cache = AnalysisCache(os.path.join(self._tmp.name, 'cache'))
+        stats = {}
+        try:
+            with mock.patch.object(_HistoryAnalyzer, 'request', autospec=True, side_effect=record):
+                results = list(iter_history(self.repo, 'HEAD', cache=cache, stats=stats))
+        finally:
+            cache.close()
+        # 内存中只保留当前快照（3 个文件）用到的结果，不随历史长度增长
+        self.assertLessEqual(max(resident), 4)
+        self.assertEqual(results[-1]["files"][0], results[0]["files"][0])
+        self.assertEqual(self.summary(results[5])["app.py"], ["duplicate_import"])
+        # 被丢弃后重新出现的 blob 再次读取，分析结果来自缓存
+        self.assertEqual((stats["blobs"], stats["analyzed"]), (15, 14))
+
+    def test_same_content_in_different_languages(self):
+        source = "def f():\n    return 1\n"
+        self.commit({"same.py": source, "same.js": source})
+        from analyzers import javascript_analyzer, python_analyzer
+        result = list(iter_history(self.repo, 'HEAD', metrics=True, max_count=1))[0]
+        files = {entry["path"]: entry for entry in result["files"]}
+        self.assertEqual(files["same.py"]["blob"], files["same.js"]["blob"])
+        self.assertEqual(files["same.js"]["language"], "javascript")
+        # 相同内容按各自语言的分析器分析，结果不共享
+        for name, analyzer in (("same.py", python_analyzer), ("same.js", javascript_analyzer)):
+            expected = analyzer.analyze_complexity(os.path.join(self.repo, name))
+            self.assertEqual(files[name]["metrics"]["complexity"]["cyclomatic_complexity"],
+                             expected["cyclomatic_complexity"], name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.ignore import IgnoreEngine, IgnoreRules
+from core.scanner import iter_scan_repository
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestIgnoreRules(unittest.TestCase):
+    def test_gitignore_patterns(self):
+        rules = IgnoreRules(["# 注释", "*.log", "/generated", "docs/**/*.py", "logs/", "!keep.log", "a?c.py", "[ab].js"])
+        self.assertTrue(rules.match("x/debug.log"))
+        self.assertFalse(rules.match("x/keep.log"))
+        self.assertTrue(rules.match("generated"))
+        self.assertIsNone(rules.match("src/generated"))
+        self.assertTrue(rules.match("docs/conf.py"))
+        self.assertTrue(rules.match("docs/a/b/conf.py"))
+        self.assertTrue(rules.match("src/logs", is_dir=True))
+        self.assertIsNone(rules.match("src/logs"))
+        self.assertTrue(rules.match("abc.py"))
+        self.assertIsNone(rules.match("a/c.py"))
+        self.assertTrue(rules.match("b.js"))
+        self.assertIsNone(rules.match("c.js"))
+
+    def test_nested_rules_are_relative_to_their_directory(self):
+        rules = IgnoreRules(["/local.py", "tmp_*"], base="pkg")
+        self.assertTrue(rules.match("pkg/local.py"))
+        self.assertIsNone(rules.match("local.py"))
+        self.assertTrue(rules.match("pkg/sub/tmp_1.py"))
+
+class TestIgnoreEngine(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        for name in ('app.py', 'node_modules/lib/index.js', 'build/out.py', '.venv/x.py', 'vendor/ok/keep.py',
+                     'pkg/mod.py', 'pkg/local.py', 'pkg/sub/gen_1.py', 'docs/conf.py'):
+            write(os.path.join(self.repo, name), "x = 1\n")
+        write(os.path.join(self.repo, 'pkg', 'data.log'), "x" * 100)
+        write(os.path.join(self.repo, '.gitignore'), "*.log\n")
+        write(os.path.join(self.repo, 'pkg', '.gitignore'), "/local.py\ngen_*\n")
+        write(os.path.join(self.repo, '.coderevive-ignore'), "docs/\n!vendor/\nvendor/*\n!vendor/ok/\n")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def relative(self, paths):
+        return sorted(os.path.relpath(path, self.repo) for path in paths)
+
+    def test_walk_prunes_ignored_directories(self):
+        engine = IgnoreEngine(self.repo)
+        self.assertEqual(self.relative(engine.iter_files(('.py', '.js'))),
+                         ['app.py', 'pkg/mod.py', 'vendor/ok/keep.py'])
+        self.assertEqual(engine.stats, {"skipped_dirs": 4, "skipped_files": 3, "skipped_bytes": 112})
+
+    def test_single_path_checks_match_the_walk(self):
+        engine = IgnoreEngine(self.repo, excludes=["mod.py"])
+        self.assertTrue(engine.is_ignored(os.path.join(self.repo, 'node_modules', 'lib', 'index.js')))
+        self.assertTrue(engine.is_ignored(os.path.join(self.repo, 'pkg', 'sub', 'gen_1.py')))
+        self.assertTrue(engine.is_ignored(os.path.join(self.repo, 'pkg', 'mod.py')))
+        self.assertFalse(engine.is_ignored(os.path.join(self.repo, 'vendor', 'ok', 'keep.py')))
+        self.assertFalse(engine.is_ignored(os.path.join(self.repo, 'app.py')))
+
+    def test_scan_uses_ignore_rules(self):
+        engine = IgnoreEngine(self.repo, excludes=["app.py"])
+        results = list(iter_scan_repository(self.repo, ignore=engine))
+        self.assertEqual(self.relative(result['path'] for result in results), ['pkg/mod.py', 'vendor/ok/keep.py'])
+        self.assertEqual(engine.stats['skipped_files'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
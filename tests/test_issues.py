@@ -0,0 +1,62 @@
+import unittest
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from analyzers.issues import Issue, compact, json_default
+from core.cache import AnalysisCache
+from core.report_writers import write_report
+from core.scanner import scan_repository
+
+class TestIssue(unittest.TestCase):
+    def test_dict_style_access(self):
+        issue = Issue("long_function", 3, "handler", 42)
+        expected = {"type": "long_function", "message": "函数 'handler' 过长 (42 行)", "line": 3,
+                    "function": "handler", "length": 42}
+        self.assertEqual(issue, expected)
+        self.assertEqual(dict(issue), expected)
+        self.assertEqual(issue.get('message'), expected["message"])
+        self.assertIsNone(issue.get('missing'))
+        self.assertIn('function', issue)
+        self.assertEqual(Issue("duplicate_import", 7, "os.path")["message"], "重复导入: os.path")
+        with self.assertRaises(KeyError):
+            issue['missing']
+
+    def test_serialization_round_trips(self):
+        issues = [Issue("duplicate_variable", 9, "count", 2), {"type": "error", "message": "分析失败: x", "line": 0}]
+        restored = pickle.loads(pickle.dumps(issues))
+        self.assertIsInstance(restored[0], Issue)
+        self.assertEqual(restored, issues)
+        decoded = json.loads(json.dumps(issues, default=json_default))
+        self.assertEqual(decoded, issues)
+        self.assertIsInstance(compact(decoded[0]), Issue)
+        self.assertIs(compact(decoded[1]), decoded[1])
+        # 字段不完整的旧格式结果保持为 dict
+        self.assertIs(type(compact({"type": "long_function", "message": "m", "line": 1})), dict)
+
+    def test_cached_scan_and_reports(self):
+        with tempfile.TemporaryDirectory() as repo:
+            with open(os.path.join(repo, 'mod.py'), 'w', encoding='utf-8') as f:
+                f.write("import os\nimport os\n")
+            cache = AnalysisCache(os.path.join(repo, '.cache'))
+            try:
+                first = scan_repository(repo, cache=cache)
+                second = scan_repository(repo, cache=cache)
+            finally:
+                cache.close()
+            issue = second["python_files"][0]["issues"][0]
+            self.assertIsInstance(issue, Issue)
+            self.assertEqual(first, second)
+            out = io.StringIO()
+            write_report([{"path": "mod.py", "language": "python", "issues": [issue]}], out, fmt='jsonl')
+            record = json.loads(out.getvalue().splitlines()[0])
+            self.assertEqual(record["message"], "重复导入: os")
+            self.assertEqual(record["import"], "os")
+
+if __name__ == '__main__':
+    unittest.main()
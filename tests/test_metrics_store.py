@@ -0,0 +1,118 @@
+import unittest
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import main
+from core.file_limits import DEFAULT_LIMITS
+from core.metrics_store import MetricsStore, record_metrics
+
+def records(complexities, functions=None):
+    for path, complexity in complexities.items():
+        yield {
+            "path": path,
+            "complexity": {"cyclomatic_complexity": complexity, "maintainability_index": 100 - complexity,
+                           "lines_of_code": complexity * 10},
+            "functions": [{"function": name.split('.')[-1], "qualname": name, "cyclomatic_complexity": value,
+                           "nesting_depth": 1, "length": value * 3}
+                          for name, value in (functions or {}).get(path, {}).items()]
+        }
+
+class TestMetricsStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self._tmp.name, 'metrics')
+        self.store = MetricsStore(self.directory)
+        self.store.append("aaa111", records({"app.py": 3, "core/a.py": 5, "core/b.py": 8},
+                                            {"core/a.py": {"run": 2, "Parser.parse": 4}}), commit_time=100)
+        self.store.append("bbb222", records({"app.py": 3, "core/a.py": 9, "core/b.py": 8, "web/c.js": 1,
+                                             "broken.py": 0},
+                                            {"core/a.py": {"run": 2, "Parser.parse": 9, "helper": 3}}),
+                          commit_time=200)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_distribution_and_trend(self):
+        values = [3, 9, 8, 1, 0]
+        result = self.store.distribution("cyclomatic_complexity")
+        self.assertEqual(result["count"], 5)
+        self.assertEqual(result["max"], 9)
+        self.assertEqual(result["percentiles"][50], statistics.median(values))
+        self.assertAlmostEqual(result["percentiles"][90], statistics.quantiles(values, n=10, method='inclusive')[-1])
+        self.assertEqual(self.store.distribution("length", commit="aaa", table="functions")["count"], 2)
+        self.assertEqual(self.store.trend("files"), [("aaa111", 100, 3), ("bbb222", 200, 5)])
+        self.assertEqual(self.store.trend("total_complexity")[-1][2], 21)
+        with self.assertRaises(KeyError):
+            self.store.distribution(commit="zzz")
+        with self.assertRaises(ValueError):
+            self.store.distribution("path")
+
+    def test_top_regressions(self):
+        regressions = self.store.top_regressions("aaa111", "bbb222", n=5)
+        self.assertEqual(regressions, [
+            {"path": "core/a.py", "function": "Parser.parse", "base": 4.0, "head": 9.0, "delta": 5.0},
+            {"path": "core/a.py", "function": "helper", "base": None, "head": 3.0, "delta": 3.0}
+        ])
+        files = self.store.top_regressions("aaa111", "bbb222", metric="maintainability_index", table="files")
+        self.assertEqual(files[0]["path"], "core/a.py")
+        self.assertEqual(files[0]["delta"], -4.0)
+        self.assertEqual(self.store.top_regressions("bbb222", "aaa111"), [])
+
+    def test_directory_rollup(self):
+        rollup = self.store.directory_rollup("lines_of_code")
+        self.assertEqual(rollup, {
+            ".": {"files": 2, "sum": 30.0, "mean": 15.0, "max": 30.0},
+            "core": {"files": 2, "sum": 170.0, "mean": 85.0, "max": 90.0},
+            "web": {"files": 1, "sum": 10.0, "mean": 10.0, "max": 10.0}
+        })
+
+    def test_reopen_discards_interrupted_append(self):
+        with open(os.path.join(self.directory, 'files.path.bin'), 'ab') as f:
+            f.write(b'\1\0\0\0\2\0\0\0')
+        with open(os.path.join(self.directory, 'commits.jsonl'), 'a', encoding='utf-8') as f:
+            f.write('{"commit": "cc')
+        store = MetricsStore(self.directory)
+        self.assertEqual([entry["commit"] for entry in store.commits()], ["aaa111", "bbb222"])
+        store.append("ccc333", records({"app.py": 4}))
+        self.assertEqual(store.distribution(commit="ccc333")["max"], 4)
+        self.assertEqual(MetricsStore(self.directory).distribution()["count"], 1)
+
+    def test_record_metrics_from_files(self):
+        repo = os.path.join(self._tmp.name, 'repo')
+        os.makedirs(os.path.join(repo, 'pkg'))
+        with open(os.path.join(repo, 'pkg', 'mod.py'), 'w', encoding='utf-8') as f:
+            f.write("class A:\n    def run(self, x):\n        if x:\n            return 1\n        return 2\n")
+        with open(os.path.join(repo, 'app.js'), 'w', encoding='utf-8') as f:
+            f.write("function f(a) { if (a) { return 1; } return 2; }\n")
+        store = MetricsStore(os.path.join(self._tmp.name, 'repo-metrics'))
+        paths = [os.path.join(repo, 'pkg', 'mod.py'), os.path.join(repo, 'app.js')]
+        self.assertEqual(record_metrics(store, "head", repo, paths), (2, 1))
+        self.assertEqual(set(store.directory_rollup("cyclomatic_complexity")), {".", "pkg"})
+        self.assertEqual(store.distribution("cyclomatic_complexity", table="functions")["max"], 2)
+
+    def test_rerun_on_same_commit_is_not_recorded_twice(self):
+        repo = os.path.join(self._tmp.name, 'repo')
+        os.makedirs(repo)
+        with open(os.path.join(repo, 'mod.py'), 'w', encoding='utf-8') as f:
+            f.write("def f(x):\n    return x\n")
+        git = ['git', '-C', repo, '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+        subprocess.run(git + ['init', '-q'], check=True)
+        subprocess.run(git + ['add', '-A'], check=True)
+        subprocess.run(git + ['commit', '-q', '-m', 'first'], check=True)
+        args = argparse.Namespace(no_cache=True, exclude=[], jobs=1)
+        directory = os.path.join(self._tmp.name, 'repo-metrics')
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.record_current_metrics(MetricsStore(directory), repo, args, DEFAULT_LIMITS)
+            main.record_current_metrics(MetricsStore(directory), repo, args, DEFAULT_LIMITS)
+        self.assertEqual(len(MetricsStore(directory)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from refactors import Edit, Fixer, FixerPipeline
+from refactors.pipeline import DuplicateImportFixer, DuplicateVariableFixer, run_python_fixers, run_javascript_fixers
+
+class TestFixerPipeline(unittest.TestCase):
+    def test_python_imports_keep_comments_and_blank_lines(self):
+        source = (
+            "# 模块说明\n"
+            "import os\n"
+            "\n"
+            "import os  # 重复\n"
+            "import sys, os\n"
+            "from a import b; from a import b\n"
+            "import os as o\n"
+            "\n"
+            "def f():\n"
+            "    import os\n"
+        )
+        new, changes = run_python_fixers(source)
+        self.assertEqual(new, (
+            "# 模块说明\n"
+            "import os\n"
+            "\n"
+            "  # 重复\n"
+            "import sys\n"
+            "from a import b\n"
+            "import os as o\n"
+            "\n"
+            "def f():\n"
+            "    import os\n"
+        ))
+        self.assertEqual([change['line'] for change in changes], [4, 5, 6])
+        self.assertEqual(run_python_fixers(new), (new, []))
+
+    def test_partial_import_removal_keeps_comments(self):
+        source = (
+            "from a import d\n"
+            "from a import (b,  # keep\n"
+            "    d)\n"
+            "from c import (\n"
+            "    d,  # first\n"
+            "    b,  # second\n"
+            ")\n"
+            "from c import (b, e)  # tail\n"
+            "import os\n"
+            "import sys, os, os as o\n"
+        )
+        new, changes = run_python_fixers(source)
+        self.assertEqual(new, (
+            "from a import d\n"
+            "from a import (b,  # keep\n"
+            "    )\n"
+            "from c import (\n"
+            "    d,  # first\n"
+            "    b,  # second\n"
+            ")\n"
+            "from c import (e)  # tail\n"
+            "import os\n"
+            "import sys, os as o\n"
+        ))
+        self.assertEqual([change['line'] for change in changes], [2, 8, 10])
+        compile(new, 'fixed.py', 'exec')
+
+    def test_javascript_duplicate_variables(self):
+        source = (
+            "var a = 1;\n"
+            "var a = compute(1, 2);\n"
+            "var a;\n"
+            "var a = 3, b = 4;\n"
+            "for (var i = 0; i < 1; i++) {}\n"
+            "for (var i = 0; i < 1; i++) {}\n"
+            "function f() { var a = 5; }\n"
+        )
+        new, changes = run_javascript_fixers(source)
+        self.assertEqual(new, (
+            "var a = 1;\n"
+            "a = compute(1, 2);\n"
+            "var a = 3, b = 4;\n"
+            "for (var i = 0; i < 1; i++) {}\n"
+            "for (var i = 0; i < 1; i++) {}\n"
+            "function f() { var a = 5; }\n"
+        ))
+        self.assertEqual([change['line'] for change in changes], [2, 3])
+
+    def test_duplicate_variable_removal_keeps_statement_boundaries(self):
+        # 删除后下一条语句会并入上一条没有分号的语句，这些声明保持不变
+        for following in ("(init)()", "[1, 2].forEach(run)", "`x`.trim()", "+x", "-x", "/a/.test(s)"):
+            for declaration in ("var a;", "var a"):
+                source = f"var a = 1\nb = a\n{declaration}\n{following}\n"
+                self.assertEqual(run_javascript_fixers(source), (source, []), (declaration, following))
+        new, changes = run_javascript_fixers("var a = 1\nb = a\nvar a\nrun()\n")
+        self.assertEqual(new, "var a = 1\nb = a\nrun()\n")
+
+    def test_overlapping_edits_keep_first_fixer(self):
+        class UpperFirstLine(Fixer):
+            def fix(self, source_file):
+                end = source_file.line_starts[1]
+                return [(Edit(0, end, source_file.source[:end].upper()), {"type": "upper"})]
+
+        source = "import os\nimport os\nimport os\n"
+        new, changes = FixerPipeline([UpperFirstLine(), DuplicateImportFixer()])(source)
+        self.assertEqual(new, "IMPORT OS\n")
+        self.assertEqual([change['type'] for change in changes], ['upper', 'remove_duplicate_import', 'remove_duplicate_import'])
+
+        new, changes = FixerPipeline([DuplicateImportFixer(), UpperFirstLine()])(source)
+        self.assertEqual(new, "IMPORT OS\n")
+
+    def test_tree_parsed_once(self):
+        source = "import os\nimport os\n"
+        counts = []
+
+        class CountingFixer(Fixer):
+            def fix(self, source_file):
+                counts.append(id(source_file.tree))
+                return []
+
+        FixerPipeline([CountingFixer(), DuplicateImportFixer(), CountingFixer()])(source)
+        self.assertEqual(len(set(counts)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
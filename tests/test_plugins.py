@@ -0,0 +1,111 @@
+import unittest
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+from core import plugins
+from core.plugins import LanguagePlugin, plugin_for, register_plugin, source_extensions
+from core.report_writers import write_report
+from core.scanner import scan_repository
+
+def count_todos(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [{"type": "todo", "line": number, "message": "待办事项"}
+                for number, line in enumerate(f, 1) if 'TODO' in line]
+
+def no_complexity(file_path):
+    return {}
+
+ENTRY_POINT_PLUGIN = '''
+from core.plugins import LanguagePlugin
+plugin = LanguagePlugin("ruby", (".rb",), smells=lambda path: [], complexity=lambda path: {})
+'''
+
+def install_ruby_plugin(site, version):
+    """在 site 目录中安装（或升级）一个通过入口点声明的 ruby 插件"""
+    for name in os.listdir(site):
+        if name.endswith('.dist-info'):
+            shutil.rmtree(os.path.join(site, name))
+    dist_info = os.path.join(site, f'coderevive_ruby-{version}.dist-info')
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, 'METADATA'), 'w', encoding='utf-8') as f:
+        f.write(f"Metadata-Version: 2.1\nName: coderevive-ruby\nVersion: {version}\n")
+    with open(os.path.join(dist_info, 'entry_points.txt'), 'w', encoding='utf-8') as f:
+        f.write("[coderevive.plugins]\n.rb = coderevive_ruby:plugin\n")
+    with open(os.path.join(site, 'coderevive_ruby.py'), 'w', encoding='utf-8') as f:
+        f.write(ENTRY_POINT_PLUGIN)
+
+def run_python(code, extra_path=None):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, extra_path])))
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return completed.stdout.split()
+
+class TestPlugins(unittest.TestCase):
+    def tearDown(self):
+        plugins.PLUGINS.pop('.todo', None)
+
+    def test_builtin_plugins(self):
+        self.assertEqual(plugin_for('/repo/app.py').language, 'python')
+        self.assertEqual(plugin_for('/repo/app.js').kind('smells'), 'javascript_smells')
+        self.assertIsNone(plugin_for('/repo/README.md'))
+        self.assertIsNone(plugin_for('/repo/app.js').get('function_complexity'))
+
+    def test_analyzers_are_imported_lazily(self):
+        code = (
+            "import sys; import main; from core.plugins import plugin_for; "
+            "print('requests' in sys.modules, 'analyzers.python_analyzer' in sys.modules); "
+            "plugin_for('a.py').get('smells'); "
+            "print('analyzers.python_analyzer' in sys.modules, 'analyzers.javascript_analyzer' in sys.modules)"
+        )
+        self.assertEqual(run_python(code), ['False', 'False', 'True', 'False'])
+
+    def test_registered_plugin_is_scanned_and_reported(self):
+        register_plugin(LanguagePlugin("todo", (".todo",), smells=count_todos, complexity=no_complexity))
+        self.assertIn('.todo', source_extensions())
+        with tempfile.TemporaryDirectory() as repo:
+            with open(os.path.join(repo, 'notes.todo'), 'w', encoding='utf-8') as f:
+                f.write("first\nTODO: second\n")
+            results = scan_repository(repo)
+            self.assertEqual(results['total_issues'], 1)
+            self.assertEqual(results['todo_files'][0]['issues'][0]['line'], 2)
+
+            out = io.StringIO()
+            summary = write_report([{"path": "notes.todo", "language": "todo", "issues": [{"type": "todo"}]}], out)
+            self.assertEqual(summary['todo_files'], 1)
+            self.assertIn("--- todo 文件分析 ---", out.getvalue())
+
+    def test_entry_point_plugin_is_loaded_on_first_use(self):
+        with tempfile.TemporaryDirectory() as site:
+            install_ruby_plugin(site, '1.0')
+            code = (
+                "import sys; from core.plugins import plugin_for, source_extensions; "
+                "print('.rb' in source_extensions(), 'coderevive_ruby' in sys.modules); "
+                "print(plugin_for('x.rb').language)"
+            )
+            self.assertEqual(run_python(code, site), ['True', 'False', 'ruby'])
+
+    def test_plugin_versions_change_cache_version(self):
+        code = ("import sys; from core.cache import analyzer_version; "
+                "print(analyzer_version(), 'coderevive_ruby' in sys.modules)")
+        with tempfile.TemporaryDirectory() as site:
+            builtin, _ = run_python(code)
+            install_ruby_plugin(site, '1.0')
+            first, imported = run_python(code, site)
+            install_ruby_plugin(site, '1.1')
+            second, _ = run_python(code, site)
+        # 升级第三方插件后旧的缓存结果失效，计算版本时不导入插件
+        self.assertEqual(imported, 'False')
+        self.assertEqual(len({builtin, first, second}), 3)
+
+        before = plugins.plugins_version()
+        register_plugin(LanguagePlugin("todo", (".todo",), smells=count_todos, complexity=no_complexity))
+        self.assertNotEqual(plugins.plugins_version(), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from analyzers import profiling, python_engine, javascript_tokenizer
+from core.scanner import scan_repository
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        for i in range(20):
+            name = f"m{i}.py" if i % 2 else f"m{i}.js"
+            with open(os.path.join(self.repo, name), 'w', encoding='utf-8') as f:
+                f.write("import os\nimport os\n" if i % 2 else "var a = 1;\nvar a = 2;\n")
+
+    def tearDown(self):
+        profiling.disable()
+        self._tmp.cleanup()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.active())
+        result = scan_repository(self.repo)
+        self.assertEqual(result['total_issues'], 20)
+        self.assertIsNone(profiling.active())
+
+    def test_worker_timings_are_merged(self):
+        for jobs in (1, 2):
+            # 工作进程会继承主进程的单文件缓存，先清空保证每个文件都被解析
+            python_engine.clear_memo()
+            javascript_tokenizer.clear_memo()
+            profiler = profiling.enable()
+            scan_repository(self.repo, jobs=jobs)
+            profiling.disable()
+            summary = profiler.summary()
+            self.assertEqual(summary['counters']['scan.files'], 20)
+            self.assertEqual(summary['counters']['scan.analyzed_files'], 20)
+            self.assertEqual(summary['timers']['analyzer.python_smells']['calls'], 10)
+            self.assertEqual(summary['timers']['javascript.tokenize']['calls'], 10)
+            self.assertEqual(summary['timers']['scan.repository']['calls'], 1)
+            self.assertEqual(len(summary['slowest_files']), profiling.DEFAULT_SLOWEST_FILES)
+
+    def test_exports(self):
+        profiler = profiling.Profiler(slowest_files=2)
+        profiler.add_time('python.parse', 0.5)
+        profiler.add_time('python.parse', 0.25)
+        profiler.count('scan.files', 3)
+        for seconds in (0.1, 0.3, 0.2):
+            profiler.record_file(f"f{seconds}.py", seconds, 10)
+        json_path = os.path.join(self.repo, 'profile.json')
+        prom_path = os.path.join(self.repo, 'profile.prom')
+        profiler.write_json(json_path)
+        profiler.write_prometheus(prom_path)
+
+        with open(json_path, encoding='utf-8') as f:
+            summary = json.load(f)
+        self.assertEqual(summary['timers']['python.parse'], {"calls": 2, "total_seconds": 0.75, "max_seconds": 0.5})
+        self.assertEqual([entry['path'] for entry in summary['slowest_files']], ['f0.3.py', 'f0.2.py'])
+        with open(prom_path, encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn('coderevive_timer_seconds_total{name="python.parse"} 0.750000', text)
+        self.assertIn('coderevive_scan_files_total 3', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+try:
+    import requests  # noqa: F401
+except ImportError:
+    requests = None
+
+def sha_of(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+class GitDataStub:
+    """内存中的 Git Data API：树以 {路径: (mode, sha)} 平铺保存"""
+
+    def __init__(self, files):
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.pulls = []
+        self.counts = {"blobs": 0, "commits": 0, "pulls": 0}
+        tree = {}
+        for path, content in files.items():
+            blob = self.add_blob(content)
+            tree[path] = ('100644', blob)
+        tree_sha = self.add_tree(tree)
+        self.refs['main'] = self.add_commit(tree_sha, [], 'initial')
+
+    def add_blob(self, content):
+        sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+        self.blobs[sha] = content
+        return sha
+
+    def add_tree(self, entries):
+        sha = sha_of(sorted(entries.items()))
+        self.trees[sha] = entries
+        return sha
+
+    def add_commit(self, tree, parents, message):
+        sha = sha_of([tree, parents, message, len(self.commits)])
+        self.commits[sha] = {"sha": sha, "tree": {"sha": tree}, "parents": [{"sha": p} for p in parents]}
+        return sha
+
+    def handle(self, method, path, query, body):
+        parts = path.strip('/').split('/')[3:]
+        if not parts:
+            return 200, {"default_branch": "main"}
+        if parts[:3] == ['git', 'ref', 'heads']:
+            branch = '/'.join(parts[3:])
+            if branch not in self.refs:
+                return 404, {"message": "Not Found"}
+            return 200, {"object": {"sha": self.refs[branch]}}
+        if parts[:2] == ['git', 'commits'] and method == 'GET':
+            return 200, self.commits[parts[2]]
+        if parts[:2] == ['git', 'trees'] and method == 'GET':
+            entries = self.trees[parts[2]]
+            return 200, {"tree": [{"path": p, "mode": m, "type": "blob", "sha": s} for p, (m, s) in entries.items()]}
+        if parts == ['git', 'blobs']:
+            self.counts["blobs"] += 1
+            return 201, {"sha": self.add_blob(base64.b64decode(body['content']))}
+        if parts == ['git', 'trees']:
+            entries = dict(self.trees[body['base_tree']])
+            for entry in body['tree']:
+                if entry['sha'] is None:
+                    entries.pop(entry['path'], None)
+                elif entry['sha'] not in self.blobs:
+                    return 422, {"message": "blob missing"}
+                else:
+                    entries[entry['path']] = (entry['mode'], entry['sha'])
+            return 201, {"sha": self.add_tree(entries)}
+        if parts == ['git', 'commits']:
+            self.counts["commits"] += 1
+            return 201, {"sha": self.add_commit(body['tree'], body['parents'], body['message'])}
+        if parts == ['git', 'refs']:
+            self.refs[body['ref'][len('refs/heads/'):]] = body['sha']
+            return 201, {}
+        if parts[:3] == ['git', 'refs', 'heads']:
+            self.refs['/'.join(parts[3:])] = body['sha']
+            return 200, {}
+        if parts == ['pulls'] and method == 'GET':
+            head = query['head'][0].split(':', 1)[1]
+            return 200, [pr for pr in self.pulls if pr['head'] == head]
+        if parts == ['pulls']:
+            self.counts["pulls"] += 1
+            pr = {"head": body['head'], "base": body['base'], "html_url": f"https://github.com/owner/repo/pull/{len(self.pulls) + 1}"}
+            self.pulls.append(pr)
+            return 201, pr
+        return 404, {"message": "Not Found"}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        with self.server.stub.lock:
+            status, data = self.server.stub.handle(method, url.path, parse_qs(url.query), body)
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+@unittest.skipIf(requests is None, "requests 未安装")
+class TestCreatePullRequest(unittest.TestCase):
+    def setUp(self):
+        self.stub = GitDataStub({"a.py": b"import os\nimport os\n", "b.js": b"var x = 1;\n", "keep.py": b"x = 1\n"})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.stub = self.stub
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create(self, changes, parent=None, base=None):
+        from integrations import create_pull_request
+        return create_pull_request('https://github.com/owner/repo', 'secret', changes, '重构', '说明',
+                                   base=base, api_base=self.api_base, parent=parent)
+
+    def test_single_commit_and_idempotent_rerun(self):
+        changes = [
+            {"path": "a.py", "content": "import os\n"},
+            {"path": "b.js", "content": None},
+            {"path": "new.py", "content": "x = 1\n"},  # 内容与 keep.py 相同，复用已有 blob
+            {"path": "keep.py", "content": "x = 1\n"}  # 未修改
+        ]
+        result = self.create(changes)
+        self.assertEqual(result['status'], 'created')
+        self.assertEqual(result['changes_count'], 3)
+        self.assertEqual(result['uploaded_blobs'], 1)
+        self.assertEqual(self.stub.counts, {"blobs": 1, "commits": 1, "pulls": 1})
+
+        head = self.stub.commits[self.stub.refs['coderevive/refactor']]
+        tree = self.stub.trees[head['tree']['sha']]
+        self.assertEqual(sorted(tree), ['a.py', 'keep.py', 'new.py'])
+        self.assertEqual(head['parents'], [{"sha": self.stub.refs['main']}])
+
+        again = self.create(changes)
+        self.assertEqual(again['commit'], result['commit'])
+        self.assertTrue(again['reused_pr'])
+        self.assertEqual(again['pr_url'], result['pr_url'])
+        self.assertEqual(self.stub.counts, {"blobs": 1, "commits": 1, "pulls": 1})
+
+    def test_base_moved_since_scan(self):
+        scanned = self.stub.refs['main']
+        tree = dict(self.stub.trees[self.stub.commits[scanned]['tree']['sha']])
+        tree['a.py'] = ('100644', self.stub.add_blob(b"import sys\n"))
+        self.stub.refs['main'] = self.stub.add_commit(self.stub.add_tree(tree), [scanned], 'newer')
+        # 基于旧提交的修改不能覆盖目标分支上的新提交
+        result = self.create([{"path": "a.py", "content": "import os\n"}], parent=scanned)
+        self.assertEqual(result['status'], 'error')
+        self.assertIn(scanned[:12], result['message'])
+        self.assertNotIn('coderevive/refactor', self.stub.refs)
+        result = self.create([{"path": "a.py", "content": "import os\n"}], parent=self.stub.refs['main'])
+        self.assertEqual(result['status'], 'created')
+
+    def test_scanned_branch_is_the_base(self):
+        main_head = self.stub.refs['main']
+        tree = dict(self.stub.trees[self.stub.commits[main_head]['tree']['sha']])
+        tree['feature.py'] = ('100644', self.stub.add_blob(b"y = 2\n"))
+        feature = self.stub.refs['feature'] = self.stub.add_commit(self.stub.add_tree(tree), [main_head], 'feature')
+        # 使用 --ref feature 扫描时，修改基于 feature 分支提交，而不是默认分支
+        result = self.create([{"path": "a.py", "content": "import os\n"}], parent=feature, base='feature')
+        self.assertEqual(result['status'], 'created')
+        head = self.stub.commits[self.stub.refs['coderevive/refactor']]
+        self.assertEqual(head['parents'], [{"sha": feature}])
+        self.assertIn('feature.py', self.stub.trees[head['tree']['sha']])
+        self.assertEqual(self.stub.pulls[0]['base'], 'feature')
+
+    def test_no_changes(self):
+        result = self.create([{"path": "keep.py", "content": b"x = 1\n"}])
+        self.assertEqual(result['status'], 'no_changes')
+        self.assertNotIn('coderevive/refactor', self.stub.refs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import contextlib
+import fcntl
+import glob
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import main
+from core.cache import AnalysisCache
+from core.repo_fetcher import fetch_repository, is_remote_url
+from core.scanner import scan_repository
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', repo, '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def write(repo, name, content):
+    path = os.path.join(repo, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestRepoFetcher(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, 'src')
+        self.remote = os.path.join(self._tmp.name, 'remote.git')
+        self.cache_dir = os.path.join(self._tmp.name, 'cache')
+        os.makedirs(self.src)
+        git(self.src, 'init', '-q', '-b', 'main')
+        write(self.src, 'a.py', "import os\nimport os\n")
+        write(self.src, 'sub/b.js', "var x = 1;\n")
+        write(self.src, 'README.md', "docs\n")
+        git(self.src, 'add', '-A')
+        git(self.src, 'commit', '-q', '-m', 'first')
+        subprocess.run(['git', 'clone', '-q', '--bare', self.src, self.remote], check=True)
+        self.url = 'file://' + self.remote
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_is_remote_url(self):
+        self.assertTrue(is_remote_url('https://github.com/owner/repo'))
+        self.assertTrue(is_remote_url('git@github.com:owner/repo.git'))
+        self.assertTrue(is_remote_url(self.url))
+        self.assertFalse(is_remote_url(self.src))
+
+    def test_sparse_checkout_and_incremental_fetch(self):
+        first = fetch_repository(self.url, cache_dir=self.cache_dir)
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(first['branch'], 'main')
+        self.assertTrue(os.path.isfile(os.path.join(first['path'], 'a.py')))
+        self.assertTrue(os.path.isfile(os.path.join(first['path'], 'sub', 'b.js')))
+        self.assertFalse(os.path.exists(os.path.join(first['path'], 'README.md')))
+
+        write(self.src, 'c.py', "x = 1\n")
+        git(self.src, 'add', '-A')
+        git(self.src, 'commit', '-q', '-m', 'second')
+        git(self.src, 'push', '-q', self.remote, 'main')
+
+        second = fetch_repository(self.url, cache_dir=self.cache_dir)
+        self.assertEqual((second['path'], second['mirror']), (first['path'], first['mirror']))
+        self.assertNotEqual(second['commit'], first['commit'])
+        self.assertTrue(os.path.isfile(os.path.join(second['path'], 'c.py')))
+
+        pinned = fetch_repository(self.url, ref=first['commit'], cache_dir=self.cache_dir)
+        self.assertEqual(pinned['commit'], first['commit'])
+        self.assertIsNone(pinned['branch'])
+        self.assertFalse(os.path.exists(os.path.join(pinned['path'], 'c.py')))
+
+    def test_branch_ref(self):
+        git(self.src, 'checkout', '-q', '-b', 'feature')
+        write(self.src, 'feature.py', "y = 2\n")
+        git(self.src, 'add', '-A')
+        git(self.src, 'commit', '-q', '-m', 'feature')
+        git(self.src, 'push', '-q', self.remote, 'feature')
+        feature = fetch_repository(self.url, ref='feature', cache_dir=self.cache_dir)
+        self.assertEqual(feature['branch'], 'feature')
+        self.assertTrue(os.path.isfile(os.path.join(feature['path'], 'feature.py')))
+
+    def test_scan_remote(self):
+        result = scan_repository(self.url, fetch_options={"cache_dir": self.cache_dir})
+        self.assertEqual(result['total_issues'], 1)
+        self.assertEqual(os.path.basename(result['python_files'][0]['path']), 'a.py')
+
+    def test_remote_scan_honours_ignore_files(self):
+        write(self.src, '.coderevive-ignore', "a.py\n")
+        write(self.src, 'sub/.gitignore', "gen_*\n")
+        write(self.src, 'sub/gen_1.js', "var y = 1;\nvar y = 2;\n")
+        write(self.src, 'tool.rb', "x = 1\n")
+        git(self.src, 'add', '-A')
+        git(self.src, 'commit', '-q', '-m', 'ignore rules')
+        git(self.src, 'push', '-q', self.remote, 'main')
+        from core.plugins import LanguagePlugin, PLUGINS, register_plugin
+        register_plugin(LanguagePlugin("ruby", ('.rb',), smells=lambda path: [], complexity=lambda path: {}))
+        try:
+            checkout = fetch_repository(self.url, cache_dir=self.cache_dir)
+            self.assertTrue(os.path.isfile(os.path.join(checkout['path'], '.coderevive-ignore')))
+            self.assertTrue(os.path.isfile(os.path.join(checkout['path'], 'tool.rb')))
+            result = scan_repository(self.url, fetch_options={"cache_dir": self.cache_dir})
+        finally:
+            PLUGINS.pop('.rb')
+        self.assertEqual(result['total_issues'], 0)
+
+    def test_reused_worktree_picks_up_new_patterns(self):
+        write(self.src, '.coderevive-ignore', "a.py\n")
+        write(self.src, 'tool.rb', "x = 1\n")
+        git(self.src, 'add', '-A')
+        git(self.src, 'commit', '-q', '-m', 'ruby')
+        git(self.src, 'push', '-q', self.remote, 'main')
+        first = fetch_repository(self.url, cache_dir=self.cache_dir)
+        # 模拟旧版本留下的工作区：只检出源码文件
+        git(first['path'], 'sparse-checkout', 'set', '--no-cone', '*.py', '*.js')
+        self.assertFalse(os.path.exists(os.path.join(first['path'], '.coderevive-ignore')))
+        from core.plugins import LanguagePlugin, PLUGINS, register_plugin
+        register_plugin(LanguagePlugin("ruby", ('.rb',), smells=lambda path: [], complexity=lambda path: {}))
+        try:
+            second = fetch_repository(self.url, cache_dir=self.cache_dir)
+        finally:
+            PLUGINS.pop('.rb')
+        self.assertEqual(second['path'], first['path'])
+        self.assertTrue(os.path.isfile(os.path.join(second['path'], '.coderevive-ignore')))
+        self.assertTrue(os.path.isfile(os.path.join(second['path'], 'tool.rb')))
+
+    def test_early_return_releases_lock_and_cache(self):
+        argv = ['main.py', '--repo', self.url, '--since', 'no-such-ref', '--repo-cache-dir', self.cache_dir,
+                '--cache-dir', os.path.join(self._tmp.name, 'analysis'), '--no-server']
+        close = AnalysisCache.close
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(AnalysisCache, 'close', autospec=True, side_effect=close) as closed, \
+                contextlib.redirect_stdout(io.StringIO()) as out:
+            main.main()
+        self.assertIn("错误:", out.getvalue())
+        closed.assert_called()
+        # 变更文件计算失败提前返回后，其他进程可以立即获得仓库锁
+        lock_paths = glob.glob(os.path.join(self.cache_dir, 'locks', '*.lock'))
+        self.assertTrue(lock_paths)
+        for lock_path in lock_paths:
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def test_missing_remote(self):
+        result = fetch_repository('file://' + os.path.join(self._tmp.name, 'missing.git'), cache_dir=self.cache_dir)
+        self.assertEqual(result['status'], 'error')
+
+if __name__ == '__main__':
+    unittest.main()
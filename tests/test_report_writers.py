@@ -0,0 +1,56 @@
+import unittest
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.report_writers import write_report, get_report_writer
+
+FILE_RESULTS = [
+    {"path": "/repo/a.py", "language": "python", "issues": [
+        {"type": "long_function", "message": "函数 'f' 过长 (40 行)", "line": 3, "function": "f"},
+        {"type": "error", "message": "分析失败: x", "line": 0}
+    ]},
+    {"path": "/repo/clean.py", "language": "python", "issues": []},
+    {"path": "/repo/b.js", "language": "javascript", "issues": [
+        {"type": "duplicate_variable", "message": "重复声明变量: a", "line": 2, "previous_line": 1}
+    ]}
+]
+
+class TestReportWriters(unittest.TestCase):
+    def test_jsonl(self):
+        out = io.StringIO()
+        summary = write_report(iter(FILE_RESULTS), out, fmt='jsonl', buffer_size=16)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['path'], "/repo/a.py")
+        self.assertEqual(records[2]['previous_line'], 1)
+        self.assertEqual(records[-1], {"record": "summary", "total_issues": 3, "python_files": 1, "javascript_files": 1})
+        self.assertEqual(summary['total_issues'], 3)
+
+    def test_sarif(self):
+        out = io.StringIO()
+        write_report(iter(FILE_RESULTS), out, fmt='sarif', base_dir='/repo')
+        sarif = json.loads(out.getvalue())
+        run = sarif['runs'][0]
+        self.assertEqual(sarif['version'], "2.1.0")
+        self.assertEqual(len(run['results']), 3)
+        self.assertEqual(run['results'][0]['locations'][0]['physicalLocation'],
+                         {"artifactLocation": {"uri": "a.py"}, "region": {"startLine": 3}})
+        self.assertNotIn("region", run['results'][1]['locations'][0]['physicalLocation'])
+        self.assertEqual([rule['id'] for rule in run['tool']['driver']['rules']],
+                         ["long_function", "error", "duplicate_variable"])
+
+    def test_sarif_empty(self):
+        out = io.StringIO()
+        write_report(iter([]), out, fmt='sarif')
+        self.assertEqual(json.loads(out.getvalue())['runs'][0]['results'], [])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            get_report_writer('xml', io.StringIO())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import io
+from core.scanner import scan_repository, iter_scan_repository
+from core.report_generator import generate_report
+from core.report_writers import write_report
+from core.cache import AnalysisCache
+
+LONG_PY = "def long_function():\n" + "    x = 1\n" * 40
+DUP_JS = "var a = 1;\nvar a = 2;\n"
+
+def make_repo(root, count=40):
+    for i in range(count):
+        sub = os.path.join(root, f"pkg{i % 5}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"mod{i}.py"), 'w', encoding='utf-8') as f:
+            f.write("import os\nimport os\n" + LONG_PY)
+        with open(os.path.join(sub, f"app{i}.js"), 'w', encoding='utf-8') as f:
+            f.write(DUP_JS)
+
+class TestScanner(unittest.TestCase):
+    def test_parallel_scan_matches_serial(self):
+        with tempfile.TemporaryDirectory() as repo:
+            make_repo(repo)
+            serial = scan_repository(repo, jobs=1)
+            parallel = scan_repository(repo, jobs=3)
+            self.assertEqual(serial, parallel)
+            self.assertEqual(len(serial['python_files']), 40)
+            self.assertEqual(serial['total_issues'], 40 * 2 + 40)
+
+    def test_streaming_report_matches_generate_report(self):
+        with tempfile.TemporaryDirectory() as repo:
+            make_repo(repo, count=6)
+            with open(os.path.join(repo, 'clean.py'), 'w', encoding='utf-8') as f:
+                f.write("x = 1\n")
+            expected = generate_report(scan_repository(repo))
+            streamed = io.StringIO()
+            summary = write_report(iter_scan_repository(repo, jobs=2), streamed)
+            self.assertEqual(streamed.getvalue(), expected)
+            self.assertEqual(summary['python_files'], 6)
+
+    def test_iter_scan_yields_clean_files(self):
+        with tempfile.TemporaryDirectory() as repo:
+            with open(os.path.join(repo, 'clean.py'), 'w', encoding='utf-8') as f:
+                f.write("x = 1\n")
+            results = list(iter_scan_repository(repo))
+            self.assertEqual([(os.path.basename(r['path']), r['language'], r['issues']) for r in results],
+                             [('clean.py', 'python', [])])
+
+    def test_missing_repo(self):
+        self.assertIn("error", scan_repository("non_existent_repo_dir", jobs=2))
+
+class TestAnalysisCache(unittest.TestCase):
+    def test_warm_rescan_hits_cache(self):
+        with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as cache_dir:
+            make_repo(repo, count=10)
+            cold_cache = AnalysisCache(cache_dir)
+            cold = scan_repository(repo, jobs=2, cache=cold_cache)
+            self.assertEqual(cold_cache.stats()['misses'], 20)
+            cold_cache.close()
+
+            warm_cache = AnalysisCache(cache_dir)
+            warm = scan_repository(repo, cache=warm_cache)
+            self.assertEqual(warm, cold)
+            self.assertEqual(warm_cache.stats()['hits'], 20)
+            self.assertEqual(warm_cache.stats()['misses'], 0)
+            warm_cache.close()
+
+    def test_warm_parallel_scan_streams_before_walk_ends(self):
+        from core.scanner import _iter_analyzed, _iter_source_files
+        with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as cache_dir:
+            make_repo(repo, count=50)
+            cache = AnalysisCache(cache_dir)
+            try:
+                list(iter_scan_repository(repo, cache=cache))
+                walked = []
+
+                def walk():
+                    for file_path in _iter_source_files(repo):
+                        walked.append(file_path)
+                        yield file_path
+
+                results = _iter_analyzed(walk(), 4, cache)
+                first_path, _ = next(results)
+                self.assertEqual(first_path, walked[0])
+                self.assertEqual(len(walked), 1)
+                self.assertEqual(len(list(results)), 99)
+            finally:
+                cache.close()
+
+    def test_rule_config_changes_key(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            default = AnalysisCache(cache_dir)
+            custom = AnalysisCache(cache_dir, rule_config={"max_function_lines": 50})
+            self.assertNotEqual(default.make_key(b"x = 1", "python_smells"), custom.make_key(b"x = 1", "python_smells"))
+            default.close()
+            custom.close()
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = AnalysisCache(cache_dir, max_bytes=500)
+            for i in range(50):
+                cache.put(cache.make_key(str(i).encode(), "python_smells"), [{"type": "x", "line": i}])
+            self.assertGreater(cache.stats()['evictions'], 0)
+            self.assertLessEqual(cache.stats()['total_bytes'], 500)
+            cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
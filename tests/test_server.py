@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.scanner import iter_scan_repository
+from core.server import (
+    ServerClient, ServerError, ServerUnavailable, connect, create_server, parse_address, REQUEST_CANCELLED
+)
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestAnalysisServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.repo = os.path.join(cls._tmp.name, 'repo')
+        os.makedirs(cls.repo)
+        for i in range(40):
+            write(os.path.join(cls.repo, f"m{i}.py"), "import os\nimport os\n" if i % 2 else "x = 1\n")
+        write(os.path.join(cls.repo, 'app.js'), "var a = 1;\nvar a = 2;\n")
+        cls.address = f"unix:{os.path.join(cls._tmp.name, 'server.sock')}"
+        cls.server = create_server(cls.address, jobs=2)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.server.server_close()
+        cls.server.service.close()
+        cls._tmp.cleanup()
+
+    def test_scan_matches_in_process_scan(self):
+        client = connect(self.address)
+        self.assertIsNotNone(client)
+        results = list(client.scan(self.repo))
+        self.assertEqual(results, list(iter_scan_repository(self.repo)))
+        self.assertEqual(client.last_result, {"files": 41, "total_issues": 21})
+
+    def test_analyze_file_and_paths(self):
+        client = ServerClient(self.address)
+        details = client.analyze_file(os.path.join(self.repo, 'app.js'))
+        self.assertEqual(details['language'], 'javascript')
+        self.assertEqual(len(details['issues']), 1)
+        self.assertIn('cyclomatic_complexity', details['complexity'])
+
+        paths = [os.path.join(self.repo, 'm1.py'), os.path.join(self.repo, 'm2.py')]
+        self.assertEqual([len(result['issues']) for result in client.analyze_paths(paths)], [1, 0])
+
+        with self.assertRaises(ServerError):
+            client.analyze_file(os.path.join(self.repo, 'missing.py'))
+
+    def test_concurrent_clients(self):
+        results = {}
+
+        def scan(index):
+            results[index] = len(list(ServerClient(self.address).scan(self.repo)))
+
+        threads = [threading.Thread(target=scan, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: 41 for i in range(4)})
+
+    def test_cancel_request(self):
+        service = self.server.service
+        messages = service.handle({"jsonrpc": "2.0", "id": "scan-1", "method": "scan_repo",
+                                   "params": {"repo": self.repo}})
+        self.assertEqual(next(messages)["method"], "file")
+        cancel = list(ServerClient(self.address).call("cancel", {"id": "scan-1"}))
+        self.assertEqual(cancel, [])
+        final = list(messages)[-1]
+        self.assertEqual(final["error"]["code"], REQUEST_CANCELLED)
+        self.assertFalse(ServerClient(self.address).cancel("scan-1"))
+
+    def test_unavailable_server(self):
+        missing = f"unix:{os.path.join(self._tmp.name, 'missing.sock')}"
+        self.assertIsNone(connect(missing))
+        with self.assertRaises(ServerUnavailable):
+            list(ServerClient(missing).scan(self.repo))
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('unix:/tmp/s.sock'), ('unix', '/tmp/s.sock'))
+        self.assertEqual(parse_address('http://127.0.0.1:8765/'), ('tcp', ('127.0.0.1', 8765)))
+        with self.assertRaises(ValueError):
+            parse_address('localhost')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.watcher import AnalysisDaemon, InotifyWatcher, PollingWatcher, create_watcher
+
+DUPLICATE_IMPORT = "import os\nimport os\n"
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class TestAnalysisDaemon(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self._tmp.name, 'repo')
+        os.makedirs(os.path.join(self.repo, 'pkg'))
+        self.clean = os.path.join(self.repo, 'clean.py')
+        self.dup = os.path.join(self.repo, 'pkg', 'dup.py')
+        write(self.clean, "x = 1\n")
+        write(self.dup, DUPLICATE_IMPORT)
+        self.snapshot = os.path.join(self._tmp.name, 'snapshot.json')
+        self.updates = []
+        self.updated = threading.Event()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def on_update(self, summary):
+        self.updates.append(summary)
+        self.updated.set()
+
+    def start(self, force_polling=True, **options):
+        daemon = AnalysisDaemon(self.repo, snapshot_path=self.snapshot, debounce=0.05, poll_interval=0.05,
+                                force_polling=force_polling, on_update=self.on_update, **options)
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        self.wait_for_update()
+        return daemon, thread
+
+    def wait_for_update(self, predicate=lambda summary: True):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if self.updates and predicate(self.updates[-1]):
+                return self.updates[-1]
+            self.updated.wait(0.05)
+            self.updated.clear()
+        self.fail("等待更新超时")
+
+    def stop(self, daemon, thread):
+        daemon.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def check_incremental_updates(self, force_polling):
+        daemon, thread = self.start(force_polling)
+        try:
+            initial = self.updates[0]
+            self.assertEqual(len(initial['analyzed']), 2)
+            self.assertEqual(initial['total_issues'], 1)
+
+            added = os.path.join(self.repo, 'pkg', 'new.py')
+            write(added, DUPLICATE_IMPORT)
+            update = self.wait_for_update(lambda summary: added in summary['analyzed'])
+            self.assertEqual(update['analyzed'], [added])
+            self.assertEqual(update['total_issues'], 2)
+
+            os.remove(self.dup)
+            update = self.wait_for_update(lambda summary: self.dup in summary['deleted'])
+            self.assertEqual(update['files'], 2)
+            self.assertEqual(update['total_issues'], 1)
+        finally:
+            self.stop(daemon, thread)
+
+    def test_polling_reanalyzes_only_changed_files(self):
+        self.check_incremental_updates(force_polling=True)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify 仅在 Linux 上可用")
+    def test_inotify_reanalyzes_only_changed_files(self):
+        watcher = create_watcher(self.repo)
+        watcher.close()
+        if not isinstance(watcher, InotifyWatcher):
+            self.skipTest("inotify 不可用")
+        self.check_incremental_updates(force_polling=False)
+
+    def test_restart_from_snapshot_is_warm(self):
+        daemon, thread = self.start()
+        self.stop(daemon, thread)
+        self.assertTrue(os.path.exists(self.snapshot))
+
+        write(self.clean, "y = 2\n")
+        restarted = AnalysisDaemon(self.repo, snapshot_path=self.snapshot)
+        self.assertEqual(restarted.load_snapshot(), 2)
+        summary = restarted.sync()
+        self.assertEqual(summary['analyzed'], [self.clean])
+        self.assertEqual(summary['total_issues'], 1)
+
+        other = AnalysisDaemon(self._tmp.name, snapshot_path=self.snapshot)
+        self.assertEqual(other.load_snapshot(), 0)
+
+    def test_deleted_directory_removes_its_files(self):
+        daemon = AnalysisDaemon(self.repo)
+        daemon.sync()
+        os.remove(self.dup)
+        os.rmdir(os.path.dirname(self.dup))
+        summary = daemon.sync({os.path.dirname(self.dup)})
+        self.assertEqual(summary['deleted'], [self.dup])
+        self.assertEqual([result['path'] for result in daemon.file_results()], [self.clean])
+
+    def check_ignore_rules(self, force_polling):
+        daemon, thread = self.start(force_polling, excludes=["clean.py"])
+        try:
+            self.assertEqual(self.updates[0]['files'], 1)
+            write(os.path.join(self.repo, '.coderevive-ignore'), "pkg/\n")
+            update = self.wait_for_update(lambda summary: self.dup in summary['deleted'])
+            self.assertEqual(update['files'], 0)
+        finally:
+            self.stop(daemon, thread)
+
+    def test_polling_applies_excludes_and_project_rule_changes(self):
+        self.check_ignore_rules(force_polling=True)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify 仅在 Linux 上可用")
+    def test_inotify_applies_excludes_and_project_rule_changes(self):
+        watcher = create_watcher(self.repo)
+        watcher.close()
+        if not isinstance(watcher, InotifyWatcher):
+            self.skipTest("inotify 不可用")
+        self.check_ignore_rules(force_polling=False)
+
+    def test_file_limits_apply(self):
+        from core.file_limits import FileLimits
+        write(self.dup, DUPLICATE_IMPORT + "# " + "x" * 200 + "\n")
+        daemon = AnalysisDaemon(self.repo, limits=FileLimits(max_line_length=100))
+        self.assertEqual(daemon.sync()['total_issues'], 1)
+        issues = {result['path']: result['issues'] for result in daemon.file_results()}
+        self.assertEqual(issues[self.dup][0]['type'], 'skipped_file')
+
+    def test_parallel_updates_reuse_one_pool(self):
+        daemon = AnalysisDaemon(self.repo, jobs=2)
+        try:
+            self.assertEqual(daemon.sync()['total_issues'], 1)
+            executor = daemon.executor
+            self.assertIsNotNone(executor)
+            write(self.clean, DUPLICATE_IMPORT)
+            self.assertEqual(daemon.sync({self.clean})['total_issues'], 2)
+            self.assertIs(daemon.executor, executor)
+        finally:
+            daemon.stop()
+        self.assertIsNone(daemon.executor)
+
+class TestPollingWatcher(unittest.TestCase):
+    def test_reports_changed_paths(self):
+        with tempfile.TemporaryDirectory() as repo:
+            path = os.path.join(repo, 'a.js')
+            write(path, "var a = 1;\n")
+            watcher = PollingWatcher(repo, interval=0)
+            self.assertEqual(watcher.wait(0), (set(), False))
+            write(path, "var a = 12;\n")
+            write(os.path.join(repo, 'notes.txt'), "ignored\n")
+            self.assertEqual(watcher.wait(0), ({path}, False))
+
+if __name__ == '__main__':
+    unittest.main()